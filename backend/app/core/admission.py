@@ -0,0 +1,185 @@
+import asyncio
+import logging
+import math
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+from typing import Deque, Iterable, KeysView, Optional, Tuple
+
+from app.core.deadline import remaining_time
+from app.core.maintenance import maintenance
+from app.core.memory import memory_registry
+
+logger = logging.getLogger("admission")
+
+# Limites do login (bcrypt é caro: poucas verificações simultâneas, fila curta com prazo)
+LOGIN_MAX_CONCURRENCY = int(os.getenv("LOGIN_MAX_CONCURRENCY", "4"))
+LOGIN_MAX_QUEUE = int(os.getenv("LOGIN_MAX_QUEUE", "16"))
+LOGIN_QUEUE_TIMEOUT_MS = int(os.getenv("LOGIN_QUEUE_TIMEOUT_MS", "2000"))
+# Backoff por usuário após falhas consecutivas, aplicado antes de qualquer hash
+LOGIN_BACKOFF_FREE_ATTEMPTS = int(os.getenv("LOGIN_BACKOFF_FREE_ATTEMPTS", "3"))
+LOGIN_BACKOFF_BASE_SECONDS = float(os.getenv("LOGIN_BACKOFF_BASE_SECONDS", "1"))
+LOGIN_BACKOFF_MAX_SECONDS = float(os.getenv("LOGIN_BACKOFF_MAX_SECONDS", "300"))
+LOGIN_BACKOFF_MAX_ENTRIES = int(os.getenv("LOGIN_BACKOFF_MAX_ENTRIES", "100000"))
+# Falhas esquecidas quando o usuário passa esse tempo sem errar depois do fim do bloqueio
+LOGIN_BACKOFF_RESET_SECONDS = float(os.getenv("LOGIN_BACKOFF_RESET_SECONDS", "3600"))
+
+
+class AdmissionRejected(Exception):
+    def __init__(self, retry_after: int):
+        super().__init__(f"Admission rejected, retry after {retry_after}s")
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    """Limita a concorrência de uma operação cara, com fila limitada e prazo de espera
+
+    Assíncrono: quem espera na fila aguarda um future no event loop, sem ocupar uma thread.
+    Deve ser usado por um único event loop (um worker).
+    """
+
+    def __init__(self, name: str, max_concurrency: int, max_queue: int, queue_timeout: float):
+        self.name = name
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self._active = 0
+        # Futures dos que esperam, em ordem de chegada; a vaga é passada direto ao primeiro
+        self._waiters: "Deque[asyncio.Future]" = deque()
+        # Média móvel do tempo de serviço, usada para estimar o Retry-After
+        self._avg_service_time = 0.1
+        self.rejected = 0
+
+    def _retry_after(self) -> int:
+        backlog = len(self._waiters) + self._active
+        return max(1, math.ceil(backlog * self._avg_service_time / self.max_concurrency))
+
+    def _reject(self, reason: str) -> AdmissionRejected:
+        self.rejected += 1
+        retry_after = self._retry_after()
+        logger.warning(f"{self.name}: request shed ({reason}), retry after {retry_after}s")
+        return AdmissionRejected(retry_after)
+
+    def _release(self) -> None:
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                # A vaga passa para o próximo da fila sem voltar a ficar livre
+                waiter.set_result(None)
+                return
+        self._active -= 1
+
+    async def _wait_turn(self) -> None:
+        if len(self._waiters) >= self.max_queue:
+            raise self._reject("queue full")
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        # A espera na fila também consome o prazo da requisição
+        timeout = min(self.queue_timeout, remaining_time(self.queue_timeout))
+        try:
+            await asyncio.wait_for(waiter, max(timeout, 0))
+        except asyncio.TimeoutError:
+            raise self._reject("queue timeout")
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                # Recebeu a vaga no mesmo instante em que foi cancelado: repassa
+                self._release()
+            raise
+        finally:
+            if waiter in self._waiters:
+                self._waiters.remove(waiter)
+
+    @asynccontextmanager
+    async def admit(self):
+        if self._active >= self.max_concurrency or self._waiters:
+            await self._wait_turn()
+        else:
+            self._active += 1
+
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            elapsed = time.monotonic() - started
+            self._avg_service_time = 0.8 * self._avg_service_time + 0.2 * elapsed
+            self._release()
+
+    def stats(self) -> dict:
+        return {"active": self._active, "waiting": len(self._waiters), "rejected": self.rejected}
+
+
+class LoginBackoff:
+    """Backoff exponencial por nome de usuário, consultado antes de verificar a senha"""
+
+    def __init__(
+        self, free_attempts: int, base_seconds: float, max_seconds: float, max_entries: int,
+        reset_seconds: float = LOGIN_BACKOFF_RESET_SECONDS,
+    ):
+        self.free_attempts = free_attempts
+        self.base_seconds = base_seconds
+        self.max_seconds = max_seconds
+        self.max_entries = max_entries
+        self.reset_seconds = reset_seconds
+        # username -> (falhas consecutivas, próximo instante permitido)
+        self._entries: "OrderedDict[str, Tuple[int, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def check(self, username: str) -> int:
+        """Segundos até a próxima tentativa permitida (0 = pode tentar agora)"""
+        with self._lock:
+            entry = self._entries.get(username)
+        if entry is None:
+            return 0
+        remaining = entry[1] - time.monotonic()
+        return math.ceil(remaining) if remaining > 0 else 0
+
+    def record_failure(self, username: str) -> None:
+        with self._lock:
+            failures = self._entries.pop(username, (0, 0.0))[0] + 1
+            delay = 0.0
+            if failures > self.free_attempts:
+                delay = min(self.base_seconds * 2 ** (failures - self.free_attempts - 1), self.max_seconds)
+            now = time.monotonic()
+            self._entries[username] = (failures, now + delay)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            # Os mais antigos ficam na frente: descarta os já esquecidos até achar um ativo
+            cutoff = now - self.reset_seconds
+            while self._entries:
+                oldest = next(iter(self._entries))
+                if self._entries[oldest][1] > cutoff:
+                    break
+                del self._entries[oldest]
+
+    def record_success(self, username: str) -> None:
+        with self._lock:
+            self._entries.pop(username, None)
+
+    def keys(self) -> KeysView[str]:
+        """Visão viva dos usuários, para a varredura andar sem copiar (não segura o lock)"""
+        return self._entries.keys()
+
+    def purge_expired(self, usernames: Optional[Iterable[str]] = None) -> int:
+        """Remove quem está sem errar há reset_seconds desde o fim do bloqueio (todos, ou só os do lote)"""
+        cutoff = time.monotonic() - self.reset_seconds
+        removed = 0
+        with self._lock:
+            for username in list(self._entries) if usernames is None else usernames:
+                entry = self._entries.get(username)
+                if entry is not None and entry[1] <= cutoff:
+                    del self._entries[username]
+                    removed += 1
+        return removed
+
+
+login_admission = AdmissionController(
+    "login", LOGIN_MAX_CONCURRENCY, LOGIN_MAX_QUEUE, LOGIN_QUEUE_TIMEOUT_MS / 1000
+)
+login_backoff = LoginBackoff(
+    LOGIN_BACKOFF_FREE_ATTEMPTS, LOGIN_BACKOFF_BASE_SECONDS, LOGIN_BACKOFF_MAX_SECONDS, LOGIN_BACKOFF_MAX_ENTRIES
+)
+
+memory_registry.register("login_backoff", lambda: login_backoff._entries)
+maintenance.register("login_backoff", login_backoff.keys, login_backoff.purge_expired)
@@ -0,0 +1,263 @@
+import os
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from typing import Callable, Optional, Tuple
+
+from starlette.concurrency import run_in_threadpool
+from starlette.datastructures import Headers, MutableHeaders
+
+from app.core.memory import memory_registry
+from app.core.metrics import metrics
+
+# Corpos menores que isso saem sem compressão: o cabeçalho gzip e a CPU não compensam
+COMPRESSION_MIN_SIZE = int(os.getenv("COMPRESSION_MIN_SIZE", "1024"))
+COMPRESSION_LEVEL = int(os.getenv("COMPRESSION_LEVEL", "6"))
+# Corpos maiores são comprimidos no threadpool, para não travar o event loop
+COMPRESSION_OFFLOAD_BYTES = int(os.getenv("COMPRESSION_OFFLOAD_BYTES", str(256 * 1024)))
+# Memória máxima das respostas comprimidas reaproveitadas por ETag
+COMPRESSION_CACHE_MAX_BYTES = int(os.getenv("COMPRESSION_CACHE_MAX_BYTES", str(32 * 1024 * 1024)))
+
+# Conteúdos que já chegam comprimidos
+_SKIP_CONTENT_TYPES = ("image/", "video/", "audio/", "application/zip", "application/gzip", "application/octet-stream")
+# wbits 16 + 15: formato gzip
+_GZIP_WBITS = 31
+
+
+def no_compression(endpoint: Callable) -> Callable:
+    """Marca a rota para sair sem compressão (ex.: respostas com segredos, sujeitas a ataques como o BREACH)"""
+    endpoint.__no_compression__ = True
+    return endpoint
+
+
+def accepts_gzip(accept_encoding: str) -> bool:
+    """Negocia o Accept-Encoding: gzip (ou *) com q > 0; um gzip;q=0 explícito vence o *"""
+    gzip_q: Optional[float] = None
+    any_q: Optional[float] = None
+    for item in accept_encoding.split(","):
+        coding, _, params = item.strip().partition(";")
+        coding = coding.strip().lower()
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        if coding in ("gzip", "x-gzip"):
+            gzip_q = q
+        elif coding == "*":
+            any_q = q
+    if gzip_q is not None:
+        return gzip_q > 0
+    return any_q is not None and any_q > 0
+
+
+def gzip_compress(body: bytes, level: int = COMPRESSION_LEVEL) -> Tuple[bytes, float]:
+    """(corpo comprimido, segundos de CPU gastos na thread atual)"""
+    started = time.thread_time()
+    compressor = zlib.compressobj(level, zlib.DEFLATED, _GZIP_WBITS)
+    data = compressor.compress(body) + compressor.flush()
+    return data, time.thread_time() - started
+
+
+class CompressedCache:
+    """LRU de corpos já comprimidos, por (rota, query, ETag), limitado em bytes"""
+
+    def __init__(self, max_bytes: int = COMPRESSION_CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[tuple, bytes]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: tuple) -> Optional[bytes]:
+        with self._lock:
+            data = self._entries.get(key)
+            if data is not None:
+                self._entries.move_to_end(key)
+            return data
+
+    def put(self, key: tuple, data: bytes) -> None:
+        if len(data) > self.max_bytes // 4:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._bytes -= len(previous)
+            self._entries[key] = data
+            self._bytes += len(data)
+            while self._bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= len(evicted)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+compressed_cache = CompressedCache()
+memory_registry.register("compressed_cache", lambda: compressed_cache._entries)
+
+
+def _gzip_etag(etag: str) -> str:
+    """Representação comprimida é outra representação: um ETag forte precisa mudar"""
+    if etag.startswith("W/") or not etag.endswith('"'):
+        return etag
+    return etag[:-1] + '-gzip"'
+
+
+def _route_label(scope) -> str:
+    route = scope.get("route")
+    if route is not None:
+        return route.path
+    return scope["path"] if "endpoint" in scope else "unmatched"
+
+
+class _GzipResponder:
+    """Estado de uma resposta: decide na primeira mensagem de corpo entre repassar, comprimir de uma vez ou em stream"""
+
+    def __init__(self, middleware: "CompressionMiddleware", scope, send):
+        self.middleware = middleware
+        self.scope = scope
+        self.send = send
+        self.start_message = None
+        self.passthrough = False
+        self.compressor = None
+        self.route = "unmatched"
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.cpu = 0.0
+
+    def _skip_reason(self, headers: Headers) -> Optional[str]:
+        endpoint = self.scope.get("endpoint")
+        if endpoint is not None and getattr(endpoint, "__no_compression__", False):
+            return "opt_out"
+        if "content-encoding" in headers:
+            return "encoded"
+        status = self.start_message["status"]
+        if status < 200 or status in (204, 304):
+            return "no_body"
+        if headers.get("content-type", "").startswith(_SKIP_CONTENT_TYPES):
+            return "content_type"
+        return None
+
+    def _record(self, result: str) -> None:
+        metrics.inc("compression_responses_total", result=result, route=self.route)
+        if self.bytes_in:
+            metrics.inc("compression_bytes_in_total", self.bytes_in, route=self.route)
+            metrics.inc("compression_bytes_out_total", self.bytes_out, route=self.route)
+            metrics.inc("compression_cpu_seconds_total", self.cpu, route=self.route)
+
+    def _compressed_headers(self, length: Optional[int]) -> None:
+        headers = MutableHeaders(raw=self.start_message["headers"])
+        headers["Content-Encoding"] = "gzip"
+        headers.add_vary_header("Accept-Encoding")
+        if "etag" in headers:
+            headers["ETag"] = _gzip_etag(headers["etag"])
+        if length is None:
+            del headers["Content-Length"]
+        else:
+            headers["Content-Length"] = str(length)
+
+    async def __call__(self, message) -> None:
+        if message["type"] == "http.response.start":
+            self.start_message = message
+            self.route = _route_label(self.scope)
+            reason = self._skip_reason(Headers(raw=message["headers"]))
+            if reason is not None:
+                self.passthrough = True
+                self._record(reason)
+                await self.send(message)
+            return
+        if message["type"] != "http.response.body" or self.passthrough:
+            await self.send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+        if self.compressor is not None:
+            # Stream já em andamento: comprime o pedaço e libera o que houver (sync flush)
+            started = time.thread_time()
+            data = self.compressor.compress(body)
+            data += self.compressor.flush(zlib.Z_SYNC_FLUSH if more_body else zlib.Z_FINISH)
+            self.cpu += time.thread_time() - started
+            self.bytes_in += len(body)
+            self.bytes_out += len(data)
+            if not more_body:
+                self._record("streamed")
+            await self.send({"type": "http.response.body", "body": data, "more_body": more_body})
+            return
+
+        if not more_body:
+            await self._send_whole(body)
+            return
+
+        # Primeiro pedaço de um corpo em stream: comprime incrementalmente, sem bufferizar o resto
+        self.compressor = zlib.compressobj(self.middleware.level, zlib.DEFLATED, _GZIP_WBITS)
+        self._compressed_headers(None)
+        await self.send(self.start_message)
+        await self.__call__(message)
+
+    async def _send_whole(self, body: bytes) -> None:
+        if len(body) < self.middleware.minimum_size:
+            self._record("small")
+            await self.send(self.start_message)
+            await self.send({"type": "http.response.body", "body": body})
+            return
+        etag = Headers(raw=self.start_message["headers"]).get("etag")
+        cache_key = None
+        data = None
+        if etag and self.start_message["status"] == 200:
+            cache_key = (self.scope["path"], self.scope.get("query_string", b""), etag)
+            data = self.middleware.cache.get(cache_key)
+        result = "cached"
+        if data is None:
+            result = "compressed"
+            if len(body) >= COMPRESSION_OFFLOAD_BYTES:
+                data, self.cpu = await run_in_threadpool(gzip_compress, body, self.middleware.level)
+            else:
+                data, self.cpu = gzip_compress(body, self.middleware.level)
+            if cache_key is not None:
+                self.middleware.cache.put(cache_key, data)
+        self.bytes_in = len(body)
+        self.bytes_out = len(data)
+        self._record(result)
+        self._compressed_headers(len(data))
+        await self.send(self.start_message)
+        await self.send({"type": "http.response.body", "body": data})
+
+
+class CompressionMiddleware:
+    """Compressão gzip das respostas HTTP, negociada pelo Accept-Encoding (middleware ASGI puro)
+
+    Corpos completos abaixo de minimum_size passam direto; corpos em stream são comprimidos
+    pedaço a pedaço, sem bufferizar a resposta inteira. Respostas 200 com ETag reaproveitam os
+    bytes comprimidos do cache. Rotas marcadas com @no_compression nunca são comprimidas.
+    """
+
+    def __init__(
+        self,
+        app,
+        minimum_size: int = COMPRESSION_MIN_SIZE,
+        level: int = COMPRESSION_LEVEL,
+        cache: CompressedCache = compressed_cache,
+    ):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.level = level
+        self.cache = cache
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] == "HEAD":
+            await self.app(scope, receive, send)
+            return
+        if not accepts_gzip(Headers(scope=scope).get("accept-encoding", "")):
+            metrics.inc("compression_responses_total", result="not_accepted", route="any")
+            await self.app(scope, receive, send)
+            return
+        await self.app(scope, receive, _GzipResponder(self, scope, send))
@@ -0,0 +1,154 @@
+import asyncio
+import json
+import logging
+import math
+import os
+import time
+from contextvars import ContextVar
+from typing import Optional
+
+from fastapi import HTTPException, status
+from starlette.datastructures import Headers
+
+logger = logging.getLogger("deadline")
+
+# Orçamento padrão de cada requisição; o cliente pode pedir menos (ou até o máximo) pelo header
+REQUEST_TIMEOUT_MS = int(os.getenv("REQUEST_TIMEOUT_MS", "10000"))
+REQUEST_TIMEOUT_MAX_MS = int(os.getenv("REQUEST_TIMEOUT_MAX_MS", "60000"))
+# Folga após o prazo antes de abandonar o handler que não verificou o prazo por conta própria
+REQUEST_TIMEOUT_GRACE_MS = int(os.getenv("REQUEST_TIMEOUT_GRACE_MS", "1000"))
+TIMEOUT_HEADER = "x-request-timeout-ms"
+
+
+class DeadlineExceeded(HTTPException):
+    def __init__(self, detail: str = "Tempo limite da requisição excedido"):
+        super().__init__(status_code=status.HTTP_504_GATEWAY_TIMEOUT, detail=detail)
+
+
+class Deadline:
+    """Prazo de uma requisição; cancelled indica que o cliente desconectou"""
+    __slots__ = ("expires_at", "cancelled")
+
+    def __init__(self, timeout: float):
+        self.expires_at = time.monotonic() + timeout
+        self.cancelled = False
+
+    def release(self) -> None:
+        """Resposta entregue: o que ainda roda na requisição (background tasks) fica sem prazo"""
+        self.expires_at = math.inf
+
+    def remaining(self) -> float:
+        return self.expires_at - time.monotonic()
+
+    def check(self) -> None:
+        if self.cancelled:
+            raise DeadlineExceeded("Requisição cancelada pelo cliente")
+        if time.monotonic() >= self.expires_at:
+            raise DeadlineExceeded()
+
+
+# Propaga para as threads do threadpool junto com o contexto da requisição
+_current: ContextVar[Optional[Deadline]] = ContextVar("request_deadline", default=None)
+
+
+def current_deadline() -> Optional[Deadline]:
+    return _current.get()
+
+
+def check_deadline() -> None:
+    """Ponto de verificação cooperativo; fora de uma requisição não faz nada"""
+    deadline = _current.get()
+    if deadline is not None:
+        deadline.check()
+
+
+def remaining_time(default: Optional[float] = None) -> Optional[float]:
+    deadline = _current.get()
+    if deadline is None:
+        return default
+    return max(0.0, deadline.remaining())
+
+
+def _requested_timeout(headers: Headers) -> float:
+    raw = headers.get(TIMEOUT_HEADER)
+    timeout_ms = REQUEST_TIMEOUT_MS
+    if raw:
+        try:
+            timeout_ms = min(max(int(raw), 1), REQUEST_TIMEOUT_MAX_MS)
+        except ValueError:
+            pass
+    return timeout_ms / 1000
+
+
+class DeadlineMiddleware:
+    """Atribui um prazo a cada requisição HTTP e abandona o trabalho quando ele acaba ou o cliente sai
+
+    Middleware ASGI puro. Uma única tarefa lê o canal do cliente e repassa as mensagens ao app
+    (fila de tamanho 1, mantendo o backpressure); ao ver http.disconnect marca o prazo como
+    cancelado e cancela o handler.
+    """
+
+    def __init__(self, app, grace: float = REQUEST_TIMEOUT_GRACE_MS / 1000):
+        self.app = app
+        self.grace = grace
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        deadline = Deadline(_requested_timeout(Headers(scope=scope)))
+        token = _current.set(deadline)
+        messages: asyncio.Queue = asyncio.Queue(maxsize=1)
+        response_started = False
+        response_complete = False
+
+        async def pump():
+            while True:
+                message = await receive()
+                if message["type"] == "http.disconnect":
+                    # Depois da resposta completa o disconnect é normal (ex.: background tasks ainda rodando)
+                    if not response_complete:
+                        deadline.cancelled = True
+                        handler.cancel()
+                    await messages.put(message)
+                    return
+                await messages.put(message)
+
+        async def guarded_send(message):
+            nonlocal response_started, response_complete
+            if message["type"] == "http.response.start":
+                response_started = True
+            elif message["type"] == "http.response.body" and not message.get("more_body"):
+                response_complete = True
+                deadline.release()
+            await send(message)
+
+        handler = asyncio.ensure_future(self.app(scope, messages.get, guarded_send))
+        handler.add_done_callback(lambda task: task.cancelled() or task.exception())
+        reader = asyncio.ensure_future(pump())
+        try:
+            done, _ = await asyncio.wait({handler}, timeout=max(0.0, deadline.remaining()) + self.grace)
+            if handler in done or response_complete:
+                # Com a resposta entregue só restam as background tasks, que terminam sem prazo
+                await handler
+                return
+            # Handler não respeitou o prazo: a thread em uso verá o prazo vencido no próximo check_deadline()
+            handler.cancel()
+            logger.warning(f"Request abandoned after deadline: {scope['method']} {scope['path']}")
+            if not response_started:
+                body = json.dumps({"detail": "Tempo limite da requisição excedido"}).encode()
+                await send({
+                    "type": "http.response.start",
+                    "status": status.HTTP_504_GATEWAY_TIMEOUT,
+                    "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())],
+                })
+                await send({"type": "http.response.body", "body": body})
+        except asyncio.CancelledError:
+            if not deadline.cancelled:
+                raise
+            # Cliente desconectou: não há a quem responder
+            logger.info(f"Request cancelled by client: {scope['method']} {scope['path']}")
+        finally:
+            reader.cancel()
+            _current.reset(token)
@@ -4,10 +4,15 @@ from app.models.user import UserInDB
 from app.services.user_service import user_service
 from app.core.security import rate_limiter
 from app.utils.security import decode_access_token
+from app.repositories.session_repository import session_repository
+from app.core.tracing import span, traced
+from app.core.startup import ADMIN_USERNAME
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="login")
 
-def get_current_user(token: str = Depends(oauth2_scheme)) -> UserInDB:
+# Dependências assíncronas: só consultas em memória, resolvidas no event loop sem passar pelo threadpool
+@traced("dependencies.get_current_user")
+async def get_current_user(token: str = Depends(oauth2_scheme)) -> UserInDB:
     payload = decode_access_token(token)
     
     if not payload:
@@ -25,6 +30,15 @@ def get_current_user(token: str = Depends(oauth2_scheme)) -> UserInDB:
             headers={"WWW-Authenticate": "Bearer"},
         )
     
+    # Sessão encerrada (logout ou "sair de todos os dispositivos")
+    family_id = payload.get("fam")
+    if family_id and not session_repository.is_active(family_id):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Sessão encerrada",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    
     user = user_service.get_user_by_username(username)
     if not user or not user.is_active:
         raise HTTPException(
@@ -43,16 +57,26 @@ def get_current_user(token: str = Depends(oauth2_scheme)) -> UserInDB:
     return user
 
 def rate_limit_dependency(max_requests: int, window_minutes: int = 1):
-    def rate_limit(request: Request):
+    async def rate_limit(request: Request):
         client_ip = request.client.host if request.client else "unknown"
         endpoint = request.url.path
         key = f"{client_ip}:{endpoint}"
         
-        if not rate_limiter.check_limit(key, max_requests, window_minutes):
+        with span("dependencies.rate_limit"):
+            allowed = rate_limiter.check_limit(key, max_requests, window_minutes)
+        if not allowed:
             raise HTTPException(
                 status_code=status.HTTP_429_TOO_MANY_REQUESTS,
                 detail="Muitas tentativas. Tente novamente mais tarde."
             )
         return True
     
-    return rate_limit 
\ No newline at end of file
+    return rate_limit
+
+async def get_admin_user(current_user: UserInDB = Depends(get_current_user)) -> UserInDB:
+    if current_user.username != ADMIN_USERNAME:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Acesso restrito ao administrador"
+        )
+    return current_user 
\ No newline at end of file
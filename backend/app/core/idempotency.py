@@ -0,0 +1,246 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Iterable, KeysView, List, Optional, Tuple
+
+from starlette.datastructures import Headers
+
+from app.utils.security import decode_access_token
+from app.core.memory import memory_registry
+from app.core.maintenance import maintenance
+
+logger = logging.getLogger("idempotency")
+
+IDEMPOTENCY_TTL_SECONDS = int(os.getenv("IDEMPOTENCY_TTL_SECONDS", "86400"))
+IDEMPOTENCY_MAX_ENTRIES = int(os.getenv("IDEMPOTENCY_MAX_ENTRIES", "10000"))
+# Respostas maiores que isso não são guardadas (mantém o cache limitado em memória)
+IDEMPOTENCY_MAX_BODY_BYTES = int(os.getenv("IDEMPOTENCY_MAX_BODY_BYTES", "65536"))
+IDEMPOTENT_METHODS = {"POST", "PUT", "PATCH", "DELETE"}
+IDEMPOTENT_PATH_PREFIX = "/todos"
+# Uploads em streaming: bufferizar o corpo inteiro para o fingerprint anularia o streaming
+_STREAMING_PATHS = {"/todos/import"}
+MAX_KEY_LENGTH = 255
+# Respostas transitórias: a próxima tentativa precisa executar de novo
+_TRANSIENT_STATUSES = {401, 403, 408, 409, 425, 429}
+
+
+class _Entry:
+    __slots__ = ("fingerprint", "expires_at", "response", "future")
+
+    def __init__(self, fingerprint: str, expires_at: float, future: "asyncio.Future"):
+        self.fingerprint = fingerprint
+        self.expires_at = expires_at
+        # (status, headers, body) quando a primeira requisição termina
+        self.response: Optional[Tuple[int, List[Tuple[bytes, bytes]], bytes]] = None
+        self.future = future
+
+
+class IdempotencyCache:
+    """Cache LRU com TTL das respostas por (usuário, Idempotency-Key)"""
+
+    def __init__(self, max_entries: int = IDEMPOTENCY_MAX_ENTRIES, ttl_seconds: int = IDEMPOTENCY_TTL_SECONDS):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[Tuple[str, str], _Entry]" = OrderedDict()
+        # O event loop usa o cache e a thread de manutenção remove as respostas vencidas
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def claim(self, key: Tuple[str, str], fingerprint: str) -> Tuple[_Entry, bool]:
+        """Entrada da chave, criada se ainda não existe; True quando quem chamou deve executar a requisição
+
+        Consulta e criação acontecem sob o lock: entre várias duplicadas, só uma vira dona da chave.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry.response is None or entry.expires_at > time.monotonic():
+                    self._entries.move_to_end(key)
+                    return entry, False
+                del self._entries[key]
+            entry = _Entry(fingerprint, time.monotonic() + self.ttl_seconds, asyncio.get_running_loop().create_future())
+            self._entries[key] = entry
+            while len(self._entries) > self.max_entries:
+                oldest_key, oldest = next(iter(self._entries.items()))
+                if oldest.response is None:
+                    # Não descarta requisições em andamento; fica temporariamente acima do limite
+                    break
+                del self._entries[oldest_key]
+            return entry, True
+
+    def finish(self, key: Tuple[str, str], entry: _Entry, response, cacheable: bool) -> None:
+        with self._lock:
+            if cacheable:
+                entry.response = response
+            elif self._entries.get(key) is entry:
+                del self._entries[key]
+        if not entry.future.done():
+            entry.future.set_result(response if cacheable else None)
+
+    def keys(self) -> KeysView[Tuple[str, str]]:
+        """Visão viva das chaves, para a varredura andar sem copiar (não segura o lock)"""
+        return self._entries.keys()
+
+    def purge_expired(self, keys: Optional[Iterable[Tuple[str, str]]] = None) -> int:
+        """Remove as respostas vencidas (todas, ou só as do lote informado)"""
+        now = time.monotonic()
+        with self._lock:
+            candidates = list(self._entries) if keys is None else keys
+            removed = 0
+            for key in candidates:
+                entry = self._entries.get(key)
+                if entry is not None and entry.response is not None and entry.expires_at <= now:
+                    del self._entries[key]
+                    removed += 1
+            return removed
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+idempotency_cache = IdempotencyCache()
+memory_registry.register("idempotency_cache", lambda: idempotency_cache._entries)
+maintenance.register("idempotency_cache", idempotency_cache.keys, idempotency_cache.purge_expired)
+
+
+def _json_response(status: int, detail: str):
+    body = json.dumps({"detail": detail}).encode()
+    return status, [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())], body
+
+
+class IdempotencyMiddleware:
+    """Reenvia a primeira resposta de uma Idempotency-Key repetida nas escritas em /todos
+
+    Middleware ASGI puro: lê o corpo uma vez, repassa à rota e captura a resposta enquanto a envia.
+    """
+
+    def __init__(self, app, cache: IdempotencyCache = idempotency_cache):
+        self.app = app
+        self.cache = cache
+
+    async def __call__(self, scope, receive, send):
+        if (
+            scope["type"] != "http"
+            or scope["method"] not in IDEMPOTENT_METHODS
+            or not scope["path"].startswith(IDEMPOTENT_PATH_PREFIX)
+            or scope["path"] in _STREAMING_PATHS
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        headers = Headers(scope=scope)
+        idempotency_key = headers.get("idempotency-key")
+        if idempotency_key is None:
+            await self.app(scope, receive, send)
+            return
+        if not idempotency_key or len(idempotency_key) > MAX_KEY_LENGTH:
+            await self._send(send, _json_response(400, "Idempotency-Key inválida"))
+            return
+
+        # Escopo por usuário; sem token válido a própria rota responde 401
+        authorization = headers.get("authorization", "")
+        payload = decode_access_token(authorization[7:]) if authorization.lower().startswith("bearer ") else None
+        if not payload or not payload.get("sub"):
+            await self.app(scope, receive, send)
+            return
+
+        body = bytearray()
+        while True:
+            message = await receive()
+            if message["type"] != "http.request":
+                return
+            body.extend(message.get("body", b""))
+            if not message.get("more_body"):
+                break
+        body = bytes(body)
+
+        fingerprint = hashlib.sha256(
+            scope["method"].encode() + b" " + scope["path"].encode() + b"\n" + body
+        ).hexdigest()
+        cache_key = (payload["sub"], idempotency_key)
+
+        while True:
+            entry, owner = self.cache.claim(cache_key, fingerprint)
+            if owner:
+                break
+            if entry.fingerprint != fingerprint:
+                await self._send(send, _json_response(422, "Idempotency-Key já usada com outra requisição"))
+                return
+            # Requisição original ainda em andamento: espera por ela em vez de executar de novo
+            response = entry.response or await asyncio.shield(entry.future)
+            if response is not None:
+                self.cache.hits += 1
+                logger.info(f"Idempotent replay: {scope['method']} {scope['path']} - User: {payload['sub']}")
+                await self._send(send, response, replayed=True)
+                return
+            # A original falhou (5xx) ou não pôde ser guardada: uma das duplicadas assume a chave,
+            # as demais voltam a esperar por ela
+
+        self.cache.misses += 1
+        status_code = 500
+        response_headers: List[Tuple[bytes, bytes]] = []
+        chunks: List[bytes] = []
+        size = 0
+
+        body_sent = False
+        detached = False
+
+        async def replay_receive():
+            nonlocal body_sent
+            if not body_sent:
+                body_sent = True
+                return {"type": "http.request", "body": body, "more_body": False}
+            return await receive()
+
+        async def capture_send(message):
+            nonlocal status_code, response_headers, size
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                response_headers = list(message.get("headers", []))
+            elif message["type"] == "http.response.body":
+                chunk = message.get("body", b"")
+                size += len(chunk)
+                if size <= IDEMPOTENCY_MAX_BODY_BYTES:
+                    chunks.append(chunk)
+            if not detached:
+                await send(message)
+
+        def finished(task: "asyncio.Task") -> None:
+            completed = not task.cancelled() and task.exception() is None
+            if not completed and not task.cancelled():
+                logger.error(f"Idempotent request failed: {scope['method']} {scope['path']} - {task.exception()}")
+            response = (status_code, response_headers, b"".join(chunks))
+            # Erros 5xx e respostas transitórias não são definitivos
+            cacheable = (
+                completed
+                and status_code < 500
+                and status_code not in _TRANSIENT_STATUSES
+                and size <= IDEMPOTENCY_MAX_BODY_BYTES
+            )
+            self.cache.finish(cache_key, entry, response, cacheable)
+
+        # A escrita roda em uma task própria: se o cliente desistir (desconexão, prazo) depois de a
+        # store ter mudado, ela termina mesmo assim e a resposta fica guardada para a nova tentativa
+        handler = asyncio.ensure_future(self.app(scope, replay_receive, capture_send))
+        handler.add_done_callback(finished)
+        try:
+            await asyncio.shield(handler)
+        except asyncio.CancelledError:
+            detached = True
+            logger.warning(f"Idempotent request detached from cancelled caller: {scope['method']} {scope['path']}")
+            raise
+
+    @staticmethod
+    async def _send(send, response, replayed: bool = False) -> None:
+        status_code, headers, body = response
+        headers = list(headers)
+        if replayed:
+            headers.append((b"idempotent-replayed", b"true"))
+        await send({"type": "http.response.start", "status": status_code, "headers": headers})
+        await send({"type": "http.response.body", "body": body})
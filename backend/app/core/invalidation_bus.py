@@ -0,0 +1,188 @@
+import json
+import logging
+import os
+import socket
+import threading
+import time
+from collections import defaultdict
+from typing import Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger("invalidation_bus")
+
+# Diretório compartilhado pelos workers do mesmo host; vazio = bus apenas local
+INVALIDATION_BUS_DIR = os.getenv("INVALIDATION_BUS_DIR", "")
+# Validade da lista de workers em cache; um worker novo passa a receber invalidações em até esse tempo
+INVALIDATION_BUS_PEER_REFRESH_MS = int(os.getenv("INVALIDATION_BUS_PEER_REFRESH_MS", "1000"))
+
+# Tipos de evento
+TOKEN_REVOKED = "token_revoked"
+USER_DEACTIVATED = "user_deactivated"
+USER_LOCKED = "user_locked"
+TODO_VERSION_BUMPED = "todo_version_bumped"
+SESSION_REVOKED = "session_revoked"
+
+_MAX_DATAGRAM = 65507
+
+
+class Transport:
+    """Transporte do bus; implementações entregam bytes para os outros workers"""
+
+    def start(self, on_message: Callable[[bytes], None]) -> None:
+        pass
+
+    def publish(self, message: bytes) -> None:
+        pass
+
+    def close(self) -> None:
+        pass
+
+
+class LocalTransport(Transport):
+    """Processo único: não há outros workers para notificar"""
+
+
+class UnixSocketTransport(Transport):
+    """Datagramas sobre Unix domain sockets, um socket por worker no diretório compartilhado"""
+
+    def __init__(self, directory: str, peer_refresh_ms: int = INVALIDATION_BUS_PEER_REFRESH_MS):
+        self.directory = directory
+        self.path = os.path.join(directory, f"worker-{os.getpid()}.sock")
+        self.peer_refresh = peer_refresh_ms / 1000
+        self._receiver: Optional[socket.socket] = None
+        self._sender: Optional[socket.socket] = None
+        self._thread: Optional[threading.Thread] = None
+        # Sockets dos outros workers, relidos do diretório no máximo a cada peer_refresh
+        self._peer_cache: Tuple[str, ...] = ()
+        self._peers_expire_at = 0.0
+
+    def start(self, on_message: Callable[[bytes], None]) -> None:
+        os.makedirs(self.directory, exist_ok=True)
+        if os.path.exists(self.path):
+            os.remove(self.path)
+        self._receiver = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        self._receiver.bind(self.path)
+        self._sender = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        self._sender.setblocking(False)
+        self._thread = threading.Thread(
+            target=self._receive_loop, args=(on_message,), name="invalidation-bus", daemon=True
+        )
+        self._thread.start()
+
+    def _receive_loop(self, on_message: Callable[[bytes], None]) -> None:
+        while True:
+            try:
+                message = self._receiver.recv(_MAX_DATAGRAM)
+            except OSError:
+                return
+            if not message:
+                return
+            on_message(message)
+
+    def _scan_peers(self) -> Tuple[str, ...]:
+        try:
+            names = os.listdir(self.directory)
+        except FileNotFoundError:
+            return ()
+        paths = (
+            os.path.join(self.directory, name)
+            for name in names
+            if name.startswith("worker-") and name.endswith(".sock")
+        )
+        return tuple(path for path in paths if path != self.path)
+
+    def _peers(self) -> Tuple[str, ...]:
+        now = time.monotonic()
+        if now >= self._peers_expire_at:
+            self._peer_cache = self._scan_peers()
+            self._peers_expire_at = now + self.peer_refresh
+        return self._peer_cache
+
+    def _drop_peer(self, peer: str) -> None:
+        """Worker que morreu sem remover o socket: sai do cache e do diretório"""
+        self._peer_cache = tuple(path for path in self._peer_cache if path != peer)
+        # Um worker que reiniciou tem outro pid: relê o diretório na próxima publicação
+        self._peers_expire_at = 0.0
+        try:
+            os.remove(peer)
+        except OSError:
+            pass
+
+    def publish(self, message: bytes) -> None:
+        if self._sender is None:
+            return
+        for peer in self._peers():
+            try:
+                self._sender.sendto(message, peer)
+            except (ConnectionRefusedError, FileNotFoundError):
+                self._drop_peer(peer)
+            except BlockingIOError:
+                logger.warning(f"Invalidation dropped, peer queue full: {peer}")
+            except OSError as e:
+                logger.warning(f"Failed to publish invalidation to {peer}: {e}")
+
+    def close(self) -> None:
+        if self._receiver is not None:
+            try:
+                self._receiver.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+            self._receiver.close()
+            self._receiver = None
+        if self._sender is not None:
+            self._sender.close()
+            self._sender = None
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
+
+
+class InvalidationBus:
+    """Pub/sub de invalidações entre workers
+
+    publish() só notifica os outros workers: quem publica já aplicou a mudança localmente.
+    Os handlers inscritos rodam na thread do transporte e devem ser rápidos.
+    """
+
+    def __init__(self, transport: Optional[Transport] = None):
+        self._transport = transport or LocalTransport()
+        self._handlers: Dict[str, List[Callable[[dict], None]]] = defaultdict(list)
+        self._origin = os.getpid()
+
+    def subscribe(self, event_type: str, handler: Callable[[dict], None]) -> None:
+        self._handlers[event_type].append(handler)
+
+    def publish(self, event_type: str, data: dict) -> None:
+        if isinstance(self._transport, LocalTransport):
+            return
+        message = json.dumps({"type": event_type, "origin": self._origin, "data": data}, separators=(",", ":"))
+        self._transport.publish(message.encode())
+
+    def _dispatch(self, message: bytes) -> None:
+        try:
+            event = json.loads(message)
+        except ValueError:
+            logger.warning("Malformed invalidation message ignored")
+            return
+        if event.get("origin") == self._origin:
+            return
+        for handler in self._handlers.get(event.get("type"), []):
+            try:
+                handler(event.get("data") or {})
+            except Exception as e:
+                logger.error(f"Invalidation handler failed for {event.get('type')}: {e}")
+
+    def start(self, transport: Optional[Transport] = None) -> None:
+        if transport is not None:
+            self._transport = transport
+        elif INVALIDATION_BUS_DIR and isinstance(self._transport, LocalTransport):
+            self._transport = UnixSocketTransport(INVALIDATION_BUS_DIR)
+        self._origin = os.getpid()
+        self._transport.start(self._dispatch)
+        logger.info(f"Invalidation bus started ({type(self._transport).__name__})")
+
+    def close(self) -> None:
+        self._transport.close()
+
+
+invalidation_bus = InvalidationBus()
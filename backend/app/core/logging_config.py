@@ -20,6 +20,21 @@ def setup_logging():
         "auth_routes",
         "todos",
         "startup",
+        "persistence",
+        "invalidation_bus",
+        "admission",
+        "import_users",
+        "idempotency",
+        "single_flight",
+        "deadline",
+        "tracing",
+        "admin",
+        "traffic_capture",
+        "replay",
+        "memory",
+        "reminders",
+        "archive",
+        "maintenance",
         "audit"
     ]
     
@@ -0,0 +1,176 @@
+import logging
+import os
+import threading
+import time
+from itertools import islice
+from typing import Callable, Dict, Iterable, Iterator, List, Optional
+
+from app.core.metrics import metrics
+
+logger = logging.getLogger("maintenance")
+
+# Intervalo padrão entre varreduras completas de uma estrutura
+MAINTENANCE_INTERVAL_SECONDS = int(os.getenv("MAINTENANCE_INTERVAL_SECONDS", "60"))
+# Tempo máximo de CPU contínuo de uma fatia; o resto da varredura continua na próxima
+MAINTENANCE_BUDGET_MS = int(os.getenv("MAINTENANCE_BUDGET_MS", "5"))
+# Pausa entre fatias da mesma varredura, para as requisições retomarem o GIL
+MAINTENANCE_PAUSE_MS = int(os.getenv("MAINTENANCE_PAUSE_MS", "50"))
+# Chaves entregues por chamada à função de limpeza (uma aquisição de lock por lote)
+MAINTENANCE_BATCH_SIZE = int(os.getenv("MAINTENANCE_BATCH_SIZE", "256"))
+
+
+class _Sweep:
+    __slots__ = ("name", "keys", "sweep", "interval", "budget", "next_run", "cursor", "visited", "reclaimed")
+
+    def __init__(self, name: str, keys: Callable[[], Iterable], sweep: Callable[[List], int], interval: float, budget: float):
+        self.name = name
+        self.keys = keys
+        self.sweep = sweep
+        self.interval = interval
+        self.budget = budget
+        self.next_run = time.monotonic() + interval
+        # Iterador sobre as chaves vivas da estrutura durante uma varredura; None entre varreduras
+        self.cursor: Optional[Iterator] = None
+        self.visited = 0
+        self.reclaimed = 0
+
+
+class MaintenanceScheduler:
+    """Thread única de limpeza das estruturas em memória, fora do caminho das requisições
+
+    Cada tarefa registra keys() (uma visão viva das chaves, como dict.keys(), sem cópia) e
+    sweep(lote), que remove o que estiver vencido no lote e devolve quantos itens liberou. A
+    varredura anda em fatias limitadas pelo orçamento de tempo, retomando do cursor na fatia
+    seguinte, então cada fatia custa proporcional ao lote e não ao tamanho da estrutura. Chaves
+    que sumiram nesse meio tempo devem ser ignoradas pelo sweep.
+    """
+
+    def __init__(
+        self,
+        budget_ms: int = MAINTENANCE_BUDGET_MS,
+        pause_ms: int = MAINTENANCE_PAUSE_MS,
+        batch_size: int = MAINTENANCE_BATCH_SIZE,
+    ):
+        self.budget = budget_ms / 1000
+        self.pause = pause_ms / 1000
+        self.batch_size = batch_size
+        self._tasks: Dict[str, _Sweep] = {}
+        self._wakeup = threading.Condition()
+        self._stopping = False
+        self._thread: Optional[threading.Thread] = None
+
+    def register(
+        self,
+        name: str,
+        keys: Callable[[], Iterable],
+        sweep: Callable[[List], int],
+        interval: float = MAINTENANCE_INTERVAL_SECONDS,
+        budget_ms: Optional[int] = None,
+    ) -> None:
+        budget = budget_ms / 1000 if budget_ms is not None else self.budget
+        with self._wakeup:
+            self._tasks[name] = _Sweep(name, keys, sweep, interval, budget)
+            self._wakeup.notify()
+
+    def _next_batch(self, task: _Sweep) -> List:
+        try:
+            return list(islice(task.cursor, self.batch_size))
+        except RuntimeError:
+            # A estrutura mudou de tamanho entre duas fatias e o iterador ficou inválido: recomeça
+            # pulando o que já foi visto, menos o que esta varredura removeu (saiu da frente do
+            # cursor). Remoções de terceiros podem fazer pular algumas chaves até a próxima varredura.
+            task.cursor = islice(iter(task.keys()), max(0, task.visited - task.reclaimed), None)
+            return list(islice(task.cursor, self.batch_size))
+
+    def run_slice(self, task: _Sweep) -> bool:
+        """Uma fatia da varredura da tarefa; True quando a varredura terminou"""
+        started = time.perf_counter()
+        deadline = started + task.budget
+        if task.cursor is None:
+            task.cursor = iter(task.keys())
+            task.visited = 0
+            task.reclaimed = 0
+        reclaimed = 0
+        finished = False
+        while True:
+            batch = self._next_batch(task)
+            if batch:
+                task.visited += len(batch)
+                removed = task.sweep(batch)
+                reclaimed += removed
+                task.reclaimed += removed
+            if len(batch) < self.batch_size:
+                finished = True
+                break
+            if time.perf_counter() >= deadline:
+                break
+        elapsed = time.perf_counter() - started
+
+        metrics.inc("maintenance_runs_total", task=task.name)
+        metrics.inc("maintenance_run_seconds_total", elapsed, task=task.name)
+        metrics.set_gauge("maintenance_last_run_seconds", elapsed, task=task.name)
+        if reclaimed:
+            metrics.inc("maintenance_reclaimed_total", reclaimed, task=task.name)
+
+        if finished:
+            if task.reclaimed:
+                logger.info(f"{task.name}: reclaimed {task.reclaimed} of {task.visited} entries")
+            task.cursor = None
+        return finished
+
+    def run_all(self) -> int:
+        """Varre todas as tarefas até o fim, de uma vez (testes e ferramentas)"""
+        reclaimed = 0
+        for task in list(self._tasks.values()):
+            while not self.run_slice(task):
+                pass
+            reclaimed += task.reclaimed
+        return reclaimed
+
+    # --- thread ---
+
+    def start(self) -> None:
+        if self._thread is not None or self.budget <= 0:
+            return
+        self._stopping = False
+        self._thread = threading.Thread(target=self._run, name="maintenance", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        if self._thread is None:
+            return
+        with self._wakeup:
+            self._stopping = True
+            self._wakeup.notify()
+        self._thread.join(timeout=5)
+        self._thread = None
+
+    def _next_task(self) -> Optional[_Sweep]:
+        """Bloqueia até a próxima tarefa vencer (ou stop)"""
+        with self._wakeup:
+            while not self._stopping:
+                task = min(self._tasks.values(), key=lambda t: t.next_run, default=None)
+                if task is None:
+                    self._wakeup.wait()
+                    continue
+                delay = task.next_run - time.monotonic()
+                if delay <= 0:
+                    return task
+                self._wakeup.wait(delay)
+            return None
+
+    def _run(self) -> None:
+        while True:
+            task = self._next_task()
+            if task is None:
+                return
+            try:
+                finished = self.run_slice(task)
+            except Exception as e:
+                logger.error(f"{task.name}: maintenance sweep failed: {e}")
+                task.cursor = None
+                finished = True
+            task.next_run = time.monotonic() + (task.interval if finished else self.pause)
+
+
+maintenance = MaintenanceScheduler()
@@ -0,0 +1,254 @@
+import gc
+import itertools
+import logging
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from collections import OrderedDict
+from types import FunctionType, ModuleType
+from typing import Any, Callable, Dict, List, Optional
+
+from app.core.metrics import metrics
+
+logger = logging.getLogger("memory")
+
+# Limites suaves por estrutura, em número de entradas: "rate_limiter=100000,token_blacklist=50000"
+MEMORY_SOFT_LIMITS = os.getenv("MEMORY_SOFT_LIMITS", "")
+MEMORY_CHECK_INTERVAL_SECONDS = int(os.getenv("MEMORY_CHECK_INTERVAL_SECONDS", "60"))
+# Itens amostrados para estimar o tamanho profundo de estruturas grandes
+MEMORY_SAMPLE_SIZE = int(os.getenv("MEMORY_SAMPLE_SIZE", "200"))
+TRACEMALLOC_FRAMES = int(os.getenv("TRACEMALLOC_FRAMES", "10"))
+TRACEMALLOC_MAX_SNAPSHOTS = int(os.getenv("TRACEMALLOC_MAX_SNAPSHOTS", "5"))
+
+_SKIP_TYPES = (type, ModuleType, FunctionType)
+
+
+def deep_sizeof(obj: Any, seen: Optional[set] = None) -> int:
+    """Soma sys.getsizeof do objeto e de tudo que ele referencia (containers, __dict__, __slots__)"""
+    if seen is None:
+        seen = set()
+    size = 0
+    stack = [obj]
+    while stack:
+        current = stack.pop()
+        if id(current) in seen or isinstance(current, _SKIP_TYPES):
+            continue
+        seen.add(id(current))
+        size += sys.getsizeof(current)
+        if isinstance(current, dict):
+            stack.extend(current.keys())
+            stack.extend(current.values())
+        elif isinstance(current, (list, tuple, set, frozenset)):
+            stack.extend(current)
+        elif isinstance(current, (str, bytes, bytearray, int, float, bool)) or current is None:
+            continue
+        else:
+            if hasattr(current, "__dict__"):
+                stack.append(current.__dict__)
+            for cls in type(current).__mro__:
+                for slot in getattr(cls, "__slots__", ()):
+                    value = getattr(current, slot, None)
+                    if value is not None:
+                        stack.append(value)
+    return size
+
+
+def _estimate(structure: Any, sample_size: int) -> Dict[str, Any]:
+    """Tamanho profundo exato para estruturas pequenas; nas grandes, extrapola a partir de uma amostra"""
+    count = len(structure)
+    if count <= sample_size:
+        return {"entries": count, "deep_bytes": deep_sizeof(structure), "estimated": False}
+    # Objetos compartilhados entre itens (ex.: strings internadas) contam uma vez na amostra
+    seen: set = set()
+    if isinstance(structure, dict):
+        sample = list(itertools.islice(structure.items(), sample_size))
+        sampled = sum(deep_sizeof(key, seen) + deep_sizeof(value, seen) for key, value in sample)
+    else:
+        sample = list(itertools.islice(structure, sample_size))
+        sampled = sum(deep_sizeof(item, seen) for item in sample)
+    deep_bytes = sys.getsizeof(structure) + int(sampled / len(sample) * count)
+    return {"entries": count, "deep_bytes": deep_bytes, "estimated": True}
+
+
+def _parse_limits(raw: str) -> Dict[str, int]:
+    limits = {}
+    for item in raw.split(","):
+        name, _, value = item.partition("=")
+        if name.strip() and value.strip().isdigit():
+            limits[name.strip()] = int(value)
+    return limits
+
+
+def _rss_bytes() -> Optional[int]:
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def process_memory() -> Dict[str, Optional[int]]:
+    try:
+        import resource
+        max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+    except ImportError:
+        max_rss = None
+    return {"rss_bytes": _rss_bytes(), "max_rss_bytes": max_rss, "gc_objects": len(gc.get_objects())}
+
+
+class MemoryRegistry:
+    """Estruturas de longa duração registradas pelos próprios módulos, com limites suaves por entradas"""
+
+    def __init__(self, soft_limits: str = MEMORY_SOFT_LIMITS):
+        self._structures: "OrderedDict[str, Callable[[], Any]]" = OrderedDict()
+        self._soft_limits = _parse_limits(soft_limits)
+        self._over_limit: set = set()
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    def register(self, name: str, getter: Callable[[], Any], soft_limit: Optional[int] = None) -> None:
+        """getter devolve a estrutura atual (algo com len()); a env MEMORY_SOFT_LIMITS tem precedência"""
+        self._structures[name] = getter
+        if soft_limit is not None:
+            self._soft_limits.setdefault(name, soft_limit)
+
+    def counts(self) -> Dict[str, int]:
+        return {name: len(getter()) for name, getter in self._structures.items()}
+
+    def report(self, exact: bool = False) -> Dict[str, Any]:
+        sample_size = sys.maxsize if exact else MEMORY_SAMPLE_SIZE
+        structures = {}
+        for name, getter in self._structures.items():
+            started = time.perf_counter()
+            for attempt in range(3):
+                try:
+                    entry = _estimate(getter(), sample_size)
+                    break
+                except RuntimeError:
+                    # Estrutura alterada por outra thread durante a varredura
+                    if attempt == 2:
+                        entry = {"entries": len(getter()), "deep_bytes": None, "estimated": True}
+            entry["soft_limit"] = self._soft_limits.get(name)
+            entry["elapsed_ms"] = round((time.perf_counter() - started) * 1000, 2)
+            structures[name] = entry
+        return {"process": process_memory(), "structures": structures}
+
+    def check_limits(self) -> List[str]:
+        """Atualiza os gauges e avisa (uma vez por travessia) quando uma estrutura passa do limite"""
+        exceeded = []
+        for name, count in self.counts().items():
+            metrics.set_gauge("memory_structure_entries", count, structure=name)
+            limit = self._soft_limits.get(name)
+            if limit is None:
+                continue
+            if count > limit:
+                exceeded.append(name)
+                if name not in self._over_limit:
+                    self._over_limit.add(name)
+                    metrics.inc("memory_soft_limit_exceeded_total", structure=name)
+                    logger.warning(f"Soft memory limit exceeded: {name} has {count} entries (limit {limit})")
+            elif name in self._over_limit:
+                self._over_limit.discard(name)
+                logger.info(f"Back under soft memory limit: {name} has {count} entries (limit {limit})")
+        rss = _rss_bytes()
+        if rss is not None:
+            metrics.set_gauge("process_rss_bytes", rss)
+        return exceeded
+
+    def start(self) -> None:
+        if self._thread is not None or MEMORY_CHECK_INTERVAL_SECONDS <= 0:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="memory-check", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread = None
+
+    def _run(self) -> None:
+        while not self._stop.wait(MEMORY_CHECK_INTERVAL_SECONDS):
+            try:
+                self.check_limits()
+            except Exception as e:
+                logger.error(f"Memory limit check failed: {e}")
+
+
+memory_registry = MemoryRegistry()
+
+
+class TracemallocSnapshots:
+    """Snapshots do tracemalloc sob demanda; o tracing só fica ligado entre start e stop"""
+
+    def __init__(self, max_snapshots: int = TRACEMALLOC_MAX_SNAPSHOTS):
+        self.max_snapshots = max_snapshots
+        self._snapshots: "OrderedDict[int, tracemalloc.Snapshot]" = OrderedDict()
+        self._next_id = 1
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _filtered(snapshot: tracemalloc.Snapshot) -> tracemalloc.Snapshot:
+        return snapshot.filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+            tracemalloc.Filter(False, "<unknown>"),
+        ))
+
+    def take(self, top: int = 20, key_type: str = "lineno") -> Dict[str, Any]:
+        with self._lock:
+            started_tracing = not tracemalloc.is_tracing()
+            if started_tracing:
+                # A primeira chamada só liga o tracing: alocações anteriores não aparecem
+                tracemalloc.start(TRACEMALLOC_FRAMES)
+            snapshot = self._filtered(tracemalloc.take_snapshot())
+            snapshot_id = self._next_id
+            self._next_id += 1
+            self._snapshots[snapshot_id] = snapshot
+            while len(self._snapshots) > self.max_snapshots:
+                self._snapshots.popitem(last=False)
+        current, peak = tracemalloc.get_traced_memory()
+        return {
+            "id": snapshot_id,
+            "tracing_started": started_tracing,
+            "traced_bytes": current,
+            "traced_peak_bytes": peak,
+            "top": [self._stat(stat) for stat in snapshot.statistics(key_type)[:top]],
+        }
+
+    def diff(self, base_id: int, target_id: int, top: int = 20, key_type: str = "lineno") -> Optional[Dict[str, Any]]:
+        with self._lock:
+            base = self._snapshots.get(base_id)
+            target = self._snapshots.get(target_id)
+        if base is None or target is None:
+            return None
+        stats = target.compare_to(base, key_type)
+        return {
+            "base": base_id,
+            "target": target_id,
+            "size_diff_bytes": sum(stat.size_diff for stat in stats),
+            "top": [self._stat(stat) for stat in stats[:top]],
+        }
+
+    def list_ids(self) -> List[int]:
+        with self._lock:
+            return list(self._snapshots)
+
+    def stop(self) -> None:
+        with self._lock:
+            self._snapshots.clear()
+            if tracemalloc.is_tracing():
+                tracemalloc.stop()
+
+    @staticmethod
+    def _stat(stat) -> Dict[str, Any]:
+        frame = stat.traceback[0]
+        entry = {"file": frame.filename, "line": frame.lineno, "size_bytes": stat.size, "count": stat.count}
+        if hasattr(stat, "size_diff"):
+            entry["size_diff_bytes"] = stat.size_diff
+            entry["count_diff"] = stat.count_diff
+        return entry
+
+
+tracemalloc_snapshots = TracemallocSnapshots()
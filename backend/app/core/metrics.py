@@ -0,0 +1,40 @@
+import threading
+from typing import Dict, Tuple
+
+# (nome, labels ordenados) -> valor
+_Key = Tuple[str, Tuple[Tuple[str, str], ...]]
+
+
+def _key(name: str, labels: Dict[str, str]) -> _Key:
+    return name, tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+class Metrics:
+    """Contadores e gauges em memória do processo, lidos por /debug/metrics"""
+
+    def __init__(self):
+        self._counters: Dict[_Key, float] = {}
+        self._gauges: Dict[_Key, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, name: str, value: float = 1, **labels) -> None:
+        key = _key(name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def set_gauge(self, name: str, value: float, **labels) -> None:
+        with self._lock:
+            self._gauges[_key(name, labels)] = value
+
+    def snapshot(self) -> dict:
+        def render(values: Dict[_Key, float]) -> list:
+            return [
+                {"name": name, "labels": dict(labels), "value": value}
+                for (name, labels), value in sorted(values.items())
+            ]
+
+        with self._lock:
+            return {"counters": render(self._counters), "gauges": render(self._gauges)}
+
+
+metrics = Metrics()
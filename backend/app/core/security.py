@@ -1,6 +1,10 @@
 from datetime import datetime, timedelta
-from typing import Dict
+from typing import Dict, Iterable, KeysView
 import logging
+import threading
+from app.core.invalidation_bus import invalidation_bus, USER_LOCKED
+from app.core.memory import memory_registry
+from app.core.maintenance import maintenance
 
 security_logger = logging.getLogger("security")
 
@@ -19,6 +23,17 @@ class SecurityManager:
         if user.failed_login_attempts >= self.max_attempts:
             user.locked_until = datetime.utcnow() + self.lockout_duration
             security_logger.warning(f"Account locked: {user.username}")
+            invalidation_bus.publish(USER_LOCKED, {
+                "username": user.username,
+                "locked_until": user.locked_until.isoformat()
+            })
+    
+    def clear_expired_lock(self, user) -> bool:
+        """Apaga um locked_until já vencido (o contador de falhas continua valendo)"""
+        if user.locked_until is None or user.locked_until > datetime.utcnow():
+            return False
+        user.locked_until = None
+        return True
     
     def reset_failed_attempts(self, user) -> None:
         user.failed_login_attempts = 0
@@ -28,21 +43,43 @@ class SecurityManager:
 class RateLimiter:
     def __init__(self):
         self._storage: Dict[str, list] = {}
+        # Maior janela já usada: uma chave sem acessos dentro dela não limita mais nada
+        self._max_window_seconds = 0
+        self._lock = threading.Lock()
     
     def check_limit(self, key: str, max_requests: int, window_minutes: int) -> bool:
         current_time = datetime.utcnow().timestamp()
         window_start = current_time - (window_minutes * 60)
         
-        if key not in self._storage:
-            self._storage[key] = []
-        
-        self._storage[key] = [t for t in self._storage[key] if t > window_start]
-        
-        if len(self._storage[key]) >= max_requests:
-            return False
-        
-        self._storage[key].append(current_time)
-        return True
+        with self._lock:
+            self._max_window_seconds = max(self._max_window_seconds, window_minutes * 60)
+            hits = [t for t in self._storage.get(key, ()) if t > window_start]
+            self._storage[key] = hits
+            
+            if len(hits) >= max_requests:
+                return False
+            
+            hits.append(current_time)
+            return True
+    
+    def keys(self) -> KeysView[str]:
+        """Visão viva das chaves, para a varredura andar sem copiar (não segura o lock)"""
+        return self._storage.keys()
+    
+    def purge_stale(self, keys: Iterable[str]) -> int:
+        """Remove as chaves (de um lote) cujo último acesso já saiu de todas as janelas"""
+        cutoff = datetime.utcnow().timestamp() - self._max_window_seconds
+        removed = 0
+        with self._lock:
+            for key in keys:
+                hits = self._storage.get(key)
+                if hits is not None and (not hits or hits[-1] <= cutoff):
+                    del self._storage[key]
+                    removed += 1
+        return removed
 
 security_manager = SecurityManager()
-rate_limiter = RateLimiter() 
\ No newline at end of file
+rate_limiter = RateLimiter()
+
+memory_registry.register("rate_limiter", lambda: rate_limiter._storage)
+maintenance.register("rate_limiter", rate_limiter.keys, rate_limiter.purge_stale)
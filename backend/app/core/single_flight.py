@@ -0,0 +1,97 @@
+import asyncio
+import logging
+import os
+import threading
+from typing import Any, Callable, Dict, Hashable, Optional
+
+from app.core.deadline import DeadlineExceeded, check_deadline, remaining_time
+
+logger = logging.getLogger("single_flight")
+
+# Quanto um seguidor espera pela execução em andamento antes de computar por conta própria
+SINGLE_FLIGHT_TIMEOUT_MS = int(os.getenv("SINGLE_FLIGHT_TIMEOUT_MS", "2000"))
+
+
+class _Call:
+    __slots__ = ("done", "result", "error", "followers")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+        self.followers = 0
+
+
+class SingleFlight:
+    """Agrupa chamadas concorrentes com a mesma chave em uma única execução
+
+    A primeira chamada (líder) executa; as que chegam enquanto ela está em andamento esperam e
+    recebem o mesmo resultado (ou a mesma exceção). Nada é guardado depois que o líder termina:
+    a chave deve incluir a versão dos dados para que leituras após uma escrita não se juntem a
+    uma execução antiga.
+
+    Seguidores esperam bloqueando a thread: do() roda em threads (rotas síncronas ou
+    run_in_threadpool) e recusa ser chamado no event loop, que ficaria parado durante a espera.
+    """
+
+    def __init__(self, name: str, timeout: float = SINGLE_FLIGHT_TIMEOUT_MS / 1000):
+        self.name = name
+        self.timeout = timeout
+        self._calls: Dict[Hashable, _Call] = {}
+        self._lock = threading.Lock()
+        self.executions = 0
+        self.shared = 0
+        self.timeouts = 0
+
+    def do(self, key: Hashable, fn: Callable[[], Any]) -> Any:
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            pass
+        else:
+            raise RuntimeError(f"{self.name}: SingleFlight.do blocks and must not run on the event loop")
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self.executions += 1
+            else:
+                call.followers += 1
+
+        if leader:
+            try:
+                call.result = fn()
+            except BaseException as e:
+                call.error = e
+                raise
+            finally:
+                with self._lock:
+                    del self._calls[key]
+                call.done.set()
+            return call.result
+
+        if not call.done.wait(min(self.timeout, remaining_time(self.timeout))):
+            check_deadline()
+            # Líder lento ou travado: não prende o seguidor além do prazo
+            self.timeouts += 1
+            logger.warning(f"{self.name}: in-flight call exceeded {self.timeout}s, computing independently")
+            return fn()
+        if isinstance(call.error, DeadlineExceeded):
+            # O prazo (ou a desconexão) era do líder, não deste seguidor
+            return self.do(key, fn)
+        self.shared += 1
+        if call.error is not None:
+            raise call.error
+        return call.result
+
+    def stats(self) -> dict:
+        return {
+            "in_flight": len(self._calls),
+            "executions": self.executions,
+            "shared": self.shared,
+            "timeouts": self.timeouts,
+        }
+
+
+todo_reads = SingleFlight("todo_reads")
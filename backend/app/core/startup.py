@@ -1,28 +1,97 @@
 from app.models.user import UserInDB
 from app.repositories.user_repository import user_repository
-from app.utils.security import get_password_hash
+from app.repositories.persistence import persistence, PersistenceLocked
+from app.repositories.archive import archive_store
+from app.repositories.session_repository import session_repository
+from app.services.todo_service import TodoService
+from app.core.startup_profiler import readiness
+from app.utils.security import get_password_hash, get_pwd_context
 from datetime import datetime
+import os
+import threading
 import logging
 
 logger = logging.getLogger("startup")
 
+ADMIN_USERNAME = "admin"
+# Hash bcrypt pré-calculado de "TestAdmin123!", evita o custo do bcrypt no boot.
+# ADMIN_PASSWORD (sem ADMIN_PASSWORD_HASH) faz o hash em background, com readiness bloqueado.
+ADMIN_PASSWORD = os.getenv("ADMIN_PASSWORD")
+ADMIN_PASSWORD_HASH = os.getenv(
+    "ADMIN_PASSWORD_HASH",
+    "" if ADMIN_PASSWORD else "$2b$08$OGhwNe19EZL5/Algtga/POLtZJOEAtdq2BxFSkchYRTw4iszylwvm"
+)
+
+def init_persistence():
+    """Registra as stores em memória e restaura o último estado salvo (snapshot + journal)"""
+    persistence.register("users", user_repository)
+    persistence.register("todos", TodoService)
+    persistence.register("sessions", session_repository)
+    try:
+        persistence.start()
+    except PersistenceLocked:
+        # Dois escritores no mesmo diretório apagariam o journal um do outro: não sobe
+        raise
+    except Exception as e:
+        logger.error(f"Failed to restore persisted state: {e}")
+        return
+    # Só depois da carga completa se sabe quais segmentos do arquivo o journal confirmou
+    if persistence.enabled:
+        archive_store.remove_orphans()
+
+def shutdown_persistence():
+    persistence.stop()
+    archive_store.close()
+
+def _create_admin(hashed_password: str):
+    admin_user = UserInDB(
+        username=ADMIN_USERNAME,
+        password=hashed_password,
+        created_at=datetime.utcnow(),
+        is_active=True,
+        failed_login_attempts=0
+    )
+
+    # Falha (ValueError) se o admin já existir: nunca cria um segundo registro com o mesmo nome
+    user_repository.create(admin_user, claim_reserved=True)
+    logger.info("✅ Admin user created for test environment")
+    if not ADMIN_PASSWORD:
+        logger.info("📋 Test credentials: admin / TestAdmin123!")
+
+def _seed_admin_deferred():
+    try:
+        _create_admin(get_password_hash(ADMIN_PASSWORD))
+    except Exception as e:
+        logger.error(f"Failed to create admin user: {e}")
+    finally:
+        readiness.mark_done("admin_seed")
+
 def init_test_environment():
-    if not user_repository.get_all():
+    if user_repository.get_all():
+        return
+
+    if ADMIN_PASSWORD_HASH:
         try:
-            admin_password = "TestAdmin123!"
-            hashed_password = get_password_hash(admin_password)
-            
-            admin_user = UserInDB(
-                username="admin",
-                password=hashed_password,
-                created_at=datetime.utcnow(),
-                is_active=True,
-                failed_login_attempts=0
-            )
-            
-            user_repository.create(admin_user)
-            logger.info("✅ Admin user created for test environment")
-            logger.info("📋 Test credentials: admin / TestAdmin123!")
-            
+            _create_admin(ADMIN_PASSWORD_HASH)
         except Exception as e:
-            logger.error(f"Failed to create admin user: {e}") 
\ No newline at end of file
+            logger.error(f"Failed to create admin user: {e}")
+        return
+
+    # Sem hash pré-calculado: o bcrypt roda fora do caminho de inicialização. O nome fica
+    # reservado desde já: um cadastro de "admin" durante o hash ganharia acesso de admin
+    user_repository.reserve(ADMIN_USERNAME)
+    readiness.add_gate("admin_seed")
+    threading.Thread(target=_seed_admin_deferred, name="admin-seed", daemon=True).start()
+
+def _calibrate_password_hashing():
+    try:
+        get_pwd_context()
+    except Exception as e:
+        logger.error(f"Failed to calibrate password hashing: {e}")
+    finally:
+        readiness.mark_done("password_hashing")
+
+def init_password_hashing():
+    """Calibra o custo do hash de senha em background; o readiness espera a calibração terminar"""
+    readiness.add_gate("password_hashing")
+    threading.Thread(target=_calibrate_password_hashing, name="password-calibration", daemon=True).start()
@@ -0,0 +1,66 @@
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Tuple
+
+logger = logging.getLogger("startup")
+
+# Referência tomada no primeiro import deste módulo (início do carregamento da app)
+_PROCESS_T0 = time.perf_counter()
+
+
+class StartupTimer:
+    """Mede o custo de cada import e etapa de inicialização da aplicação"""
+
+    def __init__(self):
+        self._phases: List[Tuple[str, float]] = []
+
+    @contextmanager
+    def phase(self, name: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._phases.append((name, time.perf_counter() - started))
+
+    @property
+    def phases(self) -> List[Tuple[str, float]]:
+        return list(self._phases)
+
+    def report(self) -> None:
+        total = time.perf_counter() - _PROCESS_T0
+        logger.info(f"Startup finished in {total * 1000:.1f}ms")
+        for name, duration in sorted(self._phases, key=lambda p: p[1], reverse=True):
+            logger.info(f"  {duration * 1000:8.1f}ms  {name}")
+
+
+class Readiness:
+    """Controla o readiness: a app só fica pronta quando todas as etapas pendentes terminam"""
+
+    def __init__(self):
+        self._pending: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def add_gate(self, name: str) -> None:
+        with self._lock:
+            self._pending[name] = time.perf_counter()
+
+    def mark_done(self, name: str) -> None:
+        with self._lock:
+            started = self._pending.pop(name, None)
+        if started is not None:
+            logger.info(f"Readiness gate '{name}' released after {(time.perf_counter() - started) * 1000:.1f}ms")
+
+    @property
+    def pending(self) -> List[str]:
+        with self._lock:
+            return list(self._pending)
+
+    @property
+    def is_ready(self) -> bool:
+        return not self._pending
+
+
+startup_timer = StartupTimer()
+readiness = Readiness()
@@ -0,0 +1,262 @@
+import functools
+import inspect
+import json
+import logging
+import os
+import queue
+import random
+import secrets
+import threading
+import time
+from collections import deque
+from contextvars import ContextVar
+from typing import List, Optional
+
+from starlette.datastructures import Headers
+
+from app.core.memory import memory_registry
+
+logger = logging.getLogger("tracing")
+
+# Fração das requisições sem traceparent que são amostradas (0 = tracing desligado)
+TRACE_SAMPLE_RATE = float(os.getenv("TRACE_SAMPLE_RATE", "0"))
+# Spans exportados mantidos em memória para /debug/traces
+TRACE_RING_SIZE = int(os.getenv("TRACE_RING_SIZE", "2048"))
+# Arquivo NDJSON opcional, um span por linha
+TRACE_EXPORT_FILE = os.getenv("TRACE_EXPORT_FILE", "")
+TRACE_EXPORT_INTERVAL_MS = int(os.getenv("TRACE_EXPORT_INTERVAL_MS", "1000"))
+TRACE_EXPORT_BATCH = int(os.getenv("TRACE_EXPORT_BATCH", "512"))
+
+
+class Span:
+    __slots__ = ("trace_id", "span_id", "parent_id", "name", "start_ns", "end_ns", "attributes", "error")
+
+    def __init__(self, trace_id: str, parent_id: Optional[str], name: str, attributes: Optional[dict] = None):
+        self.trace_id = trace_id
+        self.span_id = secrets.token_hex(8)
+        self.parent_id = parent_id
+        self.name = name
+        self.start_ns = time.time_ns()
+        self.end_ns = 0
+        self.attributes = attributes or {}
+        self.error: Optional[str] = None
+
+    def set(self, key: str, value) -> None:
+        self.attributes[key] = value
+
+    def to_dict(self) -> dict:
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "start_ns": self.start_ns,
+            "duration_us": (self.end_ns - self.start_ns) // 1000,
+            "attributes": self.attributes,
+            "error": self.error,
+        }
+
+
+# Span ativo; None = requisição não amostrada, e toda instrumentação vira no-op
+_current: ContextVar[Optional[Span]] = ContextVar("current_span", default=None)
+
+
+class _NoopScope:
+    __slots__ = ()
+
+    def __enter__(self):
+        return None
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NOOP = _NoopScope()
+
+
+class _SpanScope:
+    __slots__ = ("span", "_token")
+
+    def __init__(self, span: Span):
+        self.span = span
+        self._token = None
+
+    def __enter__(self) -> Span:
+        self._token = _current.set(self.span)
+        return self.span
+
+    def __exit__(self, exc_type, exc, tb):
+        span = self.span
+        span.end_ns = time.time_ns()
+        if exc_type is not None:
+            span.error = exc_type.__name__
+        _current.reset(self._token)
+        exporter.export(span)
+        return False
+
+
+def span(name: str, **attributes):
+    """Abre um span filho do atual; sem trace amostrado devolve um contexto vazio"""
+    parent = _current.get()
+    if parent is None:
+        return _NOOP
+    return _SpanScope(Span(parent.trace_id, parent.span_id, name, attributes))
+
+
+def traced(name: Optional[str] = None):
+    """Decorator equivalente a envolver a função inteira em span(name)"""
+    def decorator(func):
+        span_name = name or func.__qualname__
+
+        if inspect.iscoroutinefunction(func):
+            # Continua corrotina: o FastAPI decide entre event loop e threadpool por isso
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                parent = _current.get()
+                if parent is None:
+                    return await func(*args, **kwargs)
+                with _SpanScope(Span(parent.trace_id, parent.span_id, span_name)):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            parent = _current.get()
+            if parent is None:
+                return func(*args, **kwargs)
+            with _SpanScope(Span(parent.trace_id, parent.span_id, span_name)):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def current_trace_id() -> Optional[str]:
+    current = _current.get()
+    return current.trace_id if current is not None else None
+
+
+def parse_traceparent(value: Optional[str]):
+    """W3C traceparent: 00-<trace_id 32 hex>-<parent_id 16 hex>-<flags>; devolve (trace_id, parent_id, sampled)"""
+    if not value:
+        return None
+    parts = value.strip().split("-")
+    if len(parts) != 4 or len(parts[1]) != 32 or len(parts[2]) != 16 or len(parts[3]) != 2:
+        return None
+    try:
+        int(parts[1], 16), int(parts[2], 16)
+        flags = int(parts[3], 16)
+    except ValueError:
+        return None
+    if parts[1] == "0" * 32 or parts[2] == "0" * 16:
+        return None
+    return parts[1], parts[2], bool(flags & 0x01)
+
+
+class TraceExporter:
+    """Exporta spans finalizados em lotes por uma thread própria: anel em memória e arquivo opcional"""
+
+    def __init__(self, ring_size: int = TRACE_RING_SIZE, path: str = TRACE_EXPORT_FILE):
+        self.path = path
+        self._ring: deque = deque(maxlen=ring_size)
+        self._queue: "queue.SimpleQueue[Optional[Span]]" = queue.SimpleQueue()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self.exported = 0
+
+    def export(self, finished: Span) -> None:
+        if self._thread is None:
+            # Exportador não iniciado (ferramentas, scripts): exporta direto
+            self._flush([finished])
+            return
+        self._queue.put(finished)
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, name="trace-exporter", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        if self._thread is None:
+            return
+        self._queue.put(None)
+        self._thread.join(timeout=5)
+        self._thread = None
+
+    def _run(self) -> None:
+        interval = TRACE_EXPORT_INTERVAL_MS / 1000
+        running = True
+        while running:
+            batch: List[Span] = []
+            try:
+                item = self._queue.get(timeout=interval)
+                while True:
+                    if item is None:
+                        running = False
+                        break
+                    batch.append(item)
+                    if len(batch) >= TRACE_EXPORT_BATCH:
+                        break
+                    item = self._queue.get_nowait()
+            except queue.Empty:
+                pass
+            if batch:
+                self._flush(batch)
+
+    def _flush(self, batch: List[Span]) -> None:
+        records = [s.to_dict() for s in batch]
+        with self._lock:
+            self._ring.extend(records)
+            self.exported += len(records)
+        if self.path:
+            try:
+                with open(self.path, "a", encoding="utf-8") as f:
+                    f.write("".join(json.dumps(r, separators=(",", ":")) + "\n" for r in records))
+            except OSError as e:
+                logger.error(f"Failed to write traces to {self.path}: {e}")
+
+    def recent(self, limit: int = 100, trace_id: Optional[str] = None) -> List[dict]:
+        with self._lock:
+            records = list(self._ring)
+        if trace_id:
+            records = [r for r in records if r["trace_id"] == trace_id]
+        return records[-limit:]
+
+
+exporter = TraceExporter()
+memory_registry.register("trace_ring", lambda: exporter._ring)
+
+
+class TracingMiddleware:
+    """Abre o span raiz de cada requisição HTTP amostrada e propaga o traceparent recebido"""
+
+    def __init__(self, app, sample_rate: float = TRACE_SAMPLE_RATE):
+        self.app = app
+        self.sample_rate = sample_rate
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        incoming = parse_traceparent(Headers(scope=scope).get("traceparent"))
+        if incoming is not None:
+            trace_id, parent_id, sampled = incoming
+        else:
+            trace_id, parent_id = None, None
+            sampled = self.sample_rate > 0 and random.random() < self.sample_rate
+        if not sampled:
+            await self.app(scope, receive, send)
+            return
+
+        root = Span(trace_id or secrets.token_hex(16), parent_id, f"{scope['method']} {scope['path']}")
+        traceparent = f"00-{root.trace_id}-{root.span_id}-01".encode()
+
+        async def traced_send(message):
+            if message["type"] == "http.response.start":
+                root.set("http.status_code", message["status"])
+                message["headers"] = list(message.get("headers", [])) + [(b"traceparent", traceparent)]
+            await send(message)
+
+        with _SpanScope(root):
+            await self.app(scope, receive, traced_send)
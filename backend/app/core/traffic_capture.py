@@ -0,0 +1,194 @@
+import json
+import logging
+import os
+import random
+import threading
+import time
+from typing import Dict, Optional
+from urllib.parse import parse_qsl
+
+from starlette.datastructures import Headers
+
+from app.utils.security import decode_access_token, decode_refresh_token
+
+logger = logging.getLogger("traffic_capture")
+
+# Captura é opt-in: vazio = desligada (o middleware nem é instalado)
+TRAFFIC_CAPTURE_FILE = os.getenv("TRAFFIC_CAPTURE_FILE", "")
+TRAFFIC_CAPTURE_SAMPLE_RATE = float(os.getenv("TRAFFIC_CAPTURE_SAMPLE_RATE", "1"))
+TRAFFIC_CAPTURE_MAX_BODY_BYTES = int(os.getenv("TRAFFIC_CAPTURE_MAX_BODY_BYTES", "65536"))
+# Rotas que não representam tráfego de usuário
+_EXCLUDED_PREFIXES = ("/health", "/debug", "/docs", "/openapi.json", "/redoc")
+# Campos de formulário com credenciais: nunca gravados, só marcados
+_SECRET_FIELDS = {"password", "refresh_token", "access_token"}
+
+
+def _shape(value):
+    """Troca o conteúdo por um equivalente sintético do mesmo tipo e tamanho"""
+    if isinstance(value, str):
+        return "x" * len(value)
+    if isinstance(value, dict):
+        return {k: _shape(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_shape(v) for v in value]
+    return value
+
+
+class TrafficRecorder:
+    """Grava requisições sanitizadas em NDJSON compacto: uma linha por requisição
+
+    Identidades viram usuários sintéticos ("u1", "u2", ...) pela ordem em que aparecem; o
+    mapeamento fica só em memória e não é gravado.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = open(path, "a", encoding="utf-8", buffering=1 << 16)
+        self._lock = threading.Lock()
+        self._users: Dict[str, str] = {}
+        self._started = time.monotonic()
+        self._last_flush = self._started
+        self.recorded = 0
+        self._write({"v": 1, "started_at": time.time()})
+
+    def synthetic_user(self, username: Optional[str]) -> Optional[str]:
+        if not username:
+            return None
+        username = username.strip().lower()
+        with self._lock:
+            synthetic = self._users.get(username)
+            if synthetic is None:
+                synthetic = self._users[username] = f"u{len(self._users) + 1}"
+            return synthetic
+
+    def _write(self, record: dict) -> None:
+        self._file.write(json.dumps(record, separators=(",", ":"), ensure_ascii=False) + "\n")
+
+    def record(self, record: dict) -> None:
+        now = time.monotonic()
+        record["t"] = round((now - self._started) * 1000, 1)
+        with self._lock:
+            if self._file.closed:
+                return
+            self._write(record)
+            self.recorded += 1
+            # Buffer grande, mas no máximo ~1s de tráfego perdido se o processo cair
+            if now - self._last_flush >= 1:
+                self._file.flush()
+                self._last_flush = now
+
+    def close(self) -> None:
+        with self._lock:
+            self._file.close()
+
+
+class TrafficCaptureMiddleware:
+    """Registra método, rota, formato do corpo, status e tempo de cada requisição amostrada"""
+
+    def __init__(self, app, path: str = TRAFFIC_CAPTURE_FILE, sample_rate: float = TRAFFIC_CAPTURE_SAMPLE_RATE):
+        self.app = app
+        self.sample_rate = sample_rate
+        self.recorder = open_recorder(path)
+
+    async def __call__(self, scope, receive, send):
+        if (
+            scope["type"] != "http"
+            or scope["path"].startswith(_EXCLUDED_PREFIXES)
+            or (self.sample_rate < 1 and random.random() >= self.sample_rate)
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        body = bytearray()
+        status_code = 500
+
+        async def capture_receive():
+            message = await receive()
+            if message["type"] == "http.request" and len(body) < TRAFFIC_CAPTURE_MAX_BODY_BYTES:
+                body.extend(message.get("body", b""))
+            return message
+
+        async def capture_send(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        started = time.perf_counter()
+        try:
+            await self.app(scope, capture_receive, capture_send)
+        finally:
+            duration_ms = (time.perf_counter() - started) * 1000
+            try:
+                self.recorder.record(self._sanitize(scope, bytes(body), status_code, duration_ms))
+            except Exception as e:
+                logger.error(f"Failed to record request {scope['method']} {scope['path']}: {e}")
+
+    def _sanitize(self, scope, body: bytes, status_code: int, duration_ms: float) -> dict:
+        headers = Headers(scope=scope)
+        route = scope.get("route")
+        record = {
+            "m": scope["method"],
+            "r": getattr(route, "path", scope["path"]),
+            "p": scope["path"],
+            "s": status_code,
+            "d": round(duration_ms, 2),
+        }
+
+        query = parse_qsl(scope.get("query_string", b"").decode("latin-1"), keep_blank_values=True)
+        if query:
+            record["q"] = {k: v if v.isdigit() else _shape(v) for k, v in query}
+
+        username = None
+        authorization = headers.get("authorization", "")
+        if authorization.lower().startswith("bearer "):
+            record["a"] = 1
+            payload = decode_access_token(authorization[7:])
+            username = payload.get("sub") if payload else None
+
+        content_type = headers.get("content-type", "")
+        if body and content_type.startswith("application/x-www-form-urlencoded"):
+            form = dict(parse_qsl(body.decode("utf-8", "replace"), keep_blank_values=True))
+            if "username" in form:
+                # Login/registro: a identidade vem do formulário
+                username = form["username"] or username
+                form["username"] = None
+            record["f"] = {k: (None if k in _SECRET_FIELDS or v is None else _shape(v)) for k, v in form.items()}
+        elif body:
+            try:
+                data = json.loads(body)
+            except ValueError:
+                record["b"] = len(body)
+            else:
+                if isinstance(data, dict):
+                    if "username" in data:
+                        username = data.get("username") or username
+                        data["username"] = None
+                    elif isinstance(data.get("refresh_token"), str):
+                        # /refresh e /logout: a identidade está no próprio refresh token
+                        payload = decode_refresh_token(data["refresh_token"])
+                        username = (payload.get("sub") if payload else None) or username
+                    data = {k: (None if k in _SECRET_FIELDS else v) for k, v in data.items()}
+                record["j"] = _shape(data)
+
+        user = self.recorder.synthetic_user(username)
+        if user:
+            record["u"] = user
+        return record
+
+
+_recorder: Optional[TrafficRecorder] = None
+
+
+def open_recorder(path: str) -> TrafficRecorder:
+    global _recorder
+    if _recorder is None:
+        _recorder = TrafficRecorder(path)
+        logger.info(f"Traffic capture enabled: {path}")
+    return _recorder
+
+
+def close_recorder() -> None:
+    if _recorder is not None:
+        _recorder.close()
+        logger.info(f"Traffic capture closed: {_recorder.recorded} requests recorded")
@@ -1,13 +1,42 @@
-from fastapi import FastAPI
-from fastapi.middleware.cors import CORSMiddleware
-from app.routes import todos, auth
-from app.core.startup import init_test_environment
-from app.core.logging_config import setup_logging
+from app.core.startup_profiler import startup_timer, readiness
+
+with startup_timer.phase("import fastapi"):
+    from fastapi import FastAPI
+    from fastapi.middleware.cors import CORSMiddleware
+    from fastapi.responses import JSONResponse
+with startup_timer.phase("import app.routes.todos"):
+    from app.routes import todos
+with startup_timer.phase("import app.routes.auth"):
+    from app.routes import auth
+with startup_timer.phase("import app.routes.admin"):
+    from app.routes import admin
+with startup_timer.phase("import app.core.startup"):
+    from app.core.startup import init_test_environment, init_password_hashing, init_persistence, shutdown_persistence
+    from app.core.invalidation_bus import invalidation_bus
+    from app.core.idempotency import IdempotencyMiddleware
+    from app.core.deadline import DeadlineMiddleware
+    from app.core.compression import CompressionMiddleware
+    from app.core.tracing import TracingMiddleware, exporter as trace_exporter
+    from app.core.memory import memory_registry
+    from app.core.traffic_capture import TrafficCaptureMiddleware, TRAFFIC_CAPTURE_FILE, close_recorder
+    from app.core.logging_config import setup_logging
+    from app.services.due_scheduler import due_scheduler
+    from app.services.archiver import archiver
+    from app.core.maintenance import maintenance
 
 app = FastAPI(title="My Collection API", version="1.0.0")
 
 app.include_router(todos.router)
 app.include_router(auth.router)
+app.include_router(admin.router)
+
+app.add_middleware(IdempotencyMiddleware)
+app.add_middleware(DeadlineMiddleware)
+app.add_middleware(TracingMiddleware)
+if TRAFFIC_CAPTURE_FILE:
+    app.add_middleware(TrafficCaptureMiddleware)
+# Por fora da captura e do cache de idempotência, que guardam o corpo sem compressão
+app.add_middleware(CompressionMiddleware)
 
 app.add_middleware(
     CORSMiddleware,
@@ -19,9 +48,48 @@ app.add_middleware(
 
 @app.on_event("startup")
 def startup_event():
-    setup_logging()
-    init_test_environment()
+    with startup_timer.phase("setup_logging"):
+        setup_logging()
+    with startup_timer.phase("invalidation_bus"):
+        invalidation_bus.start()
+    trace_exporter.start()
+    memory_registry.start()
+    with startup_timer.phase("init_persistence"):
+        init_persistence()
+    with startup_timer.phase("init_test_environment"):
+        init_test_environment()
+    with startup_timer.phase("init_password_hashing"):
+        init_password_hashing()
+    due_scheduler.start()
+    archiver.start()
+    maintenance.start()
+    startup_timer.report()
+
+@app.on_event("shutdown")
+def shutdown_event():
+    invalidation_bus.close()
+    due_scheduler.stop()
+    archiver.stop()
+    maintenance.stop()
+    shutdown_persistence()
+    trace_exporter.stop()
+    memory_registry.stop()
+    close_recorder()
 
 @app.get("/")
 def read_root():
-    return {"message": "My Collection API está funcionando!"}
\ No newline at end of file
+    return {"message": "My Collection API está funcionando!"}
+
+@app.get("/health/live")
+def liveness():
+    return {"status": "alive"}
+
+@app.get("/health/ready")
+def readiness_check():
+    if not readiness.is_ready:
+        return JSONResponse(
+            status_code=503,
+            content={"status": "starting", "pending": readiness.pending},
+            headers={"Retry-After": "1"},
+        )
+    return {"status": "ready"}
@@ -1,8 +1,46 @@
 from pydantic import BaseModel
-from typing import Optional
+from datetime import datetime
+from typing import Dict, List, Optional
 
 class Todo(BaseModel):
     id: Optional[int] = None  # O backend gerará o ID
     title: str
     description: str
-    completed: bool = False
\ No newline at end of file
+    completed: bool = False
+    tags: List[str] = []  # Normalizadas pelo backend (minúsculas, sem repetição)
+    created_at: Optional[datetime] = None  # Definido pelo backend na criação
+    completed_at: Optional[datetime] = None  # Definido pelo backend ao concluir; base do arquivamento
+    due_at: Optional[datetime] = None  # Sem fuso = UTC; o backend normaliza para UTC
+    position: Optional[str] = None  # Chave de ordenação definida pelo backend; muda só via /move
+
+class TodoMoveRequest(BaseModel):
+    after_id: Optional[int] = None  # Fica logo depois deste todo
+    before_id: Optional[int] = None  # Fica logo antes deste todo
+
+class TodoSearchResponse(BaseModel):
+    total: int
+    page: int
+    page_size: int
+    items: List[Todo]
+
+class TodoArchiveResponse(BaseModel):
+    total: int
+    page: int
+    page_size: int
+    items: List[Todo]
+
+class TodoStatsResponse(BaseModel):
+    total: int  # Todos ativos (fora do arquivo)
+    completed: int
+    pending: int
+    archived: int = 0
+    created_per_day: Dict[str, int]  # Data UTC (AAAA-MM-DD) -> quantidade criada
+
+class TodoImportError(BaseModel):
+    line: int
+    error: str
+
+class TodoImportResponse(BaseModel):
+    imported: int
+    failed: int
+    errors: List[TodoImportError]  # Limitado às primeiras ocorrências
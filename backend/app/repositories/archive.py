@@ -0,0 +1,297 @@
+import logging
+import mmap
+import os
+import re
+import struct
+import threading
+import zlib
+from array import array
+from bisect import bisect_left
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from app.core.memory import memory_registry
+from app.repositories.persistence import PERSISTENCE_DIR
+
+logger = logging.getLogger("archive")
+
+# Diretório dos segmentos arquivados; padrão: <PERSISTENCE_DIR>/archive (sem persistência, não há arquivo)
+ARCHIVE_DIR = os.getenv("ARCHIVE_DIR", os.path.join(PERSISTENCE_DIR, "archive") if PERSISTENCE_DIR else "")
+# Registros por bloco comprimido: uma leitura descomprime só o bloco que contém a página
+ARCHIVE_BLOCK_RECORDS = int(os.getenv("ARCHIVE_BLOCK_RECORDS", "128"))
+ARCHIVE_COMPRESSION_LEVEL = int(os.getenv("ARCHIVE_COMPRESSION_LEVEL", "6"))
+
+SEGMENT_MAGIC = b"MCARCH01"
+# Rodapé: offset do índice, quantidade de ids, quantidade de blocos, registros por bloco, crc32 do índice
+_TRAILER = struct.Struct("<QIIII")
+_SEGMENT_RE = re.compile(r"^archive-(\d{8})\.seg$")
+
+
+class ArchiveSegment:
+    """Segmento imutável: blocos zlib de registros JSON (um por linha), ordenados por id
+
+    O índice no fim do arquivo (ids e offsets dos blocos) fica em memória como arrays; os blocos
+    são lidos do arquivo mapeado só quando uma página ou um item é pedido. Ids restaurados viram
+    tombstones em memória, já que o arquivo nunca é reescrito.
+    """
+
+    def __init__(self, number: int, path: str, dead: Iterable[int] = ()):
+        self.number = number
+        self.path = path
+        self._file = open(path, "rb")
+        try:
+            self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+            trailer_start = len(self._mm) - _TRAILER.size - len(SEGMENT_MAGIC)
+            if trailer_start < len(SEGMENT_MAGIC) or self._mm[-len(SEGMENT_MAGIC):] != SEGMENT_MAGIC:
+                raise ValueError(f"Invalid archive segment: {path}")
+            index_offset, count, blocks, block_records, crc = _TRAILER.unpack_from(self._mm, trailer_start)
+            index = self._mm[index_offset:trailer_start]
+            if zlib.crc32(index) != crc:
+                raise ValueError(f"Corrupted archive segment index: {path}")
+        except Exception:
+            self.close()
+            raise
+        self.block_records = block_records
+        self.ids = array("Q")
+        self.ids.frombytes(index[:count * 8])
+        # offset e tamanho de cada bloco, intercalados
+        self._blocks = array("Q")
+        self._blocks.frombytes(index[count * 8:count * 8 + blocks * 16])
+        self.dead: Set[int] = set()
+        # Registros vivos por bloco, para pular blocos inteiros numa paginação
+        self.block_live = array("I", [
+            min(block_records, count - block * block_records) for block in range(blocks)
+        ])
+        for todo_id in dead:
+            self.kill(todo_id)
+
+    @property
+    def live(self) -> int:
+        return len(self.ids) - len(self.dead)
+
+    def _position(self, todo_id: int) -> Optional[int]:
+        position = bisect_left(self.ids, todo_id)
+        if position < len(self.ids) and self.ids[position] == todo_id:
+            return position
+        return None
+
+    def __contains__(self, todo_id: int) -> bool:
+        return todo_id not in self.dead and self._position(todo_id) is not None
+
+    def kill(self, todo_id: int) -> bool:
+        """Marca o id como fora do arquivo (tombstone); False se ele não está vivo aqui"""
+        position = self._position(todo_id)
+        if position is None or todo_id in self.dead:
+            return False
+        self.dead.add(todo_id)
+        self.block_live[position // self.block_records] -= 1
+        return True
+
+    def _read_block(self, block: int) -> List[bytes]:
+        offset, length = self._blocks[2 * block], self._blocks[2 * block + 1]
+        return zlib.decompress(self._mm[offset:offset + length]).split(b"\n")
+
+    def get(self, todo_id: int) -> Optional[bytes]:
+        position = self._position(todo_id) if todo_id not in self.dead else None
+        if position is None:
+            return None
+        block = position // self.block_records
+        return self._read_block(block)[position - block * self.block_records]
+
+    def live_ids(self) -> List[int]:
+        if not self.dead:
+            return self.ids.tolist()
+        return [todo_id for todo_id in self.ids if todo_id not in self.dead]
+
+    def page(self, skip: int, limit: int) -> List[bytes]:
+        """Até limit registros vivos, depois de pular skip, descomprimindo só os blocos necessários"""
+        records: List[bytes] = []
+        for block, live in enumerate(self.block_live):
+            if len(records) >= limit:
+                break
+            if skip >= live:
+                skip -= live
+                continue
+            base = block * self.block_records
+            for offset, record in enumerate(self._read_block(block)):
+                if self.ids[base + offset] in self.dead:
+                    continue
+                if skip:
+                    skip -= 1
+                    continue
+                records.append(record)
+                if len(records) >= limit:
+                    break
+        return records
+
+    def close(self) -> None:
+        mm = getattr(self, "_mm", None)
+        if mm is not None:
+            mm.close()
+        self._file.close()
+
+    @staticmethod
+    def write(path: str, records: List[Tuple[int, bytes]], block_records: int = ARCHIVE_BLOCK_RECORDS) -> None:
+        """Grava (id, json) ordenados por id num arquivo novo, só visível depois do fsync + rename"""
+        tmp_path = path + ".tmp"
+        ids = array("Q", (todo_id for todo_id, _ in records))
+        blocks = array("Q")
+        with open(tmp_path, "wb") as f:
+            f.write(SEGMENT_MAGIC)
+            offset = len(SEGMENT_MAGIC)
+            for start in range(0, len(records), block_records):
+                chunk = b"\n".join(raw for _, raw in records[start:start + block_records])
+                data = zlib.compress(chunk, ARCHIVE_COMPRESSION_LEVEL)
+                f.write(data)
+                blocks.extend((offset, len(data)))
+                offset += len(data)
+            index = ids.tobytes() + blocks.tobytes()
+            f.write(index)
+            f.write(_TRAILER.pack(offset, len(ids), len(blocks) // 2, block_records, zlib.crc32(index)))
+            f.write(SEGMENT_MAGIC)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+
+
+class ArchiveStore:
+    """Camada fria dos todos: segmentos comprimidos em disco e, em memória, só os índices deles
+
+    Quais segmentos valem (e os tombstones de cada um) faz parte do estado persistido da store de
+    todos: um segmento só passa a contar quando o registro "archive" correspondente entra no
+    journal, e arquivos sem referência após a carga são sobras de uma falha e podem ser removidos.
+    """
+
+    def __init__(self, directory: str = ARCHIVE_DIR):
+        self.directory = directory
+        self._segments: Dict[int, ArchiveSegment] = {}
+        self._lock = threading.RLock()
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.directory)
+
+    def __len__(self) -> int:
+        with self._lock:
+            return sum(segment.live for segment in self._segments.values())
+
+    def _path(self, number: int) -> str:
+        return os.path.join(self.directory, f"archive-{number:08d}.seg")
+
+    def _file_numbers(self) -> List[int]:
+        if not os.path.isdir(self.directory):
+            return []
+        numbers = []
+        for name in os.listdir(self.directory):
+            match = _SEGMENT_RE.match(name)
+            if match:
+                numbers.append(int(match.group(1)))
+        return sorted(numbers)
+
+    def write_segment(self, records: List[Tuple[int, bytes]]) -> int:
+        """Grava um segmento novo (ainda não anexado) e devolve o número dele"""
+        os.makedirs(self.directory, exist_ok=True)
+        with self._lock:
+            number = max(self._file_numbers() + list(self._segments), default=0) + 1
+            records.sort(key=lambda record: record[0])
+            ArchiveSegment.write(self._path(number), records)
+            return number
+
+    def attach(self, number: int, dead: Iterable[int] = ()) -> List[int]:
+        """Passa a servir o segmento; devolve os ids vivos nele (vazio se o arquivo não existe mais)"""
+        with self._lock:
+            segment = self._segments.get(number)
+            if segment is None:
+                path = self._path(number)
+                if not os.path.exists(path):
+                    # Removido por ter ficado sem itens vivos; os registros seguintes do journal os restauram
+                    return []
+                segment = ArchiveSegment(number, path, dead)
+                if segment.live == 0:
+                    # Nada sobrou (ex.: todos os itens mudaram durante a gravação)
+                    segment.close()
+                    os.remove(path)
+                    return []
+                self._segments[number] = segment
+            return segment.live_ids()
+
+    def _find(self, todo_id: int) -> Optional[ArchiveSegment]:
+        for segment in self._segments.values():
+            if todo_id in segment:
+                return segment
+        return None
+
+    def get(self, todo_id: int) -> Optional[bytes]:
+        with self._lock:
+            segment = self._find(todo_id)
+            return segment.get(todo_id) if segment is not None else None
+
+    def kill(self, todo_ids: Iterable[int]) -> int:
+        """Tira ids do arquivo (restaurados para a store quente); segmentos vazios são apagados"""
+        killed = 0
+        with self._lock:
+            for todo_id in todo_ids:
+                segment = self._find(todo_id)
+                if segment is None or not segment.kill(todo_id):
+                    continue
+                killed += 1
+                if segment.live == 0:
+                    del self._segments[segment.number]
+                    segment.close()
+                    os.remove(segment.path)
+                    logger.info(f"Archive segment {segment.number} emptied and removed")
+        return killed
+
+    def page(self, offset: int, limit: int) -> Tuple[int, List[bytes]]:
+        """(total arquivado, registros da página), do segmento mais antigo para o mais novo"""
+        with self._lock:
+            total = 0
+            records: List[bytes] = []
+            for number in sorted(self._segments):
+                segment = self._segments[number]
+                live = segment.live
+                total += live
+                if len(records) >= limit or offset >= live:
+                    offset = max(offset - live, 0)
+                    continue
+                records.extend(segment.page(offset, limit - len(records)))
+                offset = 0
+            return total, records
+
+    def state(self) -> Dict[str, List[int]]:
+        """Segmentos anexados e seus tombstones, para o snapshot"""
+        with self._lock:
+            return {str(number): sorted(segment.dead) for number, segment in self._segments.items()}
+
+    def load_state(self, state: Dict[str, List[int]]) -> None:
+        with self._lock:
+            self.close()
+            for number, dead in state.items():
+                try:
+                    self.attach(int(number), dead)
+                except (OSError, ValueError) as e:
+                    logger.error(f"Failed to open archive segment {number}: {e}")
+
+    def remove_orphans(self) -> int:
+        """Apaga segmentos gravados mas nunca confirmados no journal (falha no meio de um arquivamento)"""
+        if not os.path.isdir(self.directory):
+            return 0
+        removed = 0
+        with self._lock:
+            for name in os.listdir(self.directory):
+                match = _SEGMENT_RE.match(name)
+                if name.endswith(".tmp") or (match and int(match.group(1)) not in self._segments):
+                    os.remove(os.path.join(self.directory, name))
+                    removed += 1
+        if removed:
+            logger.warning(f"Removed {removed} unreferenced archive files")
+        return removed
+
+    def close(self) -> None:
+        with self._lock:
+            for segment in self._segments.values():
+                segment.close()
+            self._segments = {}
+
+
+archive_store = ArchiveStore()
+memory_registry.register("archive_index", lambda: archive_store._segments)
@@ -0,0 +1,51 @@
+from typing import Optional, Protocol
+
+from starlette.concurrency import run_in_threadpool
+
+from app.models.user import UserInDB
+from app.repositories.user_repository import UserRepository, user_repository
+
+
+class AsyncUserRepository(Protocol):
+    """O que o caminho assíncrono (login, cadastro) espera de uma store de usuários"""
+
+    async def get_by_username(self, username: str) -> Optional[UserInDB]: ...
+
+    async def exists_username(self, username: str) -> bool: ...
+
+    async def create(self, user: UserInDB) -> UserInDB: ...
+
+    async def update(self, user: UserInDB) -> UserInDB: ...
+
+
+class AsyncUserRepositoryAdapter:
+    """Expõe um UserRepository síncrono como AsyncUserRepository
+
+    A store em memória não bloqueia (dicts + journal enfileirado para a thread de escrita), então
+    as chamadas rodam direto no event loop. Uma store que faça I/O bloqueante deve ser embrulhada
+    com blocking=True: cada chamada vai para o threadpool.
+    """
+
+    def __init__(self, repository: UserRepository, blocking: bool = False):
+        self.repository = repository
+        self.blocking = blocking
+
+    async def _call(self, fn, *args):
+        if self.blocking:
+            return await run_in_threadpool(fn, *args)
+        return fn(*args)
+
+    async def get_by_username(self, username: str) -> Optional[UserInDB]:
+        return await self._call(self.repository.get_by_username, username)
+
+    async def exists_username(self, username: str) -> bool:
+        return await self._call(self.repository.exists_username, username)
+
+    async def create(self, user: UserInDB) -> UserInDB:
+        return await self._call(self.repository.create, user)
+
+    async def update(self, user: UserInDB) -> UserInDB:
+        return await self._call(self.repository.update, user)
+
+
+async_user_repository: AsyncUserRepository = AsyncUserRepositoryAdapter(user_repository)
@@ -0,0 +1,359 @@
+import fcntl
+import json
+import logging
+import mmap
+import os
+import queue
+import re
+import struct
+import threading
+import time
+import zlib
+from typing import Dict, Iterator, Optional
+
+logger = logging.getLogger("persistence")
+
+# Diretório dos arquivos de snapshot/journal; vazio desativa a persistência. Um único processo
+# escreve em cada diretório (o snapshot apaga segmentos de journal): com vários workers, cada um
+# precisa do seu, e um segundo processo no mesmo diretório se recusa a iniciar
+PERSISTENCE_DIR = os.getenv("PERSISTENCE_DIR", "")
+# Política de fsync do journal: "always" (a cada grupo), "interval" ou "never"
+JOURNAL_FSYNC = os.getenv("JOURNAL_FSYNC", "interval")
+JOURNAL_FSYNC_INTERVAL_MS = int(os.getenv("JOURNAL_FSYNC_INTERVAL_MS", "100"))
+JOURNAL_MAX_BATCH = int(os.getenv("JOURNAL_MAX_BATCH", "1024"))
+SNAPSHOT_INTERVAL_SECONDS = int(os.getenv("SNAPSHOT_INTERVAL_SECONDS", "300"))
+
+SNAPSHOT_FILE = "snapshot.bin"
+LOCK_FILE = "persistence.lock"
+SNAPSHOT_MAGIC = b"MCSNAP01"
+_SNAPSHOT_HEADER = struct.Struct("<Q")
+# Cada registro (journal ou snapshot) é prefixado por tamanho e crc32
+_FRAME = struct.Struct("<II")
+_SEGMENT_RE = re.compile(r"^journal-(\d{8})\.log$")
+
+
+def encode_frame(payload: bytes) -> bytes:
+    return _FRAME.pack(len(payload), zlib.crc32(payload)) + payload
+
+
+def iter_frames(buffer, offset: int = 0) -> Iterator[bytes]:
+    """Percorre os registros de um buffer, parando no primeiro registro truncado ou corrompido"""
+    with memoryview(buffer) as view:
+        end = len(view)
+        while offset + _FRAME.size <= end:
+            length, crc = _FRAME.unpack_from(view, offset)
+            start = offset + _FRAME.size
+            with view[start:start + length] as payload:
+                if len(payload) < length or zlib.crc32(payload) != crc:
+                    logger.warning(f"Truncated or corrupted record at offset {offset}, ignoring the rest")
+                    return
+                data = payload.tobytes()
+            yield data
+            offset = start + length
+
+
+def _encode_data(data) -> bytes:
+    if isinstance(data, bytes):
+        return data
+    if callable(data):
+        # Serialização adiada de um lote: produz os bytes já na thread de escrita
+        return data()
+    if hasattr(data, "model_dump_json"):
+        return data.model_dump_json().encode()
+    if isinstance(data, (int, str)):
+        return str(data).encode()
+    return json.dumps(data, separators=(",", ":")).encode()
+
+
+class PersistenceLocked(RuntimeError):
+    """Outro processo já usa o diretório de persistência"""
+
+
+class _Barrier:
+    def __init__(self, rotate: bool = False):
+        self.rotate = rotate
+        self.sealed_segment: Optional[int] = None
+        self.done = threading.Event()
+
+
+_STOP = object()
+
+
+class PersistenceManager:
+    """Journal append-only com group commit + snapshots periódicos das stores em memória
+
+    As stores registradas implementam:
+      - snapshot_state() -> (meta: dict, registros: iterável de bytes)
+      - restore_state(meta: dict, registros: iterável de bytes)
+      - replay(op: str, dados: bytes), que deve ser idempotente (upsert/delete)
+
+    Escritor único: start() segura um flock exclusivo no diretório até stop(), e falha com
+    PersistenceLocked se outro processo já o detém.
+    """
+
+    def __init__(self, directory: str = PERSISTENCE_DIR):
+        self.directory = directory
+        self._stores: Dict[str, object] = {}
+        self._queue: "queue.SimpleQueue" = queue.SimpleQueue()
+        self._writer: Optional[threading.Thread] = None
+        self._snapshotter: Optional[threading.Thread] = None
+        self._stop_event = threading.Event()
+        self._snapshot_lock = threading.Lock()
+        self._segment = 0
+        self._file = None
+        self._lock_file = None
+        self.enabled = False
+
+    def register(self, name: str, store) -> None:
+        self._stores[name] = store
+
+    def record(self, store: str, op: str, data) -> None:
+        """Enfileira uma mutação; a serialização e o I/O acontecem na thread de escrita"""
+        if self.enabled:
+            self._queue.put((store, op, data))
+
+    # --- inicialização ---------------------------------------------------
+
+    def start(self) -> None:
+        """Carrega snapshot + journal e inicia as threads de escrita e de snapshot"""
+        if not self.directory or self.enabled:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        self._acquire_directory()
+        started = time.perf_counter()
+        try:
+            covered = self._load_snapshot()
+            replayed = self._replay_journal(covered)
+        except Exception:
+            self._release_directory()
+            raise
+        logger.info(
+            f"State restored in {time.perf_counter() - started:.2f}s "
+            f"(snapshot through segment {covered}, {replayed} journal records replayed)"
+        )
+
+        self._segment = max([covered] + self._segment_numbers()) + 1
+        self._file = open(self._segment_path(self._segment), "ab")
+        self._stop_event.clear()
+        self.enabled = True
+        self._writer = threading.Thread(target=self._write_loop, name="journal-writer", daemon=True)
+        self._writer.start()
+        if SNAPSHOT_INTERVAL_SECONDS > 0:
+            self._snapshotter = threading.Thread(target=self._snapshot_loop, name="snapshotter", daemon=True)
+            self._snapshotter.start()
+
+    def stop(self) -> None:
+        if not self.enabled:
+            return
+        self._stop_event.set()
+        self.flush()
+        self.enabled = False
+        self._queue.put(_STOP)
+        self._writer.join()
+        self._release_directory()
+        logger.info("Journal closed")
+
+    def _acquire_directory(self) -> None:
+        lock_file = open(os.path.join(self.directory, LOCK_FILE), "a+b")
+        try:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            lock_file.close()
+            raise PersistenceLocked(f"Persistence directory {self.directory} is in use by another process")
+        self._lock_file = lock_file
+
+    def _release_directory(self) -> None:
+        if self._lock_file is not None:
+            fcntl.flock(self._lock_file.fileno(), fcntl.LOCK_UN)
+            self._lock_file.close()
+            self._lock_file = None
+
+    def flush(self, timeout: Optional[float] = None) -> None:
+        """Bloqueia até que tudo que já foi enfileirado esteja gravado e sincronizado"""
+        if not self.enabled:
+            return
+        barrier = _Barrier()
+        self._queue.put(barrier)
+        barrier.done.wait(timeout)
+
+    # --- journal ---------------------------------------------------------
+
+    def _segment_path(self, number: int) -> str:
+        return os.path.join(self.directory, f"journal-{number:08d}.log")
+
+    def _segment_numbers(self):
+        numbers = []
+        for name in os.listdir(self.directory):
+            match = _SEGMENT_RE.match(name)
+            if match:
+                numbers.append(int(match.group(1)))
+        return sorted(numbers)
+
+    def _write_loop(self) -> None:
+        pending = []
+        dirty = False
+        last_sync = time.monotonic()
+        interval = JOURNAL_FSYNC_INTERVAL_MS / 1000
+        while True:
+            try:
+                item = self._queue.get(timeout=interval if dirty else None)
+            except queue.Empty:
+                item = None
+
+            # Group commit: drena o que já estiver na fila antes de escrever
+            batch = [] if item is None else [item]
+            while len(batch) < JOURNAL_MAX_BATCH:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            barriers = []
+            stop = False
+            for entry in batch:
+                if entry is _STOP:
+                    stop = True
+                elif isinstance(entry, _Barrier):
+                    self._write(pending)
+                    pending = []
+                    self._sync()
+                    dirty = False
+                    last_sync = time.monotonic()
+                    if entry.rotate:
+                        entry.sealed_segment = self._rotate()
+                    barriers.append(entry)
+                else:
+                    store, op, data = entry
+                    try:
+                        payload = b"%s\x00%s\x00%s" % (store.encode(), op.encode(), _encode_data(data))
+                        pending.append(encode_frame(payload))
+                    except Exception as e:
+                        logger.error(f"Failed to encode journal record {store}/{op}: {e}")
+
+            if pending:
+                self._write(pending)
+                pending = []
+                dirty = True
+            if dirty and (JOURNAL_FSYNC != "interval" or time.monotonic() - last_sync >= interval):
+                self._sync()
+                dirty = False
+                last_sync = time.monotonic()
+
+            for barrier in barriers:
+                barrier.done.set()
+            if stop:
+                self._sync()
+                self._file.close()
+                return
+
+    def _write(self, frames) -> None:
+        if frames:
+            self._file.write(b"".join(frames))
+
+    def _sync(self) -> None:
+        self._file.flush()
+        if JOURNAL_FSYNC != "never":
+            os.fsync(self._file.fileno())
+
+    def _rotate(self) -> int:
+        sealed = self._segment
+        self._file.close()
+        self._segment += 1
+        self._file = open(self._segment_path(self._segment), "ab")
+        return sealed
+
+    def _replay_journal(self, covered: int) -> int:
+        replayed = 0
+        for number in self._segment_numbers():
+            path = self._segment_path(number)
+            if number <= covered:
+                os.remove(path)
+                continue
+            with open(path, "rb") as f:
+                data = f.read()
+            for payload in iter_frames(data):
+                store_name, op, raw = payload.split(b"\x00", 2)
+                store = self._stores.get(store_name.decode())
+                if store is None:
+                    continue
+                store.replay(op.decode(), raw)
+                replayed += 1
+        return replayed
+
+    # --- snapshots -------------------------------------------------------
+
+    def _snapshot_loop(self) -> None:
+        while not self._stop_event.wait(SNAPSHOT_INTERVAL_SECONDS):
+            try:
+                self.snapshot()
+            except Exception as e:
+                logger.error(f"Snapshot failed: {e}")
+
+    def snapshot(self) -> None:
+        """Grava um snapshot compacto e descarta os segmentos de journal que ele cobre"""
+        if not self.enabled:
+            return
+        with self._snapshot_lock:
+            started = time.perf_counter()
+            # Fecha o segmento atual: tudo que entrou antes dele já está aplicado em memória
+            barrier = _Barrier(rotate=True)
+            self._queue.put(barrier)
+            barrier.done.wait()
+            sealed = barrier.sealed_segment
+
+            path = os.path.join(self.directory, SNAPSHOT_FILE)
+            tmp_path = path + ".tmp"
+            records = 0
+            with open(tmp_path, "wb") as f:
+                f.write(SNAPSHOT_MAGIC + _SNAPSHOT_HEADER.pack(sealed))
+                for name, store in self._stores.items():
+                    meta, items = store.snapshot_state()
+                    items = list(items)
+                    header = json.dumps({"store": name, "meta": meta, "count": len(items)}).encode()
+                    f.write(encode_frame(header))
+                    f.write(b"".join(encode_frame(item) for item in items))
+                    records += len(items)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, path)
+            self._sync_directory()
+
+            for number in self._segment_numbers():
+                if number <= sealed:
+                    os.remove(self._segment_path(number))
+            logger.info(f"Snapshot written: {records} records in {time.perf_counter() - started:.2f}s")
+
+    def _sync_directory(self) -> None:
+        try:
+            fd = os.open(self.directory, os.O_RDONLY)
+        except OSError:
+            return
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+    def _load_snapshot(self) -> int:
+        path = os.path.join(self.directory, SNAPSHOT_FILE)
+        if not os.path.exists(path) or os.path.getsize(path) == 0:
+            return 0
+        with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            if mm[:len(SNAPSHOT_MAGIC)] != SNAPSHOT_MAGIC:
+                logger.error("Invalid snapshot file, ignoring it")
+                return 0
+            (covered,) = _SNAPSHOT_HEADER.unpack_from(mm, len(SNAPSHOT_MAGIC))
+            frames = iter_frames(mm, len(SNAPSHOT_MAGIC) + _SNAPSHOT_HEADER.size)
+            for header in frames:
+                section = json.loads(header)
+                items = (next(frames) for _ in range(section["count"]))
+                store = self._stores.get(section["store"])
+                if store is None:
+                    for _ in items:
+                        pass
+                    continue
+                store.restore_state(section["meta"], items)
+            frames.close()
+        return covered
+
+
+persistence = PersistenceManager()
@@ -0,0 +1,151 @@
+import json
+import secrets
+import threading
+import time
+from typing import Dict, Iterable, KeysView, List, Optional, Set, Tuple
+from app.repositories.persistence import persistence
+from app.core.invalidation_bus import invalidation_bus, SESSION_REVOKED
+from app.utils.security import REFRESH_TOKEN_EXPIRE_DAYS
+from app.core.memory import memory_registry
+from app.core.maintenance import maintenance
+
+class SessionFamily:
+    """Família de refresh tokens de um login: só a geração atual pode ser rotacionada"""
+    __slots__ = ("username", "generation", "expires_at")
+
+    def __init__(self, username: str, generation: int, expires_at: int):
+        self.username = username
+        self.generation = generation
+        self.expires_at = expires_at
+
+class SessionRepository:
+    def __init__(self, ttl_seconds: int = REFRESH_TOKEN_EXPIRE_DAYS * 86400):
+        self.ttl_seconds = ttl_seconds
+        self._families: Dict[str, SessionFamily] = {}
+        self._by_username: Dict[str, Set[str]] = {}
+        self._lock = threading.Lock()
+
+    def create(self, username: str) -> Tuple[str, int]:
+        family_id = secrets.token_urlsafe(12)
+        family = SessionFamily(username, 0, int(time.time()) + self.ttl_seconds)
+        with self._lock:
+            self._families[family_id] = family
+            self._by_username.setdefault(username, set()).add(family_id)
+        self._record_put(family_id, family)
+        return family_id, 0
+
+    def rotate(self, family_id: str, generation: int) -> Optional[int]:
+        """Compare-and-bump da geração. Reuso de uma geração antiga revoga a família inteira"""
+        with self._lock:
+            family = self._families.get(family_id)
+            if family is None:
+                return None
+            if family.expires_at <= time.time():
+                self._remove(family_id)
+                return None
+            if family.generation != generation:
+                reused = True
+            else:
+                reused = False
+                family.generation += 1
+                family.expires_at = int(time.time()) + self.ttl_seconds
+                new_generation = family.generation
+        if reused:
+            self.revoke(family_id)
+            return None
+        self._record_put(family_id, family)
+        return new_generation
+
+    def is_active(self, family_id: str) -> bool:
+        family = self._families.get(family_id)
+        return family is not None and family.expires_at > time.time()
+
+    def revoke(self, family_id: str, broadcast: bool = True) -> bool:
+        with self._lock:
+            removed = self._remove(family_id)
+        if removed:
+            persistence.record("sessions", "delete", family_id)
+            if broadcast:
+                invalidation_bus.publish(SESSION_REVOKED, {"family_id": family_id})
+        return removed
+
+    def revoke_user(self, username: str) -> int:
+        """Encerra todas as sessões do usuário ("sair de todos os dispositivos")"""
+        with self._lock:
+            family_ids = list(self._by_username.get(username, ()))
+        return sum(1 for family_id in family_ids if self.revoke(family_id))
+
+    def family_ids(self) -> KeysView[str]:
+        """Visão viva dos ids, para a varredura andar sem copiar (não segura o lock)"""
+        return self._families.keys()
+
+    def purge_expired(self, family_ids: Optional[Iterable[str]] = None) -> int:
+        """Remove as famílias expiradas (todas, ou só as do lote informado)"""
+        now = time.time()
+        with self._lock:
+            candidates = self._families if family_ids is None else family_ids
+            expired = [
+                fid for fid in candidates
+                if fid in self._families and self._families[fid].expires_at <= now
+            ]
+            for family_id in expired:
+                self._remove(family_id)
+        for family_id in expired:
+            persistence.record("sessions", "delete", family_id)
+        return len(expired)
+
+    def _remove(self, family_id: str) -> bool:
+        family = self._families.pop(family_id, None)
+        if family is None:
+            return False
+        user_families = self._by_username.get(family.username)
+        if user_families is not None:
+            user_families.discard(family_id)
+            if not user_families:
+                del self._by_username[family.username]
+        return True
+
+    def _record_put(self, family_id: str, family: SessionFamily) -> None:
+        persistence.record("sessions", "put", {
+            "id": family_id, "u": family.username, "g": family.generation, "e": family.expires_at
+        })
+
+    def __len__(self) -> int:
+        return len(self._families)
+
+    # Persistência (snapshot + journal)
+    def snapshot_state(self):
+        with self._lock:
+            items = [(fid, f.username, f.generation, f.expires_at) for fid, f in self._families.items()]
+        return {}, (json.dumps(item, separators=(",", ":")).encode() for item in items)
+
+    def restore_state(self, meta: dict, records) -> None:
+        now = time.time()
+        with self._lock:
+            self._families = {}
+            self._by_username = {}
+            for raw in records:
+                family_id, username, generation, expires_at = json.loads(raw)
+                if expires_at > now:
+                    self._families[family_id] = SessionFamily(username, generation, expires_at)
+                    self._by_username.setdefault(username, set()).add(family_id)
+
+    def replay(self, op: str, data: bytes) -> None:
+        with self._lock:
+            if op == "put":
+                record = json.loads(data)
+                self._remove(record["id"])
+                self._families[record["id"]] = SessionFamily(record["u"], record["g"], record["e"])
+                self._by_username.setdefault(record["u"], set()).add(record["id"])
+            elif op == "delete":
+                self._remove(data.decode())
+
+session_repository = SessionRepository()
+
+def _on_session_revoked(data: dict) -> None:
+    if data.get("family_id"):
+        session_repository.revoke(data["family_id"], broadcast=False)
+
+invalidation_bus.subscribe(SESSION_REVOKED, _on_session_revoked)
+memory_registry.register("sessions", lambda: session_repository._families)
+maintenance.register("sessions", session_repository.family_ids, session_repository.purge_expired)
@@ -1,41 +1,107 @@
-from typing import Optional, List
+from typing import Dict, Iterable, KeysView, Optional, List, Set
 from datetime import datetime
+import threading
 from app.models.user import UserInDB
+from app.repositories.persistence import persistence
+from app.core.memory import memory_registry
 
 class UserRepository:
     def __init__(self):
-        self._users: List[UserInDB] = []
+        # id -> usuário (ordem de inserção) e índice por username para buscas O(1)
+        self._users: Dict[int, UserInDB] = {}
+        self._by_username: Dict[str, UserInDB] = {}
         self._next_id = 1
+        # Nomes guardados para um criador específico (ex.: admin semeado em background)
+        self._reserved: Set[str] = set()
+        self._lock = threading.Lock()
     
-    def create(self, user: UserInDB) -> UserInDB:
-        user.id = self._next_id
-        self._next_id += 1
-        self._users.append(user)
+    def _put(self, user: UserInDB) -> None:
+        previous = self._users.get(user.id)
+        if previous is not None and previous.username != user.username:
+            self._by_username.pop(previous.username, None)
+        self._users[user.id] = user
+        self._by_username[user.username] = user
+    
+    def create(self, user: UserInDB, claim_reserved: bool = False) -> UserInDB:
+        """Cria o usuário; ValueError se o nome já existe ou está reservado para outro criador"""
+        with self._lock:
+            if user.username in self._by_username:
+                raise ValueError("Nome de usuário já existe")
+            if user.username in self._reserved:
+                if not claim_reserved:
+                    raise ValueError("Nome de usuário já existe")
+                self._reserved.discard(user.username)
+            user.id = self._next_id
+            self._next_id += 1
+            self._put(user)
+            persistence.record("users", "put", user)
         return user
     
+    def create_many(self, users: Iterable[UserInDB]) -> List[UserInDB]:
+        """Insere um lote de usuários; quem chama garante que os usernames são inéditos"""
+        created = []
+        with self._lock:
+            for user in users:
+                user.id = self._next_id
+                self._next_id += 1
+                self._put(user)
+                persistence.record("users", "put", user)
+                created.append(user)
+        return created
+    
+    def reserve(self, username: str) -> None:
+        """Bloqueia o nome para cadastros até create(..., claim_reserved=True)"""
+        with self._lock:
+            self._reserved.add(username)
+    
     def get_by_username(self, username: str) -> Optional[UserInDB]:
-        return next((u for u in self._users if u.username == username), None)
+        return self._by_username.get(username)
     
     def get_by_id(self, user_id: int) -> Optional[UserInDB]:
-        return next((u for u in self._users if u.id == user_id), None)
+        return self._users.get(user_id)
     
     def update(self, user: UserInDB) -> UserInDB:
-        index = next((i for i, u in enumerate(self._users) if u.id == user.id), None)
-        if index is not None:
-            self._users[index] = user
+        if user.id in self._users:
+            self._put(user)
+            persistence.record("users", "put", user)
         return user
     
     def deactivate(self, username: str) -> bool:
         user = self.get_by_username(username)
         if user:
             user.is_active = False
+            persistence.record("users", "put", user)
             return True
         return False
     
     def exists_username(self, username: str) -> bool:
-        return any(u.username == username for u in self._users)
+        return username in self._reserved or username in self._by_username
     
     def get_all(self) -> List[UserInDB]:
-        return self._users.copy()
+        return list(self._users.values())
+    
+    def ids(self) -> KeysView[int]:
+        return self._users.keys()
+    
+    # Persistência (snapshot + journal)
+    def snapshot_state(self):
+        with self._lock:
+            users = list(self._users.values())
+        return {"next_id": self._next_id}, (u.model_dump_json().encode() for u in users)
+    
+    def restore_state(self, meta: dict, records) -> None:
+        self._users = {}
+        self._by_username = {}
+        for raw in records:
+            self._put(UserInDB.model_validate_json(raw))
+        self._next_id = max(meta.get("next_id", 1), max(self._users, default=0) + 1)
+    
+    def replay(self, op: str, data: bytes) -> None:
+        if op == "put":
+            user = UserInDB.model_validate_json(data)
+            self._put(user)
+            self._next_id = max(self._next_id, user.id + 1)
+
+user_repository = UserRepository()
 
-user_repository = UserRepository() 
\ No newline at end of file
+memory_registry.register("users", lambda: user_repository._users)
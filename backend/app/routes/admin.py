@@ -0,0 +1,101 @@
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from app.models.user import UserInDB
+from app.core.dependencies import get_admin_user
+from app.core.tracing import exporter, TRACE_SAMPLE_RATE
+from app.core.memory import memory_registry, tracemalloc_snapshots
+from app.core.metrics import metrics
+from typing import Optional
+import logging
+
+router = APIRouter()
+logger = logging.getLogger("admin")
+
+@router.get("/debug/traces")
+def get_traces(
+    limit: int = Query(100, ge=1, le=2000),
+    trace_id: Optional[str] = Query(None, min_length=32, max_length=32),
+    current_user: UserInDB = Depends(get_admin_user)
+):
+    try:
+        spans = exporter.recent(limit=limit, trace_id=trace_id)
+        return {
+            "sample_rate": TRACE_SAMPLE_RATE,
+            "exported": exporter.exported,
+            "spans": spans,
+        }
+
+    except Exception as e:
+        logger.error(f"Error reading traces: {str(e)} - User: {current_user.username}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Erro interno do servidor"
+        )
+
+@router.get("/debug/memory")
+def get_memory_report(
+    exact: bool = Query(False, description="Varre as estruturas inteiras em vez de estimar por amostra"),
+    current_user: UserInDB = Depends(get_admin_user)
+):
+    try:
+        memory_registry.check_limits()
+        report = memory_registry.report(exact=exact)
+        report["tracemalloc_snapshots"] = tracemalloc_snapshots.list_ids()
+        return report
+
+    except Exception as e:
+        logger.error(f"Error building memory report: {str(e)} - User: {current_user.username}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Erro interno do servidor"
+        )
+
+@router.post("/debug/memory/snapshots")
+def take_memory_snapshot(
+    top: int = Query(20, ge=1, le=200),
+    key_type: str = Query("lineno", pattern="^(lineno|filename|traceback)$"),
+    current_user: UserInDB = Depends(get_admin_user)
+):
+    try:
+        snapshot = tracemalloc_snapshots.take(top=top, key_type=key_type)
+        logger.info(f"Tracemalloc snapshot {snapshot['id']} taken by: {current_user.username}")
+        return snapshot
+
+    except Exception as e:
+        logger.error(f"Error taking memory snapshot: {str(e)} - User: {current_user.username}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Erro interno do servidor"
+        )
+
+@router.get("/debug/memory/snapshots/{base_id}/diff/{target_id}")
+def diff_memory_snapshots(
+    base_id: int,
+    target_id: int,
+    top: int = Query(20, ge=1, le=200),
+    key_type: str = Query("lineno", pattern="^(lineno|filename|traceback)$"),
+    current_user: UserInDB = Depends(get_admin_user)
+):
+    try:
+        diff = tracemalloc_snapshots.diff(base_id, target_id, top=top, key_type=key_type)
+        if diff is None:
+            raise HTTPException(status_code=404, detail="Snapshot não encontrado")
+        return diff
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error diffing memory snapshots: {str(e)} - User: {current_user.username}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Erro interno do servidor"
+        )
+
+@router.delete("/debug/memory/snapshots")
+def stop_memory_tracing(current_user: UserInDB = Depends(get_admin_user)):
+    tracemalloc_snapshots.stop()
+    logger.info(f"Tracemalloc stopped by: {current_user.username}")
+    return {"message": "Tracemalloc desligado e snapshots descartados"}
+
+@router.get("/debug/metrics")
+def get_metrics(current_user: UserInDB = Depends(get_admin_user)):
+    return metrics.snapshot()
@@ -1,10 +1,14 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Request
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, status, Request
+from fastapi.responses import JSONResponse
 from fastapi.security import OAuth2PasswordRequestForm
-from app.models.user import UserCreate, UserResponse, Token
+from app.models.user import UserCreate, UserResponse, UserInDB, Token
 from app.services.auth_service import auth_service
 from app.services.user_service import user_service
-from app.core.dependencies import rate_limit_dependency
-from app.utils.security import decode_refresh_token, revoke_token
+from app.core.dependencies import rate_limit_dependency, get_current_user
+from app.core.admission import login_admission, login_backoff, AdmissionRejected
+from app.core.compression import no_compression
+from app.utils.security import decode_access_token, decode_refresh_token, revoke_token
+from app.utils.keyring import keyring
 import logging
 
 router = APIRouter()
@@ -12,13 +16,13 @@ logger = logging.getLogger("auth_routes")
 audit_logger = logging.getLogger("audit")
 
 @router.post("/register", response_model=UserResponse)
-def register(
+async def register(
     request: Request, 
     user_data: UserCreate,
     _: bool = Depends(rate_limit_dependency(20))
 ):
     try:
-        new_user = user_service.create_user(user_data)
+        new_user = await user_service.create_user(user_data)
         if not new_user:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
@@ -46,15 +50,38 @@ def register(
         )
 
 @router.post("/login", response_model=Token)
-def login(
+@no_compression
+async def login(
     request: Request, 
+    background_tasks: BackgroundTasks,
     form_data: OAuth2PasswordRequestForm = Depends(),
     _: bool = Depends(rate_limit_dependency(30))
 ):
     try:
-        user = auth_service.authenticate_user(form_data.username, form_data.password)
+        backoff_key = form_data.username.strip().lower()
+        retry_after = login_backoff.check(backoff_key)
+        if retry_after:
+            client_ip = request.client.host if request.client else "unknown"
+            audit_logger.warning(f"LOGIN_BACKOFF - Username: {form_data.username} - IP: {client_ip}")
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail="Muitas tentativas para este usuário. Tente novamente mais tarde.",
+                headers={"Retry-After": str(retry_after)},
+            )
+        
+        try:
+            # A espera na fila não ocupa thread; só o bcrypt vai para o threadpool
+            async with login_admission.admit():
+                user = await auth_service.authenticate_user(form_data.username, form_data.password, background_tasks)
+        except AdmissionRejected as e:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Serviço de login sobrecarregado. Tente novamente mais tarde.",
+                headers={"Retry-After": str(e.retry_after)},
+            )
         
         if not user:
+            login_backoff.record_failure(backoff_key)
             client_ip = request.client.host if request.client else "unknown"
             logger.warning(f"Failed login: {form_data.username} - IP: {client_ip}")
             audit_logger.warning(f"LOGIN_FAILED - Username: {form_data.username} - IP: {client_ip}")
@@ -64,6 +91,7 @@ def login(
                 headers={"WWW-Authenticate": "Bearer"},
             )
         
+        login_backoff.record_success(backoff_key)
         tokens = auth_service.create_tokens_for_user(user)
         
         client_ip = request.client.host if request.client else "unknown"
@@ -81,7 +109,8 @@ def login(
         )
 
 @router.post("/refresh", response_model=Token)
-def refresh_token(
+@no_compression
+async def refresh_token(
     request: Request, 
     refresh_data: dict,
     _: bool = Depends(rate_limit_dependency(50))
@@ -119,8 +148,18 @@ def refresh_token(
                 detail="Usuário não encontrado ou inativo"
             )
         
-        revoke_token(refresh_token)
-        new_tokens = auth_service.create_tokens_for_user(user)
+        if "fam" in payload:
+            session = auth_service.rotate_session(payload)
+            if not session:
+                raise HTTPException(
+                    status_code=status.HTTP_401_UNAUTHORIZED,
+                    detail="Refresh token inválido ou expirado"
+                )
+        else:
+            # Token emitido antes das famílias de sessão: revoga e abre uma família nova
+            revoke_token(refresh_token)
+            session = None
+        new_tokens = auth_service.create_tokens_for_user(user, session)
         
         client_ip = request.client.host if request.client else "unknown"
         logger.info(f"Token refreshed: {username} - IP: {client_ip}")
@@ -137,15 +176,24 @@ def refresh_token(
         )
 
 @router.post("/logout")
-def logout(request: Request, token_data: dict):
+async def logout(request: Request, token_data: dict):
     try:
         access_token = token_data.get("access_token")
         refresh_token = token_data.get("refresh_token")
         
-        if access_token:
-            revoke_token(access_token)
-        if refresh_token:
-            revoke_token(refresh_token)
+        # Revogar a família encerra o refresh e o access token da sessão sem crescer a lista negra
+        refresh_payload = decode_refresh_token(refresh_token) if refresh_token else None
+        access_payload = decode_access_token(access_token) if access_token else None
+        revoked = any(
+            payload and auth_service.revoke_session(payload)
+            for payload in (refresh_payload, access_payload)
+        )
+        
+        if not revoked:
+            if access_token:
+                revoke_token(access_token)
+            if refresh_token:
+                revoke_token(refresh_token)
         
         client_ip = request.client.host if request.client else "unknown"
         logger.info(f"Logout completed - IP: {client_ip}")
@@ -157,4 +205,29 @@ def logout(request: Request, token_data: dict):
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Erro interno do servidor"
-        )
\ No newline at end of file
+        )
+
+@router.post("/logout-all")
+async def logout_all(request: Request, current_user: UserInDB = Depends(get_current_user)):
+    try:
+        revoked = auth_service.revoke_all_sessions(current_user.username)
+        
+        client_ip = request.client.host if request.client else "unknown"
+        logger.info(f"Logout from all sessions: {current_user.username} - IP: {client_ip}")
+        audit_logger.info(f"LOGOUT_ALL - Username: {current_user.username} - IP: {client_ip} - Sessions: {revoked}")
+        return {"message": "Todas as sessões foram encerradas", "sessions_revoked": revoked}
+        
+    except Exception as e:
+        logger.error(f"Logout all error: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Erro interno do servidor"
+        )
+
+@router.get("/.well-known/jwks.json")
+async def jwks():
+    """Chaves públicas (por kid) para outros serviços validarem tokens localmente"""
+    return JSONResponse(
+        content=keyring.jwks(),
+        headers={"Cache-Control": "public, max-age=300"}
+    )
\ No newline at end of file
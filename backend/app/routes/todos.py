@@ -1,29 +1,72 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Request
-from app.models.todo import Todo
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Query, status, Request, Response
+from app.models.todo import Todo, TodoArchiveResponse, TodoMoveRequest, TodoSearchResponse, TodoStatsResponse, TodoImportResponse
 from app.models.user import UserInDB
-from app.services.todo_service import TodoService
+from app.services.todo_service import TodoService, TAGS_MAX_PER_TODO
 from app.core.dependencies import get_current_user, rate_limit_dependency
-from typing import List
+from app.utils.streaming import open_text_stream
+from starlette.concurrency import run_in_threadpool
+from datetime import datetime, timezone
+from typing import List, Optional
 import logging
 
 router = APIRouter()
 logger = logging.getLogger("todos")
 audit_logger = logging.getLogger("audit")
 
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """If-None-Match com comparação fraca (RFC 9110): cada tag da lista, sem W/, igual ao ETag; * casa com tudo"""
+    if not if_none_match:
+        return False
+    opaque = etag[2:] if etag.startswith("W/") else etag
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*":
+            return True
+        if candidate.startswith("W/"):
+            candidate = candidate[2:].lstrip()
+        if candidate == opaque:
+            return True
+    return False
+
 @router.get("/todos/", response_model=List[Todo])
-def list_todos(
+async def list_todos(
     request: Request, 
+    tag: List[str] = Query([], description="Todas estas tags"),
+    any_tag: List[str] = Query([], description="Ao menos uma destas tags"),
+    exclude_tag: List[str] = Query([], description="Nenhuma destas tags"),
+    completed: Optional[bool] = Query(None),
+    offset: int = Query(0, ge=0),
+    limit: Optional[int] = Query(None, ge=1, le=1000),
     current_user: UserInDB = Depends(get_current_user),
     _: bool = Depends(rate_limit_dependency(200))
 ):
     try:
-        todos = TodoService.list_todos()
+        if max(len(tag), len(any_tag), len(exclude_tag)) > TAGS_MAX_PER_TODO:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Máximo de {TAGS_MAX_PER_TODO} tags por filtro"
+            )
+        
+        # Lido antes da listagem: se a store mudar no meio, o ETag fica mais velho que o corpo, nunca o contrário
+        etag = TodoService.list_etag()
+        # Listagens podem serializar a store inteira: saem do event loop
+        count, body = await run_in_threadpool(
+            TodoService.list_todos_encoded,
+            TodoService.normalize_tag_filter(tag),
+            TodoService.normalize_tag_filter(any_tag),
+            TodoService.normalize_tag_filter(exclude_tag),
+            completed,
+            offset,
+            limit,
+        )
         
         client_ip = request.client.host if request.client else "unknown"
         logger.info(f"Todos listed by: {current_user.username} - IP: {client_ip}")
-        audit_logger.info(f"LIST_TODOS - User: {current_user.username} - IP: {client_ip} - Count: {len(todos)}")
-        return todos
+        audit_logger.info(f"LIST_TODOS - User: {current_user.username} - IP: {client_ip} - Count: {count}")
+        return Response(content=body, media_type="application/json", headers={"ETag": etag})
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error listing todos: {str(e)} - User: {current_user.username}")
         raise HTTPException(
@@ -31,6 +74,8 @@ def list_todos(
             detail="Erro interno do servidor"
         )
 
+# Escritas e get_todo seguem síncronos (threadpool): o lock da store e a espera do single-flight
+# bloqueiam a thread, o que não pode acontecer no event loop
 @router.post("/todos/", response_model=Todo)
 def create_todo(
     request: Request, 
@@ -39,19 +84,15 @@ def create_todo(
     _: bool = Depends(rate_limit_dependency(100))
 ):
     try:
-        if not todo.title or len(todo.title.strip()) == 0:
+        try:
+            todo.title = TodoService.clean_title(todo.title)
+            todo.tags = TodoService.clean_tags(todo.tags)
+        except ValueError as e:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Título do todo é obrigatório"
-            )
-        
-        if len(todo.title) > 200:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Título muito longo (máximo 200 caracteres)"
+                detail=str(e)
             )
         
-        todo.title = todo.title.strip()
         if todo.description:
             todo.description = todo.description.strip()
         
@@ -71,6 +112,168 @@ def create_todo(
             detail="Erro interno do servidor"
         )
 
+@router.post("/todos/import", response_model=TodoImportResponse)
+async def import_todos(
+    request: Request,
+    format: Optional[str] = Query(None, pattern="^(ndjson|csv)$"),
+    current_user: UserInDB = Depends(get_current_user),
+    _: bool = Depends(rate_limit_dependency(10))
+):
+    try:
+        # Sem ?format=, decide pelo Content-Type (text/csv); o padrão é NDJSON
+        fmt = format or ("csv" if "csv" in request.headers.get("content-type", "") else "ndjson")
+        stream = open_text_stream(request.stream())
+        try:
+            result = await run_in_threadpool(TodoService.import_todos, stream, fmt)
+        except UnicodeDecodeError:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Arquivo deve estar em UTF-8"
+            )
+        
+        client_ip = request.client.host if request.client else "unknown"
+        logger.info(f"Todos imported by: {current_user.username} - IP: {client_ip} - Imported: {result['imported']} - Failed: {result['failed']}")
+        audit_logger.info(f"IMPORT_TODOS - User: {current_user.username} - IP: {client_ip} - Format: {fmt} - Imported: {result['imported']} - Failed: {result['failed']}")
+        return result
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error importing todos: {str(e)} - User: {current_user.username}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Erro interno do servidor"
+        )
+
+@router.get("/todos/search", response_model=TodoSearchResponse)
+async def search_todos(
+    request: Request,
+    q: str = Query(..., min_length=1, max_length=200),
+    page: int = Query(1, ge=1),
+    page_size: int = Query(20, ge=1, le=100),
+    current_user: UserInDB = Depends(get_current_user),
+    _: bool = Depends(rate_limit_dependency(200))
+):
+    try:
+        total, body = await run_in_threadpool(TodoService.search_todos_encoded, q, page, page_size)
+
+        client_ip = request.client.host if request.client else "unknown"
+        logger.info(f"Todos searched by: {current_user.username} - IP: {client_ip}")
+        audit_logger.info(f"SEARCH_TODOS - User: {current_user.username} - IP: {client_ip} - Count: {total}")
+        return Response(content=body, media_type="application/json")
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error searching todos: {str(e)} - User: {current_user.username}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Erro interno do servidor"
+        )
+
+@router.get("/todos/stats", response_model=TodoStatsResponse)
+async def get_todo_stats(
+    request: Request,
+    response: Response,
+    current_user: UserInDB = Depends(get_current_user),
+    _: bool = Depends(rate_limit_dependency(300))
+):
+    try:
+        etag = TodoService.stats_etag()
+        if _etag_matches(request.headers.get("if-none-match"), etag):
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+
+        etag, stats = TodoService.get_stats()
+        response.headers["ETag"] = etag
+        response.headers["Cache-Control"] = "no-cache"
+        return stats
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error getting todo stats: {str(e)} - User: {current_user.username}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Erro interno do servidor"
+        )
+
+@router.get("/todos/due", response_model=List[Todo])
+async def list_due_todos(
+    request: Request,
+    before: Optional[datetime] = Query(None, description="Padrão: agora (todos já vencidos)"),
+    limit: int = Query(100, ge=1, le=1000),
+    current_user: UserInDB = Depends(get_current_user),
+    _: bool = Depends(rate_limit_dependency(200))
+):
+    try:
+        todos = TodoService.list_due(before or datetime.now(timezone.utc), limit)
+
+        client_ip = request.client.host if request.client else "unknown"
+        logger.info(f"Due todos listed by: {current_user.username} - IP: {client_ip}")
+        audit_logger.info(f"LIST_DUE_TODOS - User: {current_user.username} - IP: {client_ip} - Count: {len(todos)}")
+        return todos
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error listing due todos: {str(e)} - User: {current_user.username}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Erro interno do servidor"
+        )
+
+@router.get("/todos/archive", response_model=TodoArchiveResponse)
+async def list_archived_todos(
+    request: Request,
+    page: int = Query(1, ge=1),
+    page_size: int = Query(50, ge=1, le=500),
+    current_user: UserInDB = Depends(get_current_user),
+    _: bool = Depends(rate_limit_dependency(200))
+):
+    try:
+        # Segmentos do arquivo são lidos do disco
+        total, body = await run_in_threadpool(TodoService.list_archived_encoded, page, page_size)
+
+        client_ip = request.client.host if request.client else "unknown"
+        logger.info(f"Archived todos listed by: {current_user.username} - IP: {client_ip}")
+        audit_logger.info(f"LIST_ARCHIVED_TODOS - User: {current_user.username} - IP: {client_ip} - Count: {total}")
+        return Response(content=body, media_type="application/json")
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error listing archived todos: {str(e)} - User: {current_user.username}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Erro interno do servidor"
+        )
+
+@router.post("/todos/archive/{todo_id}/restore", response_model=Todo)
+async def restore_archived_todo(
+    request: Request,
+    todo_id: int,
+    current_user: UserInDB = Depends(get_current_user),
+    _: bool = Depends(rate_limit_dependency(100))
+):
+    try:
+        todo = await run_in_threadpool(TodoService.restore_archived, todo_id)
+        if todo is None:
+            raise HTTPException(status_code=404, detail="Todo arquivado não encontrado")
+
+        client_ip = request.client.host if request.client else "unknown"
+        logger.info(f"Todo restored from archive: {todo_id} by: {current_user.username} - IP: {client_ip}")
+        audit_logger.info(f"RESTORE_TODO - ID: {todo_id} - User: {current_user.username} - IP: {client_ip}")
+        return todo
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error restoring todo: {str(e)} - User: {current_user.username}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Erro interno do servidor"
+        )
+
 @router.get("/todos/{todo_id}", response_model=Todo)
 def get_todo(
     request: Request, 
@@ -79,9 +282,9 @@ def get_todo(
     _: bool = Depends(rate_limit_dependency(300))
 ):
     try:
-        todo = TodoService.get_todo(todo_id)
+        body = TodoService.get_todo_encoded(todo_id)
         
-        if not todo:
+        if body is None:
             logger.warning(f"Todo not found: {todo_id} - User: {current_user.username}")
             audit_logger.warning(f"ACCESS_TODO_NOT_FOUND - ID: {todo_id} - User: {current_user.username}")
             raise HTTPException(status_code=404, detail="Todo não encontrado")
@@ -89,7 +292,7 @@ def get_todo(
         client_ip = request.client.host if request.client else "unknown"
         logger.info(f"Todo accessed: {todo_id} by: {current_user.username} - IP: {client_ip}")
         audit_logger.info(f"ACCESS_TODO - ID: {todo_id} - User: {current_user.username} - IP: {client_ip}")
-        return todo
+        return Response(content=body, media_type="application/json")
         
     except HTTPException:
         raise
@@ -119,6 +322,14 @@ def update_todo(
                 detail="Título do todo é obrigatório"
             )
         
+        try:
+            updated_todo.tags = TodoService.clean_tags(updated_todo.tags)
+        except ValueError as e:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=str(e)
+            )
+        
         updated_todo.title = updated_todo.title.strip()
         if updated_todo.description:
             updated_todo.description = updated_todo.description.strip()
@@ -167,6 +378,50 @@ def toggle_todo_status(
             detail="Erro interno do servidor"
         )
 
+@router.post("/todos/{todo_id}/move", response_model=Todo)
+def move_todo(
+    request: Request,
+    todo_id: int,
+    move: TodoMoveRequest,
+    background_tasks: BackgroundTasks,
+    current_user: UserInDB = Depends(get_current_user),
+    _: bool = Depends(rate_limit_dependency(300))
+):
+    try:
+        if move.after_id is None and move.before_id is None:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Informe after_id e/ou before_id"
+            )
+        
+        try:
+            todo = TodoService.move_todo(todo_id, move.after_id, move.before_id)
+        except ValueError as e:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=str(e)
+            )
+        if todo is None:
+            raise HTTPException(status_code=404, detail="Todo não encontrado")
+        
+        # Chaves que cresceram demais são encurtadas depois da resposta
+        if TodoService.positions_need_rebalance():
+            background_tasks.add_task(TodoService.rebalance_positions)
+        
+        client_ip = request.client.host if request.client else "unknown"
+        logger.info(f"Todo moved: {todo_id} by: {current_user.username} - IP: {client_ip}")
+        audit_logger.info(f"MOVE_TODO - ID: {todo_id} - User: {current_user.username} - IP: {client_ip} - After: {move.after_id} - Before: {move.before_id}")
+        return todo
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error moving todo: {str(e)} - User: {current_user.username}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Erro interno do servidor"
+        )
+
 @router.delete("/todos/{todo_id}")
 def delete_todo(
     request: Request, 
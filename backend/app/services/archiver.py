@@ -0,0 +1,44 @@
+import logging
+import os
+import threading
+from typing import Optional
+
+from app.services.todo_service import TodoService
+
+logger = logging.getLogger("archive")
+
+# Intervalo entre varreduras de arquivamento; 0 desativa a varredura periódica
+ARCHIVE_INTERVAL_SECONDS = int(os.getenv("ARCHIVE_INTERVAL_SECONDS", "3600"))
+
+
+class Archiver:
+    """Thread que periodicamente move os todos concluídos antigos para o arquivo"""
+
+    def __init__(self, interval: int = ARCHIVE_INTERVAL_SECONDS):
+        self.interval = interval
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        if self._thread is not None or self.interval <= 0:
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name="archiver", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        if self._thread is None:
+            return
+        self._stop_event.set()
+        self._thread.join(timeout=5)
+        self._thread = None
+
+    def _run(self) -> None:
+        while not self._stop_event.wait(self.interval):
+            try:
+                TodoService.archive_completed()
+            except Exception as e:
+                logger.error(f"Archive sweep failed: {e}")
+
+
+archiver = Archiver()
@@ -1,15 +1,25 @@
-from typing import Optional
+from typing import Optional, Tuple
+from fastapi import BackgroundTasks
 from app.models.user import UserInDB, Token
-from app.services.user_service import user_service
 from app.core.security import security_manager
-from app.utils.security import verify_password, create_access_token, create_refresh_token, sanitize_username
+from app.repositories.session_repository import session_repository
+from app.core.deadline import check_deadline
+from app.repositories.async_repository import async_user_repository
+from app.repositories.user_repository import user_repository
+from app.core.metrics import metrics
+from app.utils.security import (
+    verify_password_async, password_needs_update, hash_password,
+    create_access_token, create_refresh_token, sanitize_username,
+)
 import logging
 
 logger = logging.getLogger("auth_service")
 
 class AuthService:
     @staticmethod
-    def authenticate_user(username: str, password: str) -> Optional[UserInDB]:
+    async def authenticate_user(
+        username: str, password: str, background_tasks: Optional[BackgroundTasks] = None
+    ) -> Optional[UserInDB]:
         try:
             username = sanitize_username(username)
         except ValueError:
@@ -18,7 +28,7 @@ class AuthService:
                 return None
             username = username.lower()
         
-        user = user_service.get_user_by_username(username)
+        user = await async_user_repository.get_by_username(username)
         
         if not user:
             logger.warning(f"User not found: {username}")
@@ -32,19 +42,45 @@ class AuthService:
             logger.warning(f"Account locked: {username}")
             return None
         
-        if not verify_password(password, user.password):
+        # bcrypt é a etapa cara: não começa se a requisição já estourou o prazo
+        check_deadline()
+        if not await verify_password_async(password, user.password):
             security_manager.record_failed_login(user)
+            await async_user_repository.update(user)
             logger.warning(f"Wrong password: {username}")
             return None
         
         security_manager.reset_failed_attempts(user)
+        await async_user_repository.update(user)
+        if background_tasks is not None and password_needs_update(user.password):
+            # Custo abaixo do calibrado, outro esquema ou SHA-256 legado: regrava depois da resposta
+            background_tasks.add_task(AuthService.rehash_password, user.username, user.password, password)
         logger.info(f"Successful login: {username}")
         return user
     
     @staticmethod
-    def create_tokens_for_user(user: UserInDB) -> Token:
-        access_token = create_access_token(data={"sub": user.username})
-        refresh_token = create_refresh_token(data={"sub": user.username})
+    def rehash_password(username: str, old_hash: str, password: str) -> bool:
+        """Troca o hash pelo do esquema e custo atuais, se a senha não mudou enquanto isso"""
+        try:
+            new_hash = hash_password(password)
+        except Exception as e:
+            logger.error(f"Password rehash failed: {username}: {e}")
+            return False
+        user = user_repository.get_by_username(username)
+        if user is None or user.password != old_hash:
+            return False
+        user.password = new_hash
+        user_repository.update(user)
+        metrics.inc("password_rehash_total")
+        logger.info(f"Password hash upgraded: {username}")
+        return True
+    
+    @staticmethod
+    def create_tokens_for_user(user: UserInDB, session: Optional[Tuple[str, int]] = None) -> Token:
+        """Emite o par de tokens; sem sessão informada, abre uma nova família de refresh tokens"""
+        family_id, generation = session or session_repository.create(user.username)
+        access_token = create_access_token(data={"sub": user.username, "fam": family_id})
+        refresh_token = create_refresh_token(data={"sub": user.username, "fam": family_id, "gen": generation})
         
         return Token(
             access_token=access_token,
@@ -53,4 +89,28 @@ class AuthService:
             expires_in=900
         )
 
+    @staticmethod
+    def rotate_session(payload: dict) -> Optional[Tuple[str, int]]:
+        """Avança a geração da família do refresh token; None se revogada, expirada ou reutilizada"""
+        family_id = payload.get("fam")
+        generation = payload.get("gen")
+        if not family_id or not isinstance(generation, int):
+            return None
+        new_generation = session_repository.rotate(family_id, generation)
+        if new_generation is None:
+            logger.warning(f"Refresh rejected for session family {family_id}: {payload.get('sub')}")
+            return None
+        return family_id, new_generation
+    
+    @staticmethod
+    def revoke_session(payload: dict) -> bool:
+        family_id = payload.get("fam")
+        return bool(family_id) and session_repository.revoke(family_id)
+    
+    @staticmethod
+    def revoke_all_sessions(username: str) -> int:
+        revoked = session_repository.revoke_user(username)
+        logger.info(f"All sessions revoked: {username} ({revoked})")
+        return revoked
+
 auth_service = AuthService()
\ No newline at end of file
@@ -0,0 +1,250 @@
+import heapq
+import itertools
+import json
+import logging
+import os
+import threading
+import time
+import urllib.request
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+
+from app.core.memory import memory_registry
+from app.core.metrics import metrics
+from app.utils.ordered_index import OrderedIndex
+
+logger = logging.getLogger("reminders")
+
+# Sinks que recebem os vencimentos, separados por vírgula: "log", "webhook"
+REMINDER_SINKS = os.getenv("REMINDER_SINKS", "log")
+REMINDER_WEBHOOK_URL = os.getenv("REMINDER_WEBHOOK_URL", "")
+REMINDER_WEBHOOK_TIMEOUT_MS = int(os.getenv("REMINDER_WEBHOOK_TIMEOUT_MS", "2000"))
+# Antecedência do lembrete em relação ao due_at
+REMINDER_LEAD_SECONDS = int(os.getenv("REMINDER_LEAD_SECONDS", "0"))
+# Espera máxima da thread entre verificações, para acompanhar ajustes no relógio do sistema
+_MAX_WAIT_SECONDS = 60
+# Entradas canceladas ficam no heap até a próxima compactação
+_COMPACT_MIN_STALE = 1024
+
+
+def as_utc(value: datetime) -> datetime:
+    """Datas sem fuso são tratadas como UTC"""
+    if value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc)
+
+
+class ReminderSink:
+    """Destino dos eventos de vencimento; deliver roda na thread do agendador e não deve bloquear por muito tempo"""
+
+    name = "sink"
+
+    def deliver(self, event: dict) -> None:
+        raise NotImplementedError
+
+
+class LogSink(ReminderSink):
+    name = "log"
+
+    def deliver(self, event: dict) -> None:
+        logger.info(f"Todo due: {event['todo_id']} - Title: {event['title'][:50]} - Due at: {event['due_at']}")
+
+
+class WebhookSink(ReminderSink):
+    """POST do evento em JSON, sem retry nem fila: falhas são só registradas"""
+
+    name = "webhook"
+
+    def __init__(self, url: str, timeout_ms: int = REMINDER_WEBHOOK_TIMEOUT_MS):
+        self.url = url
+        self.timeout = timeout_ms / 1000
+
+    def deliver(self, event: dict) -> None:
+        request = urllib.request.Request(
+            self.url,
+            data=json.dumps(event).encode(),
+            headers={"Content-Type": "application/json"},
+            method="POST",
+        )
+        with urllib.request.urlopen(request, timeout=self.timeout):
+            pass
+
+
+class DueScheduler:
+    """Lembretes de vencimento num min-heap, disparados por uma thread que dorme até o próximo
+
+    Agendar, reagendar e cancelar custam O(log n) no número de todos com vencimento, nunca no
+    total de todos: cancelamentos só invalidam a entrada, descartada quando chega ao topo do heap
+    ou na compactação. Mantém também o índice ordenado usado por GET /todos/due.
+    """
+
+    def __init__(self, sinks: Optional[List[ReminderSink]] = None, lead_seconds: int = REMINDER_LEAD_SECONDS):
+        self.lead_seconds = lead_seconds
+        self.sinks: List[ReminderSink] = list(sinks or [])
+        # todo_id ordenado pelo vencimento, para GET /todos/due
+        self.index = OrderedIndex()
+        # (momento do disparo, sequência, todo_id)
+        self._heap: List[Tuple[float, int, int]] = []
+        # todo_id -> (momento do disparo, sequência, todo) da entrada válida no heap
+        self._scheduled: Dict[int, Tuple[float, int, object]] = {}
+        self._stale = 0
+        self._sequence = itertools.count()
+        self._condition = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+        self._stopping = False
+        self.fired = 0
+
+    def register_sink(self, sink: ReminderSink) -> None:
+        """Ponto de extensão para outros destinos (ex.: um canal de push para os clientes)"""
+        self.sinks.append(sink)
+
+    # --- manutenção, chamada pelas mutações da store ---
+
+    def update(self, todo) -> None:
+        """(Re)agenda conforme o due_at e o status atuais; todos concluídos ou sem data saem da agenda"""
+        due_ts = todo.due_at.timestamp() if todo.due_at is not None and not todo.completed else None
+        with self._condition:
+            self.index.set(todo.id, due_ts)
+            fire_at = due_ts - self.lead_seconds if due_ts is not None else None
+            current = self._scheduled.get(todo.id)
+            if current is not None and current[0] == fire_at:
+                # Mesma data (ex.: só o título mudou): atualiza o todo usado no evento
+                self._scheduled[todo.id] = (fire_at, current[1], todo)
+                return
+            if current is not None:
+                del self._scheduled[todo.id]
+                self._stale += 1
+            # Vencimentos já passados não geram lembrete, só aparecem em /todos/due
+            if fire_at is None or fire_at <= time.time():
+                return
+            sequence = next(self._sequence)
+            self._scheduled[todo.id] = (fire_at, sequence, todo)
+            heapq.heappush(self._heap, (fire_at, sequence, todo.id))
+            if self._heap[0][1] == sequence:
+                # Novo primeiro da fila: acorda a thread para recalcular a espera
+                self._condition.notify()
+
+    def cancel(self, todo_id: int) -> None:
+        with self._condition:
+            self.index.set(todo_id, None)
+            if self._scheduled.pop(todo_id, None) is not None:
+                self._stale += 1
+
+    def rebuild(self, todos) -> None:
+        """Recria agenda e índice a partir da store (carga inicial), com heapify em vez de um push por todo"""
+        now = time.time()
+        keys: List[Tuple[float, int]] = []
+        heap: List[Tuple[float, int, int]] = []
+        scheduled: Dict[int, Tuple[float, int, object]] = {}
+        for todo in todos:
+            if todo.due_at is None or todo.completed:
+                continue
+            due_ts = todo.due_at.timestamp()
+            keys.append((due_ts, todo.id))
+            fire_at = due_ts - self.lead_seconds
+            if fire_at > now:
+                sequence = next(self._sequence)
+                scheduled[todo.id] = (fire_at, sequence, todo)
+                heap.append((fire_at, sequence, todo.id))
+        heapq.heapify(heap)
+        with self._condition:
+            self.index.load(keys)
+            self._heap = heap
+            self._scheduled = scheduled
+            self._stale = 0
+            self._condition.notify()
+
+    def due_before(self, before: datetime, limit: int) -> List[int]:
+        with self._condition:
+            return self.index.below(as_utc(before).timestamp(), limit)
+
+    # --- thread de disparo ---
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        self._stopping = False
+        self._thread = threading.Thread(target=self._run, name="due-scheduler", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        if self._thread is None:
+            return
+        with self._condition:
+            self._stopping = True
+            self._condition.notify()
+        self._thread.join(timeout=5)
+        self._thread = None
+
+    def _compact(self) -> None:
+        self._heap = [(fire_at, sequence, todo_id) for todo_id, (fire_at, sequence, _) in self._scheduled.items()]
+        heapq.heapify(self._heap)
+        self._stale = 0
+
+    def _next_due(self) -> List[object]:
+        """Bloqueia até haver lembretes vencidos (ou stop) e os retira da agenda"""
+        with self._condition:
+            while not self._stopping:
+                if self._stale > _COMPACT_MIN_STALE and self._stale > len(self._scheduled):
+                    self._compact()
+                now = time.time()
+                due = []
+                while self._heap and self._heap[0][0] <= now:
+                    fire_at, sequence, todo_id = heapq.heappop(self._heap)
+                    current = self._scheduled.get(todo_id)
+                    if current is None or current[1] != sequence:
+                        self._stale -= 1
+                        continue
+                    del self._scheduled[todo_id]
+                    due.append(current[2])
+                if due:
+                    return due
+                timeout = _MAX_WAIT_SECONDS
+                if self._heap:
+                    timeout = min(timeout, self._heap[0][0] - now)
+                self._condition.wait(timeout)
+            return []
+
+    def _run(self) -> None:
+        while True:
+            due = self._next_due()
+            if not due:
+                return
+            for todo in due:
+                self._deliver(todo)
+
+    def _deliver(self, todo) -> None:
+        event = {
+            "todo_id": todo.id,
+            "title": todo.title,
+            "due_at": as_utc(todo.due_at).isoformat() if todo.due_at is not None else None,
+            "fired_at": datetime.now(timezone.utc).isoformat(),
+        }
+        self.fired += 1
+        metrics.inc("reminders_fired_total")
+        for sink in self.sinks:
+            try:
+                sink.deliver(event)
+            except Exception as e:
+                metrics.inc("reminder_sink_errors_total", sink=sink.name)
+                logger.error(f"Reminder sink {sink.name} failed for todo {todo.id}: {e}")
+
+
+def _configured_sinks() -> List[ReminderSink]:
+    sinks: List[ReminderSink] = []
+    for name in (item.strip() for item in REMINDER_SINKS.split(",")):
+        if name == "log":
+            sinks.append(LogSink())
+        elif name == "webhook":
+            if REMINDER_WEBHOOK_URL:
+                sinks.append(WebhookSink(REMINDER_WEBHOOK_URL))
+            else:
+                logger.warning("Reminder webhook sink enabled without REMINDER_WEBHOOK_URL; ignoring")
+        elif name:
+            logger.warning(f"Unknown reminder sink: {name}")
+    return sinks
+
+
+due_scheduler = DueScheduler(_configured_sinks())
+memory_registry.register("reminder_heap", lambda: due_scheduler._heap)
+memory_registry.register("due_index", lambda: due_scheduler.index._keys)
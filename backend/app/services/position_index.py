@@ -0,0 +1,172 @@
+import os
+import threading
+from typing import Callable, List, Optional, Set
+
+from app.core.memory import memory_registry
+from app.utils.fractional_index import key_between, keys_between
+from app.utils.ordered_index import OrderedIndex
+
+# Chaves maiores que isso (inserções repetidas no mesmo vão) marcam a vizinhança para rebalanceamento
+POSITION_KEY_MAX_LENGTH = int(os.getenv("POSITION_KEY_MAX_LENGTH", "16"))
+# Janela inicial do rebalanceamento, dobrada até as novas chaves ficarem curtas
+_REBALANCE_MIN_WINDOW = 16
+
+
+class TodoPositionIndex:
+    """Ordem definida pelo usuário: cada todo tem uma chave fracionária em todo.position
+
+    Mover um todo gera uma chave nova entre as dos vizinhos de destino, sem renumerar os outros:
+    uma escrita e um evento de tamanho fixo por movimento. As chaves ficam num OrderedIndex para
+    leituras por trecho; quando um vão é usado muitas vezes as chaves crescem, e o rebalanceamento
+    (raro, em segundo plano) reescreve só a vizinhança afetada.
+    """
+
+    def __init__(self):
+        self.index = OrderedIndex()
+        # Ids com chave longa, aguardando rebalanceamento
+        self._crowded: Set[int] = set()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    def _set(self, todo, key: str) -> None:
+        todo.position = key
+        self.index.set(todo.id, key)
+        if len(key) > POSITION_KEY_MAX_LENGTH:
+            self._crowded.add(todo.id)
+
+    def _last_key(self) -> Optional[str]:
+        last = self.index.last()
+        return last[0] if last is not None else None
+
+    def append(self, todo) -> None:
+        """Coloca o todo no fim da lista"""
+        with self._lock:
+            self._set(todo, key_between(self._last_key(), None))
+
+    def append_many(self, todos) -> None:
+        """Coloca um lote de todos novos no fim, na ordem recebida"""
+        with self._lock:
+            entries = []
+            for todo, key in zip(todos, keys_between(self._last_key(), None, len(todos))):
+                todo.position = key
+                entries.append((key, todo.id))
+            self.index.extend(entries)
+
+    def place(self, todo) -> None:
+        """Indexa a posição já gravada no todo (replay); sem posição, vai para o fim"""
+        if todo.position is None:
+            self.append(todo)
+            return
+        with self._lock:
+            self._set(todo, todo.position)
+
+    def remove(self, todo_id: int) -> None:
+        with self._lock:
+            self.index.set(todo_id, None)
+            self._crowded.discard(todo_id)
+
+    def remove_many(self, todo_ids) -> None:
+        with self._lock:
+            for todo_id in todo_ids:
+                self.index.set(todo_id, None)
+                self._crowded.discard(todo_id)
+
+    def move(self, todo, after_id: Optional[int], before_id: Optional[int]) -> None:
+        """Posiciona o todo logo depois de after_id e/ou logo antes de before_id; ValueError se inválido"""
+        if todo.id in (after_id, before_id):
+            raise ValueError("Um todo não pode ser movido em relação a si mesmo")
+        with self._lock:
+            index = self.index
+            for reference in (after_id, before_id):
+                if reference is not None and index.get(reference) is None:
+                    raise ValueError(f"Todo de referência não encontrado: {reference}")
+            # Sai da ordem antes de procurar os vizinhos, para não ser vizinho de si mesmo
+            current = index.get(todo.id)
+            index.set(todo.id, None)
+            try:
+                if after_id is not None:
+                    low = index.get(after_id)
+                    if before_id is not None:
+                        high = index.get(before_id)
+                    else:
+                        following = index.neighbors(after_id)[1]
+                        high = following[0] if following is not None else None
+                else:
+                    high = index.get(before_id)
+                    previous = index.neighbors(before_id)[0]
+                    low = previous[0] if previous is not None else None
+                if low is not None and high is not None and low >= high:
+                    raise ValueError("after_id deve estar antes de before_id na ordem atual")
+                key = key_between(low, high)
+            except ValueError:
+                if current is not None:
+                    index.set(todo.id, current)
+                raise
+            self._set(todo, key)
+
+    def needs_rebalance(self) -> bool:
+        return bool(self._crowded)
+
+    def rebalance(self, lookup: Callable[[int], object]) -> List[object]:
+        """Reescreve as chaves em volta dos ids com chave longa; devolve os todos alterados"""
+        changed = {}
+        with self._lock:
+            index = self.index
+            crowded, self._crowded = self._crowded, set()
+            target = POSITION_KEY_MAX_LENGTH // 2
+            for todo_id in crowded:
+                key = index.get(todo_id)
+                # Pode já ter sido encurtada pela janela de outro id
+                if key is None or len(key) <= POSITION_KEY_MAX_LENGTH:
+                    continue
+                rank = index.rank(todo_id)
+                total = len(index)
+                radius = _REBALANCE_MIN_WINDOW // 2
+                while True:
+                    start, stop = max(rank - radius, 0), min(rank + radius + 1, total)
+                    window = list(index.entries(start, stop))
+                    low = next(index.entries(start - 1, start))[0] if start > 0 else None
+                    high = next(index.entries(stop, stop + 1))[0] if stop < total else None
+                    keys = keys_between(low, high, len(window))
+                    # A lista inteira sempre cabe em chaves curtas a partir do início
+                    if max(map(len, keys)) <= target or (start == 0 and stop == total):
+                        break
+                    radius *= 2
+                for (old_key, item_id), new_key in zip(window, keys):
+                    if old_key == new_key:
+                        continue
+                    index.set(item_id, new_key)
+                    todo = lookup(item_id)
+                    if todo is not None:
+                        todo.position = new_key
+                        changed[item_id] = todo
+        return list(changed.values())
+
+    def rebuild(self, todos) -> int:
+        """Recria o índice (carga inicial); todos sem posição vão para o fim, na ordem recebida"""
+        with self._lock:
+            entries = []
+            missing = []
+            for todo in todos:
+                if todo.position is None:
+                    missing.append(todo)
+                else:
+                    entries.append((todo.position, todo.id))
+            last = max(entries)[0] if entries else None
+            for todo, key in zip(missing, keys_between(last, None, len(missing))):
+                todo.position = key
+                entries.append((key, todo.id))
+            self.index.load(entries)
+            self._crowded = {item_id for key, item_id in entries if len(key) > POSITION_KEY_MAX_LENGTH}
+            return len(missing)
+
+    def ids(self, start: int = 0, stop: Optional[int] = None) -> List[int]:
+        """Ids na ordem do usuário, da posição start até stop (exclusivo)"""
+        with self._lock:
+            return [item_id for _, item_id in self.index.entries(start, stop)]
+
+
+position_index = TodoPositionIndex()
+memory_registry.register("position_index", lambda: position_index.index._keys)
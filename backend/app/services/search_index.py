@@ -0,0 +1,206 @@
+import bisect
+import heapq
+import math
+import re
+import threading
+import unicodedata
+from typing import Dict, List, Tuple
+
+_TOKEN_RE = re.compile(r"\w+")
+_COMBINING_RE = re.compile(r"[\u0300-\u036f]")
+
+# Peso de cada campo no cálculo de relevância
+TITLE_WEIGHT = 3
+DESCRIPTION_WEIGHT = 1
+# Desconto aplicado quando o termo casa apenas por prefixo
+PREFIX_MATCH_FACTOR = 0.5
+
+
+def normalize_text(text: str) -> str:
+    """Remove acentos e normaliza caixa ("Ação" -> "acao")"""
+    if text.isascii():
+        return text.lower()
+    return _COMBINING_RE.sub("", unicodedata.normalize("NFKD", text)).casefold()
+
+
+def tokenize(text: str) -> List[str]:
+    if not text:
+        return []
+    return _TOKEN_RE.findall(normalize_text(text))
+
+
+class TodoSearchIndex:
+    """Índice invertido sobre título e descrição dos todos, mantido incrementalmente"""
+
+    def __init__(self):
+        # termo -> {todo_id: peso}
+        self._postings: Dict[str, Dict[int, int]] = {}
+        # todo_id -> {termo: peso}, usado para remover/atualizar sem varrer o índice
+        self._doc_terms: Dict[int, Dict[str, int]] = {}
+        # vocabulário ordenado para busca por prefixo
+        self._vocabulary: List[str] = []
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _weighted_terms(todo) -> Dict[str, int]:
+        terms: Dict[str, int] = {}
+        for term in tokenize(todo.title):
+            terms[term] = terms.get(term, 0) + TITLE_WEIGHT
+        for term in tokenize(todo.description):
+            terms[term] = terms.get(term, 0) + DESCRIPTION_WEIGHT
+        return terms
+
+    def _add_posting(self, term: str, todo_id: int, weight: int) -> None:
+        postings = self._postings.get(term)
+        if postings is None:
+            postings = self._postings[term] = {}
+            bisect.insort(self._vocabulary, term)
+        postings[todo_id] = weight
+
+    def _remove_posting(self, term: str, todo_id: int) -> None:
+        postings = self._postings.get(term)
+        if postings is None:
+            return
+        postings.pop(todo_id, None)
+        if not postings:
+            del self._postings[term]
+            index = bisect.bisect_left(self._vocabulary, term)
+            if index < len(self._vocabulary) and self._vocabulary[index] == term:
+                del self._vocabulary[index]
+
+    def add(self, todo) -> None:
+        terms = self._weighted_terms(todo)
+        with self._lock:
+            self._apply(todo.id, terms)
+
+    def add_many(self, todos) -> None:
+        """Indexa um lote de todos novos; o vocabulário é reordenado uma vez por lote"""
+        batch = [(todo.id, self._weighted_terms(todo)) for todo in todos]
+        with self._lock:
+            new_terms = []
+            for todo_id, terms in batch:
+                if not terms:
+                    continue
+                self._doc_terms[todo_id] = terms
+                for term, weight in terms.items():
+                    postings = self._postings.get(term)
+                    if postings is None:
+                        postings = self._postings[term] = {}
+                        new_terms.append(term)
+                    postings[todo_id] = weight
+            if new_terms:
+                # Timsort aproveita as duas sequências já ordenadas: custo ~linear
+                new_terms.sort()
+                self._vocabulary.extend(new_terms)
+                self._vocabulary.sort()
+
+    def update(self, todo) -> None:
+        terms = self._weighted_terms(todo)
+        with self._lock:
+            self._apply(todo.id, terms)
+
+    def remove(self, todo_id: int) -> None:
+        with self._lock:
+            for term in self._doc_terms.pop(todo_id, {}):
+                self._remove_posting(term, todo_id)
+
+    def remove_many(self, todo_ids) -> None:
+        """Remove um lote; o vocabulário é filtrado uma vez em vez de um del por termo esvaziado"""
+        with self._lock:
+            emptied = set()
+            for todo_id in todo_ids:
+                for term in self._doc_terms.pop(todo_id, {}):
+                    postings = self._postings.get(term)
+                    if postings is None:
+                        continue
+                    postings.pop(todo_id, None)
+                    if not postings:
+                        del self._postings[term]
+                        emptied.add(term)
+            if emptied:
+                self._vocabulary = [term for term in self._vocabulary if term not in emptied]
+
+    def _apply(self, todo_id: int, terms: Dict[str, int]) -> None:
+        """Aplica apenas a diferença entre os termos antigos e os novos"""
+        old_terms = self._doc_terms.get(todo_id, {})
+        for term in old_terms.keys() - terms.keys():
+            self._remove_posting(term, todo_id)
+        for term, weight in terms.items():
+            if old_terms.get(term) != weight:
+                self._add_posting(term, todo_id, weight)
+        if terms:
+            self._doc_terms[todo_id] = terms
+        else:
+            self._doc_terms.pop(todo_id, None)
+
+    def rebuild(self, todos) -> None:
+        """Reconstrói o índice do zero (usado apenas na carga inicial)"""
+        postings: Dict[str, Dict[int, int]] = {}
+        doc_terms: Dict[int, Dict[str, int]] = {}
+        for todo in todos:
+            terms = self._weighted_terms(todo)
+            if not terms:
+                continue
+            doc_terms[todo.id] = terms
+            for term, weight in terms.items():
+                term_postings = postings.get(term)
+                if term_postings is None:
+                    term_postings = postings[term] = {}
+                term_postings[todo.id] = weight
+        with self._lock:
+            self._postings = postings
+            self._doc_terms = doc_terms
+            self._vocabulary = sorted(postings)
+
+    def _expand(self, query_term: str) -> List[Tuple[str, float]]:
+        """Termos do vocabulário que casam com o termo da consulta (exato ou prefixo)"""
+        matches = []
+        vocabulary = self._vocabulary
+        index = bisect.bisect_left(vocabulary, query_term)
+        while index < len(vocabulary) and vocabulary[index].startswith(query_term):
+            term = vocabulary[index]
+            matches.append((term, 1.0 if term == query_term else PREFIX_MATCH_FACTOR))
+            index += 1
+        return matches
+
+    def search(self, query: str, offset: int = 0, limit: int = 20) -> Tuple[int, List[Tuple[int, float]]]:
+        """Retorna (total de resultados, [(todo_id, score)]) ordenados por relevância"""
+        query_terms = list(dict.fromkeys(tokenize(query)))
+        if not query_terms:
+            return 0, []
+
+        with self._lock:
+            total_docs = max(len(self._doc_terms), 1)
+            per_term_scores: List[Dict[int, float]] = []
+            for query_term in query_terms:
+                scores: Dict[int, float] = {}
+                for term, factor in self._expand(query_term):
+                    postings = self._postings[term]
+                    idf = math.log(1 + total_docs / len(postings))
+                    for todo_id, weight in postings.items():
+                        score = weight * idf * factor
+                        if score > scores.get(todo_id, 0.0):
+                            scores[todo_id] = score
+                if not scores:
+                    return 0, []
+                per_term_scores.append(scores)
+
+        # Todos os termos precisam casar: intersecta a partir do menor conjunto
+        per_term_scores.sort(key=len)
+        smallest, others = per_term_scores[0], per_term_scores[1:]
+        results = []
+        for todo_id, score in smallest.items():
+            total_score = score
+            for scores in others:
+                other = scores.get(todo_id)
+                if other is None:
+                    break
+                total_score += other
+            else:
+                results.append((todo_id, total_score))
+
+        top = heapq.nsmallest(offset + limit, results, key=lambda item: (-item[1], item[0]))
+        return len(results), top[offset:]
+
+
+search_index = TodoSearchIndex()
@@ -0,0 +1,147 @@
+import threading
+from typing import Dict, List, Optional, Tuple
+
+from app.utils.bitmap import RoaringBitmap
+
+
+class TodoTagIndex:
+    """Bitmaps sobre os ids dos todos, um por tag e um para os concluídos, mantidos incrementalmente
+
+    Os ids já são ordinais compactos (sequenciais, atribuídos pelo backend), então entram direto
+    nos bitmaps; os buracos deixados por remoções viram containers esparsos ou ausentes.
+    """
+
+    def __init__(self):
+        # tag -> ids dos todos com a tag
+        self._tags: Dict[str, RoaringBitmap] = {}
+        # todo_id -> tags atuais, usado para atualizar/remover sem varrer os bitmaps
+        self._doc_tags: Dict[int, Tuple[str, ...]] = {}
+        self._all = RoaringBitmap()
+        self._completed = RoaringBitmap()
+        self._lock = threading.Lock()
+
+    def _apply(self, todo_id: int, tags: Tuple[str, ...], completed: bool) -> None:
+        old_tags = self._doc_tags.get(todo_id, ())
+        for tag in old_tags:
+            if tag not in tags:
+                bitmap = self._tags[tag]
+                bitmap.discard(todo_id)
+                if not bitmap:
+                    del self._tags[tag]
+        for tag in tags:
+            if tag not in old_tags:
+                bitmap = self._tags.get(tag)
+                if bitmap is None:
+                    bitmap = self._tags[tag] = RoaringBitmap()
+                bitmap.add(todo_id)
+        if tags:
+            self._doc_tags[todo_id] = tags
+        else:
+            self._doc_tags.pop(todo_id, None)
+        self._all.add(todo_id)
+        if completed:
+            self._completed.add(todo_id)
+        else:
+            self._completed.discard(todo_id)
+
+    def _add_new(self, todos) -> None:
+        """Todos ainda fora do índice: um update em lote por bitmap em vez de um add por id"""
+        ids: List[int] = []
+        completed: List[int] = []
+        by_tag: Dict[str, List[int]] = {}
+        for todo in todos:
+            ids.append(todo.id)
+            if todo.completed:
+                completed.append(todo.id)
+            if todo.tags:
+                self._doc_tags[todo.id] = tuple(todo.tags)
+                for tag in todo.tags:
+                    by_tag.setdefault(tag, []).append(todo.id)
+        self._all.update(ids)
+        self._completed.update(completed)
+        for tag, tag_ids in by_tag.items():
+            bitmap = self._tags.get(tag)
+            if bitmap is None:
+                bitmap = self._tags[tag] = RoaringBitmap()
+            bitmap.update(tag_ids)
+
+    def add(self, todo) -> None:
+        with self._lock:
+            self._apply(todo.id, tuple(todo.tags), todo.completed)
+
+    def add_many(self, todos) -> None:
+        """Indexa um lote de todos novos"""
+        with self._lock:
+            self._add_new(todos)
+
+    def update(self, todo) -> None:
+        with self._lock:
+            self._apply(todo.id, tuple(todo.tags), todo.completed)
+
+    def remove(self, todo_id: int) -> None:
+        with self._lock:
+            self._apply(todo_id, (), False)
+            self._all.discard(todo_id)
+
+    def remove_many(self, todo_ids: List[int]) -> None:
+        """Remove um lote com uma diferença de bitmaps por tag em vez de um discard por id"""
+        removed = RoaringBitmap(todo_ids)
+        with self._lock:
+            tags = set()
+            for todo_id in todo_ids:
+                tags.update(self._doc_tags.pop(todo_id, ()))
+            for tag in tags:
+                bitmap = self._tags[tag] - removed
+                if bitmap:
+                    self._tags[tag] = bitmap
+                else:
+                    del self._tags[tag]
+            self._all = self._all - removed
+            self._completed = self._completed - removed
+
+    def rebuild(self, todos) -> None:
+        """Reconstrói os bitmaps do zero (usado apenas na carga inicial)"""
+        with self._lock:
+            self._tags = {}
+            self._doc_tags = {}
+            self._all = RoaringBitmap()
+            self._completed = RoaringBitmap()
+            self._add_new(todos)
+
+    def completed_ids(self) -> List[int]:
+        with self._lock:
+            return list(self._completed)
+
+    def filter(
+        self,
+        all_tags: Tuple[str, ...] = (),
+        any_tags: Tuple[str, ...] = (),
+        exclude_tags: Tuple[str, ...] = (),
+        completed: Optional[bool] = None,
+    ) -> RoaringBitmap:
+        """Ids que têm todas as all_tags, ao menos uma das any_tags, nenhuma das exclude_tags e o status pedido"""
+        with self._lock:
+            required = []
+            for tag in all_tags:
+                bitmap = self._tags.get(tag)
+                if bitmap is None:
+                    return RoaringBitmap()
+                required.append(bitmap)
+            if completed is True:
+                required.append(self._completed)
+            # Sem nenhum filtro positivo, o universo é o conjunto de todos os ids
+            result = RoaringBitmap.intersection(*required) if required else self._all
+            if any_tags:
+                # Por último: a união não tem cardinalidade conhecida para entrar na ordenação acima
+                result = result & RoaringBitmap.union(*(self._tags[tag] for tag in any_tags if tag in self._tags))
+            if completed is False:
+                result = result - self._completed
+            for tag in exclude_tags:
+                bitmap = self._tags.get(tag)
+                if bitmap is not None and result:
+                    result = result - bitmap
+            # Nunca devolve um bitmap mantido pelo índice: o chamador itera fora do lock
+            return result.copy() if result is self._all else result
+
+
+tag_index = TodoTagIndex()
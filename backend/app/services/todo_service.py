@@ -1,48 +1,660 @@
-from app.models.todo import Todo
-from typing import Optional
+from app.models.todo import Todo, TodoArchiveResponse, TodoSearchResponse, TodoStatsResponse
+from app.services.search_index import search_index
+from app.services.tag_index import tag_index
+from app.services.due_scheduler import due_scheduler, as_utc
+from app.services.position_index import position_index
+from app.repositories.persistence import persistence
+from app.repositories.archive import archive_store
+from app.core.invalidation_bus import invalidation_bus, TODO_VERSION_BUMPED
+from app.core.single_flight import todo_reads
+from app.core.deadline import check_deadline
+from app.core.tracing import span, traced
+from app.core.memory import memory_registry
+from app.core.metrics import metrics
+from datetime import datetime, timedelta, timezone
+from pydantic import TypeAdapter
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, TextIO, Tuple
+import csv
+import gc
+import json
+import logging
+import os
+import secrets
+import threading
 
-todos_db = []
+logger = logging.getLogger("todos")
+
+# Indexado por id para acesso O(1); a ordem de exibição vem de position_index
+todos_db: Dict[int, Todo] = {}
+_next_id = 1
+# Serializa as escritas: alocação de id, store e índices mudam juntos (leituras não precisam dele)
+_store_lock = threading.Lock()
+
+# Incrementada a cada mutação; usada para invalidar caches derivados da store
+_store_version = 0
+
+def _bump_version(todo_id: int) -> None:
+    global _store_version
+    _store_version += 1
+    invalidation_bus.publish(TODO_VERSION_BUMPED, {"todo_id": todo_id})
+
+def _on_todo_version_bumped(data: dict) -> None:
+    global _store_version
+    _store_version += 1
+
+invalidation_bus.subscribe(TODO_VERSION_BUMPED, _on_todo_version_bumped)
+
+def _index(todo: Todo) -> None:
+    """Coloca um todo (com id e posição) na store quente e em todos os índices"""
+    todo_stats.replace(todos_db.get(todo.id), todo)
+    todos_db[todo.id] = todo
+    position_index.place(todo)
+    search_index.update(todo)
+    tag_index.update(todo)
+    due_scheduler.update(todo)
+
+def _evict(todo_id: int) -> Optional[Todo]:
+    """Tira um todo da store quente e de todos os índices, sem registrar no journal"""
+    todo = todos_db.pop(todo_id, None)
+    if todo is None:
+        return None
+    position_index.remove(todo_id)
+    search_index.remove(todo_id)
+    tag_index.remove(todo_id)
+    if todo.due_at is not None:
+        due_scheduler.cancel(todo_id)
+    todo_stats.replace(todo, None)
+    return todo
+
+def _evict_many(todo_ids: List[int]) -> List[Todo]:
+    """Como _evict para um lote (arquivamento), com uma atualização por índice"""
+    todos = [todo for todo in (todos_db.pop(todo_id, None) for todo_id in todo_ids) if todo is not None]
+    ids = [todo.id for todo in todos]
+    position_index.remove_many(ids)
+    search_index.remove_many(ids)
+    tag_index.remove_many(ids)
+    for todo in todos:
+        if todo.due_at is not None:
+            due_scheduler.cancel(todo.id)
+        todo_stats.replace(todo, None)
+    return todos
+memory_registry.register("todos_db", lambda: todos_db)
+memory_registry.register("search_index_terms", lambda: search_index._postings)
+memory_registry.register("tag_index_tags", lambda: tag_index._tags)
+
+_todo_list_adapter = TypeAdapter(List[Todo])
+# Serialização da lista em blocos, com verificação do prazo da requisição entre eles
+_ENCODE_CHUNK = 1000
+TITLE_MAX_LENGTH = 200
+TAG_MAX_LENGTH = 50
+TAGS_MAX_PER_TODO = 20
+# Importação: registros inseridos por lote e máximo de erros detalhados na resposta
+IMPORT_BATCH_SIZE = 5000
+IMPORT_MAX_REPORTED_ERRORS = 100
+# Todos concluídos há mais que isso vão para o arquivo (segmentos comprimidos em disco)
+ARCHIVE_AFTER_DAYS = int(os.getenv("ARCHIVE_AFTER_DAYS", "90"))
+ARCHIVE_SEGMENT_MAX_RECORDS = int(os.getenv("ARCHIVE_SEGMENT_MAX_RECORDS", "100000"))
+_TRUE_VALUES = {"true", "1", "yes", "sim"}
+_FALSE_VALUES = {"false", "0", "no", "nao", "não", ""}
+
+class TodoStats:
+    """Contadores mantidos a cada mutação, para que /todos/stats responda sem varrer a store"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # Muda a cada reinício, para que um ETag antigo não coincida com a versão recomeçada em 0
+        self._boot_id = secrets.token_hex(4)
+        self.clear()
+
+    def clear(self) -> None:
+        with self._lock:
+            self.total = 0
+            self.completed = 0
+            self.created_per_day: Dict[str, int] = {}
+            self.version = 0
+
+    def _apply(self, todo: Todo, delta: int) -> None:
+        self.total += delta
+        if todo.completed:
+            self.completed += delta
+        if todo.created_at is not None:
+            day = todo.created_at.date().isoformat()
+            count = self.created_per_day.get(day, 0) + delta
+            if count:
+                self.created_per_day[day] = count
+            else:
+                self.created_per_day.pop(day, None)
+
+    def replace(self, old: Optional[Todo], new: Optional[Todo]) -> None:
+        if old is not None and new is not None and (old.completed, old.created_at) == (new.completed, new.created_at):
+            return
+        with self._lock:
+            if old is not None:
+                self._apply(old, -1)
+            if new is not None:
+                self._apply(new, 1)
+            self.version += 1
+
+    def add_many(self, todos: List[Todo]) -> None:
+        with self._lock:
+            for todo in todos:
+                self._apply(todo, 1)
+            self.version += 1
+
+    def toggled(self, todo: Todo) -> None:
+        with self._lock:
+            self.completed += 1 if todo.completed else -1
+            self.version += 1
+
+    @property
+    def etag(self) -> str:
+        return f'W/"stats-{self._boot_id}-{self.version}"'
+
+    def response(self) -> TodoStatsResponse:
+        with self._lock:
+            return TodoStatsResponse(
+                total=self.total,
+                completed=self.completed,
+                pending=self.total - self.completed,
+                created_per_day=dict(sorted(self.created_per_day.items())),
+            )
+
+todo_stats = TodoStats()
+
+# Importações em andamento com o GC cíclico pausado; o GC é global ao processo, então só a
+# última a terminar o religa (e só se ele estava ligado quando a primeira começou)
+_gc_pause_lock = threading.Lock()
+_gc_pause_depth = 0
+_gc_was_enabled = False
+
+@contextmanager
+def _gc_paused():
+    """Pausa o GC cíclico durante uma importação: cada lote aloca milhares de objetos e
+    dispararia coletas da geração 2 percorrendo tudo o que já foi importado"""
+    global _gc_pause_depth, _gc_was_enabled
+    with _gc_pause_lock:
+        if _gc_pause_depth == 0:
+            _gc_was_enabled = gc.isenabled()
+            gc.disable()
+        _gc_pause_depth += 1
+    try:
+        yield
+    finally:
+        with _gc_pause_lock:
+            _gc_pause_depth -= 1
+            if _gc_pause_depth == 0 and _gc_was_enabled:
+                gc.enable()
+
+def _iter_ndjson(stream: TextIO) -> Iterator[Tuple[int, object]]:
+    for line_number, line in enumerate(stream, start=1):
+        if not line.strip():
+            continue
+        try:
+            yield line_number, json.loads(line)
+        except ValueError:
+            yield line_number, ValueError("JSON inválido")
+
+def _iter_csv(stream: TextIO) -> Iterator[Tuple[int, object]]:
+    reader = csv.DictReader(stream)
+    if reader.fieldnames is None or "title" not in reader.fieldnames:
+        yield 1, ValueError("Cabeçalho CSV deve conter a coluna 'title'")
+        return
+    for record in reader:
+        # line_num aponta para a última linha lida (campos entre aspas podem ocupar várias)
+        yield reader.line_num, record
+
+def _parse_import_record(record) -> Tuple[str, str, bool, List[str]]:
+    if isinstance(record, ValueError):
+        raise record
+    if not isinstance(record, dict):
+        raise ValueError("Registro deve ser um objeto")
+    title = record.get("title")
+    if title is not None and not isinstance(title, str):
+        raise ValueError("Título deve ser texto")
+    title = TodoService.clean_title(title)
+    description = record.get("description") or ""
+    if not isinstance(description, str):
+        raise ValueError("Descrição deve ser texto")
+    completed = record.get("completed", False)
+    if isinstance(completed, str):
+        value = completed.strip().lower()
+        if value in _TRUE_VALUES:
+            completed = True
+        elif value in _FALSE_VALUES:
+            completed = False
+    if not isinstance(completed, bool):
+        raise ValueError("Campo completed deve ser booleano")
+    tags = record.get("tags") or []
+    if isinstance(tags, str):
+        # CSV: tags separadas por vírgula dentro da coluna
+        tags = tags.split(",")
+    return title, description.strip(), completed, TodoService.clean_tags(tags)
 
 class TodoService:
     @staticmethod
-    def list_todos():
-        return todos_db
-    
+    def store_version() -> int:
+        return _store_version
+
+    @staticmethod
+    @traced("TodoService.list_todos")
+    def list_todos() -> List[Todo]:
+        return [todos_db[todo_id] for todo_id in position_index.ids() if todo_id in todos_db]
+
+    @staticmethod
+    @traced("TodoService.get_stats")
+    def get_stats() -> Tuple[str, TodoStatsResponse]:
+        """Estatísticas em O(1) com o ETag correspondente"""
+        response = todo_stats.response()
+        response.archived = len(archive_store)
+        return todo_stats.etag, response
+
+    @staticmethod
+    def stats_etag() -> str:
+        return todo_stats.etag
+
+    @staticmethod
+    def list_etag() -> str:
+        """Versão da store como ETag das listagens (a query faz parte da URL, não do ETag)"""
+        return f'W/"todos-{todo_stats._boot_id}-{_store_version}"'
+
+    # Leituras já serializadas: requisições concorrentes iguais compartilham uma única execução
+
+    @staticmethod
+    @traced("TodoService.list_todos_encoded")
+    def list_todos_encoded(
+        tags: Tuple[str, ...] = (),
+        any_tags: Tuple[str, ...] = (),
+        exclude_tags: Tuple[str, ...] = (),
+        completed: Optional[bool] = None,
+        offset: int = 0,
+        limit: Optional[int] = None,
+    ) -> Tuple[int, bytes]:
+        filtered = bool(tags or any_tags or exclude_tags) or completed is not None
+        stop = offset + limit if limit is not None else None
+
+        def compute():
+            if filtered:
+                with span("tag_filter"):
+                    ids = tag_index.filter(tags, any_tags, exclude_tags, completed)
+                todos = [todos_db[todo_id] for todo_id in ids if todo_id in todos_db]
+                # O bitmap sai em ordem de id; a ordem do usuário vem das posições
+                todos.sort(key=lambda todo: (todo.position or "", todo.id))
+                todos = todos[offset:stop]
+            else:
+                # Só o trecho pedido, sem percorrer a lista inteira
+                todos = [todos_db[todo_id] for todo_id in position_index.ids(offset, stop) if todo_id in todos_db]
+            parts = []
+            with span("encode", count=len(todos)):
+                for start in range(0, len(todos), _ENCODE_CHUNK):
+                    check_deadline()
+                    parts.append(_todo_list_adapter.dump_json(todos[start:start + _ENCODE_CHUNK])[1:-1])
+            return len(todos), b"[" + b",".join(parts) + b"]"
+        if filtered:
+            key = ("list", tags, any_tags, exclude_tags, completed, offset, limit, _store_version)
+        else:
+            key = ("list", offset, limit, _store_version)
+        return todo_reads.do(key, compute)
+
+    @staticmethod
+    @traced("TodoService.get_todo_encoded")
+    def get_todo_encoded(todo_id: int) -> Optional[bytes]:
+        def compute():
+            todo = todos_db.get(todo_id)
+            if todo is None:
+                return None
+            with span("encode", count=1):
+                return todo.model_dump_json().encode()
+        return todo_reads.do(("get", todo_id, _store_version), compute)
+
+    @staticmethod
+    @traced("TodoService.search_todos_encoded")
+    def search_todos_encoded(query: str, page: int, page_size: int) -> Tuple[int, bytes]:
+        def compute():
+            total, todos = TodoService.search_todos(query, offset=(page - 1) * page_size, limit=page_size)
+            with span("encode", count=len(todos)):
+                response = TodoSearchResponse(total=total, page=page, page_size=page_size, items=todos)
+                return total, response.model_dump_json().encode()
+        return todo_reads.do(("search", query, page, page_size, _store_version), compute)
+
     @staticmethod
+    def clean_title(title: Optional[str]) -> str:
+        """Regras do título na criação; ValueError com a mensagem para o usuário"""
+        if not title or len(title.strip()) == 0:
+            raise ValueError("Título do todo é obrigatório")
+        if len(title) > TITLE_MAX_LENGTH:
+            raise ValueError(f"Título muito longo (máximo {TITLE_MAX_LENGTH} caracteres)")
+        return title.strip()
+
+    @staticmethod
+    def clean_tags(tags: List[str]) -> List[str]:
+        """Normaliza as tags (minúsculas, sem espaços nas pontas nem repetição); ValueError se inválidas"""
+        if not isinstance(tags, list) or not all(isinstance(tag, str) for tag in tags):
+            raise ValueError("Tags devem ser uma lista de textos")
+        cleaned = list(dict.fromkeys(tag.strip().lower() for tag in tags if tag.strip()))
+        if len(cleaned) > TAGS_MAX_PER_TODO:
+            raise ValueError(f"Máximo de {TAGS_MAX_PER_TODO} tags por todo")
+        if any(len(tag) > TAG_MAX_LENGTH for tag in cleaned):
+            raise ValueError(f"Tag muito longa (máximo {TAG_MAX_LENGTH} caracteres)")
+        return cleaned
+
+    @staticmethod
+    def normalize_tag_filter(tags: List[str]) -> Tuple[str, ...]:
+        """Tags de um filtro na mesma forma em que são armazenadas"""
+        return tuple(dict.fromkeys(tag.strip().lower() for tag in tags if tag.strip()))
+
+    @staticmethod
+    @traced("TodoService.create_todo")
     def create_todo(todo: Todo) -> Todo:
-        new_id = len(todos_db) + 1
-        todo.id = new_id
-        todos_db.append(todo)
+        global _next_id
+        with _store_lock:
+            todo.id = _next_id
+            _next_id += 1
+            todo.created_at = datetime.now(timezone.utc)
+            todo.completed_at = todo.created_at if todo.completed else None
+            todos_db[todo.id] = todo
+            # Novos todos entram no fim da ordem; uma posição enviada pelo cliente é ignorada
+            position_index.append(todo)
+            search_index.add(todo)
+            tag_index.add(todo)
+            if todo.due_at is not None:
+                todo.due_at = as_utc(todo.due_at)
+                due_scheduler.update(todo)
+            todo_stats.replace(None, todo)
+            persistence.record("todos", "put", todo)
+            _bump_version(todo.id)
         return todo
 
     @staticmethod
+    @traced("TodoService.create_many")
+    def create_many(records: List[Tuple[str, str, bool, List[str]]]) -> List[Todo]:
+        """Insere um lote já validado (título, descrição, completed, tags) com uma única atualização de índice e versão"""
+        global _next_id
+        if not records:
+            return []
+        created_at = datetime.now(timezone.utc)
+        # Validação do lote inteiro numa chamada só (pydantic-core): mais barata que construir um a um
+        todos = _todo_list_adapter.validate_python([
+            {
+                "title": title, "description": description,
+                "completed": completed, "tags": tags, "created_at": created_at,
+                "completed_at": created_at if completed else None,
+            }
+            for title, description, completed, tags in records
+        ])
+        with _store_lock:
+            # Ids reservados em bloco sob o mesmo lock de create_todo: nenhum id é entregue duas vezes
+            for todo_id, todo in enumerate(todos, start=_next_id):
+                todo.id = todo_id
+                todos_db[todo_id] = todo
+            _next_id += len(todos)
+            position_index.append_many(todos)
+            search_index.add_many(todos)
+            tag_index.add_many(todos)
+            todo_stats.add_many(todos)
+            # Um registro de journal por lote, serializado de uma vez na thread de escrita
+            persistence.record("todos", "put_many", lambda: _todo_list_adapter.dump_json(todos))
+            _bump_version(todos[-1].id)
+        return todos
+
+    @staticmethod
+    @traced("TodoService.import_todos")
+    def import_todos(stream: TextIO, fmt: str = "ndjson") -> dict:
+        """Importa registros de um stream NDJSON ou CSV em lotes, com memória constante"""
+        imported = 0
+        failed = 0
+        errors = []
+        batch: List[Tuple[str, str, bool, List[str]]] = []
+        rows = _iter_csv(stream) if fmt == "csv" else _iter_ndjson(stream)
+        with _gc_paused():
+            for line_number, record in rows:
+                try:
+                    batch.append(_parse_import_record(record))
+                except ValueError as e:
+                    failed += 1
+                    if len(errors) < IMPORT_MAX_REPORTED_ERRORS:
+                        errors.append({"line": line_number, "error": str(e)})
+                    continue
+                if len(batch) >= IMPORT_BATCH_SIZE:
+                    check_deadline()
+                    imported += len(TodoService.create_many(batch))
+                    batch = []
+            imported += len(TodoService.create_many(batch))
+        return {"imported": imported, "failed": failed, "errors": errors}
+
+    @staticmethod
+    @traced("TodoService.get_todo")
     def get_todo(todo_id: int):
-        for todo in todos_db:
-            if todo.id == todo_id:
-                return todo
-        return None
+        return todos_db.get(todo_id)
 
     @staticmethod
+    @traced("TodoService.update_todo")
     def update_todo(todo_id: int, updated_todo: Todo):
-        for index, todo in enumerate(todos_db):
-            if todo.id == todo_id:
-                todos_db[index] = updated_todo
-                return updated_todo
-        return None
-    
+        with _store_lock:
+            existing = todos_db.get(todo_id)
+            if existing is None:
+                return None
+            updated_todo.id = todo_id
+            updated_todo.created_at = existing.created_at
+            # A posição só muda por move_todo
+            updated_todo.position = existing.position
+            if not updated_todo.completed:
+                updated_todo.completed_at = None
+            elif existing.completed:
+                updated_todo.completed_at = existing.completed_at
+            else:
+                updated_todo.completed_at = datetime.now(timezone.utc)
+            if updated_todo.due_at is not None:
+                updated_todo.due_at = as_utc(updated_todo.due_at)
+            todos_db[todo_id] = updated_todo
+            search_index.update(updated_todo)
+            tag_index.update(updated_todo)
+            if updated_todo.due_at is not None or existing.due_at is not None:
+                due_scheduler.update(updated_todo)
+            todo_stats.replace(existing, updated_todo)
+            persistence.record("todos", "put", updated_todo)
+            _bump_version(todo_id)
+        return updated_todo
+
     @staticmethod
+    @traced("TodoService.toggle_todo_status")
     def toggle_todo_status(todo_id: int) -> Optional[Todo]:
-        for index, todo in enumerate(todos_db):
-            if todo.id == todo_id:
-                # Inverte o status de completed
-                todos_db[index].completed = not todo.completed
-                return todos_db[index]
-        return None
+        with _store_lock:
+            todo = todos_db.get(todo_id)
+            if todo is None:
+                return None
+            # Inverte o status de completed
+            todo.completed = not todo.completed
+            todo.completed_at = datetime.now(timezone.utc) if todo.completed else None
+            tag_index.update(todo)
+            if todo.due_at is not None:
+                due_scheduler.update(todo)
+            todo_stats.toggled(todo)
+            persistence.record("todos", "put", todo)
+            _bump_version(todo_id)
+        return todo
 
     @staticmethod
+    @traced("TodoService.delete_todo")
     def delete_todo(todo_id: int):
-        for index, todo in enumerate(todos_db):
-            if todo.id == todo_id:
-                todos_db.pop(index)
-                return True
-        return False
\ No newline at end of file
+        with _store_lock:
+            if _evict(todo_id) is None:
+                return False
+            persistence.record("todos", "delete", todo_id)
+            _bump_version(todo_id)
+        return True
+
+    @staticmethod
+    @traced("TodoService.move_todo")
+    def move_todo(todo_id: int, after_id: Optional[int], before_id: Optional[int]) -> Optional[Todo]:
+        """Reordena um todo reescrevendo só a posição dele; ValueError se a referência for inválida"""
+        with _store_lock:
+            todo = todos_db.get(todo_id)
+            if todo is None:
+                return None
+            position_index.move(todo, after_id, before_id)
+            persistence.record("todos", "put", todo)
+            _bump_version(todo_id)
+        return todo
+
+    @staticmethod
+    def positions_need_rebalance() -> bool:
+        return position_index.needs_rebalance()
+
+    @staticmethod
+    @traced("TodoService.rebalance_positions")
+    def rebalance_positions() -> int:
+        """Encurta as chaves de posição que cresceram demais (em segundo plano, após um move)"""
+        with _store_lock:
+            todos = position_index.rebalance(todos_db.get)
+            if not todos:
+                return 0
+            persistence.record("todos", "put_many", lambda: _todo_list_adapter.dump_json(todos))
+            _bump_version(todos[-1].id)
+        metrics.inc("position_rebalances_total")
+        logger.info(f"Rebalanced {len(todos)} todo positions")
+        return len(todos)
+
+    @staticmethod
+    @traced("TodoService.list_due")
+    def list_due(before: datetime, limit: int) -> List[Todo]:
+        """Todos pendentes com vencimento anterior a before, do mais antigo para o mais recente"""
+        ids = due_scheduler.due_before(before, limit)
+        return [todos_db[todo_id] for todo_id in ids if todo_id in todos_db]
+
+    # --- arquivo (camada fria) ---
+
+    @staticmethod
+    @traced("TodoService.archive_completed")
+    def archive_completed(after_days: int = ARCHIVE_AFTER_DAYS) -> int:
+        """Move para segmentos comprimidos os todos concluídos há mais de after_days dias"""
+        if not (persistence.enabled and archive_store.enabled):
+            return 0
+        cutoff = datetime.now(timezone.utc) - timedelta(days=after_days)
+        candidates = []
+        # Só os concluídos, pelo bitmap do índice de tags, sem varrer a store inteira
+        for todo_id in tag_index.completed_ids():
+            todo = todos_db.get(todo_id)
+            if todo is None or not todo.completed:
+                continue
+            # Concluídos antes de completed_at existir: vale a data de criação
+            completed_at = todo.completed_at or todo.created_at
+            if completed_at is not None and as_utc(completed_at) <= cutoff:
+                candidates.append(todo)
+        archived = 0
+        for start in range(0, len(candidates), ARCHIVE_SEGMENT_MAX_RECORDS):
+            chunk = candidates[start:start + ARCHIVE_SEGMENT_MAX_RECORDS]
+            positions = [todo.position for todo in chunk]
+            number = archive_store.write_segment([(todo.id, todo.model_dump_json().encode()) for todo in chunk])
+            # A gravação do segmento fica fora do lock; a troca de camada acontece dentro dele
+            with _store_lock:
+                # Alterados enquanto o segmento era gravado (update troca o objeto; toggle e move o
+                # alteram no lugar): continuam quentes e saem do segmento
+                skipped = [
+                    todo.id for todo, position in zip(chunk, positions)
+                    if todos_db.get(todo.id) is not todo or not todo.completed or todo.position != position
+                ]
+                ids = archive_store.attach(number, skipped)
+                _evict_many(ids)
+                # Um registro de tamanho fixo por segmento: o conteúdo já está no arquivo
+                persistence.record("todos", "archive", {"segment": number, "skipped": skipped})
+                if ids:
+                    _bump_version(ids[-1])
+            archived += len(ids)
+        if archived:
+            metrics.inc("todos_archived_total", archived)
+            logger.info(f"Archived {archived} completed todos older than {after_days} days")
+        return archived
+
+    @staticmethod
+    @traced("TodoService.list_archived_encoded")
+    def list_archived_encoded(page: int, page_size: int) -> Tuple[int, bytes]:
+        def compute():
+            with span("archive_read"):
+                total, records = archive_store.page((page - 1) * page_size, page_size)
+            with span("encode", count=len(records)):
+                # Valida os registros (preenche campos adicionados depois do arquivamento) antes de responder
+                items = _todo_list_adapter.validate_json(b"[" + b",".join(records) + b"]")
+                response = TodoArchiveResponse(total=total, page=page, page_size=page_size, items=items)
+                return total, response.model_dump_json().encode()
+        return todo_reads.do(("archive", page, page_size, _store_version), compute)
+
+    @staticmethod
+    @traced("TodoService.restore_archived")
+    def restore_archived(todo_id: int) -> Optional[Todo]:
+        """Traz um todo arquivado de volta para a store quente, com o mesmo id e posição"""
+        raw = archive_store.get(todo_id)
+        if raw is None:
+            return None
+        todo = Todo.model_validate_json(raw)
+        if todo.completed:
+            # Restaurar conta como uso recente: sem isso a próxima varredura o arquivaria de novo
+            todo.completed_at = datetime.now(timezone.utc)
+        with _store_lock:
+            # Dois restores simultâneos do mesmo id: só o primeiro o traz de volta
+            if todo_id in todos_db:
+                return None
+            _index(todo)
+            archive_store.kill([todo_id])
+            persistence.record("todos", "unarchive", todo)
+            _bump_version(todo_id)
+        metrics.inc("todos_unarchived_total")
+        return todo
+
+    @staticmethod
+    @traced("TodoService.search_todos")
+    def search_todos(query: str, offset: int = 0, limit: int = 20) -> Tuple[int, List[Todo]]:
+        check_deadline()
+        total, hits = search_index.search(query, offset, limit)
+        check_deadline()
+        todos = [todos_db[todo_id] for todo_id, _ in hits if todo_id in todos_db]
+        return total, todos
+
+    # --- persistência (snapshot + journal) ---
+
+    @staticmethod
+    def snapshot_state():
+        with _store_lock:
+            todos = list(todos_db.values())
+            meta = {"next_id": _next_id, "archive": archive_store.state()}
+        return meta, (todo.model_dump_json().encode() for todo in todos)
+
+    @staticmethod
+    def restore_state(meta: dict, records) -> None:
+        global _next_id
+        todos_db.clear()
+        for raw in records:
+            todo = Todo.model_validate_json(raw)
+            todos_db[todo.id] = todo
+        _next_id = max(meta.get("next_id", 1), max(todos_db, default=0) + 1)
+        archive_store.load_state(meta.get("archive", {}))
+        # Todos gravados antes da ordenação manual recebem posições no fim, na ordem de inserção
+        backfilled = position_index.rebuild(todos_db.values())
+        if backfilled:
+            logger.info(f"Assigned positions to {backfilled} todos without one")
+        search_index.rebuild(todos_db.values())
+        tag_index.rebuild(todos_db.values())
+        due_scheduler.rebuild(todos_db.values())
+        todo_stats.clear()
+        for todo in todos_db.values():
+            todo_stats.replace(None, todo)
+
+    @staticmethod
+    def replay(op: str, data: bytes) -> None:
+        global _next_id
+        if op in ("put", "put_many", "unarchive"):
+            todos = _todo_list_adapter.validate_json(data) if op == "put_many" else [Todo.model_validate_json(data)]
+            for todo in todos:
+                previous = todos_db.get(todo.id)
+                if todo.position is None and previous is not None:
+                    # Registro anterior à ordenação manual: mantém a posição atual
+                    todo.position = previous.position
+                _index(todo)
+                _next_id = max(_next_id, todo.id + 1)
+            if op == "unarchive":
+                archive_store.kill(todo.id for todo in todos)
+        elif op == "delete":
+            _evict(int(data))
+        elif op == "archive":
+            record = json.loads(data)
+            _evict_many(archive_store.attach(record["segment"], record["skipped"]))
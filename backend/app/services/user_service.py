@@ -1,16 +1,19 @@
-from typing import Optional
+from typing import List, Optional
 from datetime import datetime
 from app.models.user import UserCreate, UserInDB, UserResponse
 from app.repositories.user_repository import user_repository
-from app.utils.security import get_password_hash, sanitize_username
+from app.repositories.async_repository import async_user_repository
+from app.utils.security import get_password_hash_async, sanitize_username
 from app.core.security import security_manager
+from app.core.invalidation_bus import invalidation_bus, USER_DEACTIVATED, USER_LOCKED
+from app.core.maintenance import maintenance
 import logging
 
 logger = logging.getLogger("user_service")
 
 class UserService:
     @staticmethod
-    def create_user(user_data: UserCreate) -> Optional[UserResponse]:
+    async def create_user(user_data: UserCreate) -> Optional[UserResponse]:
         try:
             username = sanitize_username(user_data.username)
         except ValueError:
@@ -18,13 +21,17 @@ class UserService:
                 raise ValueError("Username inválido")
             username = user_data.username.lower()
         
-        if user_repository.exists_username(username):
+        if await async_user_repository.exists_username(username):
             raise ValueError("Nome de usuário já existe")
         
         if len(user_data.password) < 4:
             raise ValueError("Senha deve ter pelo menos 4 caracteres")
         
-        hashed_password = get_password_hash(user_data.password)
+        hashed_password = await get_password_hash_async(user_data.password)
+        
+        # Outro cadastro com o mesmo nome pode ter terminado enquanto o hash era calculado
+        if await async_user_repository.exists_username(username):
+            raise ValueError("Nome de usuário já existe")
         
         new_user = UserInDB(
             username=username,
@@ -34,7 +41,7 @@ class UserService:
             failed_login_attempts=0
         )
         
-        created_user = user_repository.create(new_user)
+        created_user = await async_user_repository.create(new_user)
         logger.info(f"User created: {username}")
         
         return UserResponse(
@@ -48,11 +55,40 @@ class UserService:
     def get_user_by_username(username: str) -> Optional[UserInDB]:
         return user_repository.get_by_username(username)
     
+    @staticmethod
+    def update_user(user: UserInDB) -> UserInDB:
+        return user_repository.update(user)
+    
     @staticmethod
     def deactivate_user(username: str) -> bool:
         success = user_repository.deactivate(username)
         if success:
             logger.info(f"User deactivated: {username}")
+            invalidation_bus.publish(USER_DEACTIVATED, {"username": username})
         return success
 
+def _on_user_deactivated(data: dict) -> None:
+    user = user_repository.get_by_username(data.get("username", ""))
+    if user:
+        user.is_active = False
+
+def _on_user_locked(data: dict) -> None:
+    user = user_repository.get_by_username(data.get("username", ""))
+    if user and data.get("locked_until"):
+        user.locked_until = datetime.fromisoformat(data["locked_until"])
+
+def _clear_expired_locks(user_ids: List[int]) -> int:
+    cleared = 0
+    for user_id in user_ids:
+        user = user_repository.get_by_id(user_id)
+        if user is not None and security_manager.clear_expired_lock(user):
+            user_repository.update(user)
+            cleared += 1
+    return cleared
+
+invalidation_bus.subscribe(USER_DEACTIVATED, _on_user_deactivated)
+invalidation_bus.subscribe(USER_LOCKED, _on_user_locked)
+
+maintenance.register("user_locks", user_repository.ids, _clear_expired_locks)
+
 user_service = UserService() 
\ No newline at end of file
@@ -0,0 +1,73 @@
+"""Benchmark de cold start: tempo até a primeira requisição e até o readiness
+
+Uso: python -m app.tools.bench_cold_start [--runs 5] [--port 8765]
+"""
+import argparse
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _wait_for(url: str, deadline: float) -> float:
+    while time.perf_counter() < deadline:
+        try:
+            with urllib.request.urlopen(url, timeout=0.5) as response:
+                if response.status == 200:
+                    return time.perf_counter()
+        except (urllib.error.URLError, ConnectionError, OSError):
+            pass
+        time.sleep(0.005)
+    raise TimeoutError(f"Timed out waiting for {url}")
+
+
+def measure_once(port: int, timeout: float = 30.0) -> tuple:
+    env = dict(os.environ, PYTHONDONTWRITEBYTECODE="1")
+    started = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1", "--port", str(port)],
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    try:
+        first_request = _wait_for(f"http://127.0.0.1:{port}/", started + timeout)
+        ready = _wait_for(f"http://127.0.0.1:{port}/health/ready", started + timeout)
+        return first_request - started, ready - started
+    finally:
+        process.terminate()
+        process.wait()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--port", type=int, default=0)
+    args = parser.parse_args()
+
+    first, ready = [], []
+    for run in range(args.runs):
+        port = args.port or _free_port()
+        t_first, t_ready = measure_once(port)
+        first.append(t_first)
+        ready.append(t_ready)
+        print(f"run {run + 1}: first request {t_first * 1000:.0f}ms, ready {t_ready * 1000:.0f}ms")
+
+    print(
+        f"time-to-first-request: median {statistics.median(first) * 1000:.0f}ms, min {min(first) * 1000:.0f}ms | "
+        f"time-to-ready: median {statistics.median(ready) * 1000:.0f}ms, min {min(ready) * 1000:.0f}ms"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""Benchmark do codec JWT: vazão de encode/decode do HS256Codec contra o caminho antigo pelo python-jose
+
+A conformidade com o python-jose fica em tests/test_jwt_codec.py. Uso: python -m app.tools.bench_jwt [--seconds 1.0]
+"""
+import argparse
+import time
+from datetime import datetime, timedelta
+
+from app.utils.security import SECRET_KEY, HS256Codec, JWT_JSON, _jose
+
+
+def _legacy_encode(claims: dict) -> str:
+    now = datetime.utcnow()
+    claims = dict(claims, exp=now + timedelta(minutes=30), iat=now, type="access")
+    return _jose().jwt.encode(claims, SECRET_KEY, algorithm="HS256")
+
+
+def _legacy_decode(token: str):
+    try:
+        payload = _jose().jwt.decode(token, SECRET_KEY, algorithms=["HS256"])
+    except _jose().JWTError:
+        return None
+    exp = payload.get("exp")
+    if exp and datetime.fromtimestamp(exp) < datetime.utcnow():
+        return None
+    return payload
+
+
+def _fast_encoder(codec: HS256Codec):
+    def encode(claims: dict) -> str:
+        now = int(time.time())
+        return codec.encode(dict(claims, exp=now + 1800, iat=now, type="access"))
+    return encode
+
+
+def throughput(fn, arg, seconds: float) -> float:
+    calls = 0
+    started = time.perf_counter()
+    deadline = started + seconds
+    while time.perf_counter() < deadline:
+        for _ in range(200):
+            fn(arg)
+        calls += 200
+    return calls / (time.perf_counter() - started)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--seconds", type=float, default=1.0, help="Tempo de medição por operação")
+    args = parser.parse_args()
+
+    codec = HS256Codec(SECRET_KEY)
+    print(f"json={JWT_JSON}")
+
+    claims = {"sub": "alice", "fam": "Yx1c9tQz0dM3kR2p"}
+    legacy_token = _legacy_encode(claims)
+    fast_token = _fast_encoder(codec)(claims)
+    rows = [
+        ("encode", throughput(_legacy_encode, claims, args.seconds), throughput(_fast_encoder(codec), claims, args.seconds)),
+        ("decode", throughput(_legacy_decode, legacy_token, args.seconds), throughput(codec.decode, fast_token, args.seconds)),
+    ]
+    print(f"{'op':<8}{'python-jose':>14}{'HS256Codec':>14}{'speedup':>10}")
+    for op, legacy, fast in rows:
+        print(f"{op:<8}{legacy:>12,.0f}/s{fast:>12,.0f}/s{fast / legacy:>9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
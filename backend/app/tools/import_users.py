@@ -0,0 +1,152 @@
+"""Importação em massa de usuários a partir de CSV ou NDJSON
+
+Uso: python -m app.tools.import_users usuarios.csv [--format csv|ndjson] [--workers N] [--batch-size 1000]
+
+O CSV precisa das colunas "username" e "password"; no NDJSON, um objeto por linha com as mesmas chaves.
+Os hashes são calculados em um pool de processos (um por core) e os usuários são gravados em lotes
+no UserRepository, persistidos pelo journal em PERSISTENCE_DIR. Rode com a API parada: os dois
+processos não podem escrever no mesmo journal.
+"""
+import argparse
+import csv
+import json
+import logging
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from typing import Iterator, List, Tuple
+
+from app.core.logging_config import setup_logging
+from app.core.startup import init_persistence, shutdown_persistence
+from app.models.user import UserInDB
+from app.repositories.persistence import persistence
+from app.repositories.user_repository import user_repository
+from app.utils.security import configure_password_hashing, hash_password, password_hash_rounds, sanitize_username, validate_password_strength
+
+logger = logging.getLogger("import_users")
+
+
+def _read_rows(path: str, fmt: str) -> Iterator[Tuple[int, dict]]:
+    with open(path, newline="", encoding="utf-8") as f:
+        if fmt == "csv":
+            for line_number, row in enumerate(csv.DictReader(f), start=2):
+                yield line_number, row
+        else:
+            for line_number, line in enumerate(f, start=1):
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    yield line_number, json.loads(line)
+                except ValueError:
+                    yield line_number, {}
+
+
+def _hash_password(password: str) -> str:
+    return hash_password(password)
+
+
+class ImportStats:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.imported = 0
+        self.duplicates = 0
+        self.invalid = 0
+
+    @property
+    def rate(self) -> float:
+        elapsed = time.perf_counter() - self.started
+        return self.imported / elapsed if elapsed > 0 else 0.0
+
+    def report(self) -> str:
+        return (
+            f"imported={self.imported} duplicates={self.duplicates} invalid={self.invalid} "
+            f"rate={self.rate:.0f} users/s elapsed={time.perf_counter() - self.started:.1f}s"
+        )
+
+
+def _validated_batches(rows: Iterator[Tuple[int, dict]], batch_size: int, stats: ImportStats) -> Iterator[List[Tuple[str, str]]]:
+    """Valida cada linha e descarta duplicados (no arquivo e no repositório)"""
+    seen = set()
+    batch: List[Tuple[str, str]] = []
+    for line_number, row in rows:
+        password = row.get("password") or ""
+        try:
+            username = sanitize_username(row.get("username") or "")
+            is_valid, message = validate_password_strength(password)
+            if not is_valid:
+                raise ValueError(message)
+        except ValueError as e:
+            stats.invalid += 1
+            logger.warning(f"Line {line_number}: {e}")
+            continue
+
+        if username in seen or user_repository.exists_username(username):
+            stats.duplicates += 1
+            continue
+        seen.add(username)
+        batch.append((username, password))
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _insert_batch(batch: List[Tuple[str, str]], hashes: List[str]) -> int:
+    now = datetime.utcnow()
+    users = [
+        UserInDB(username=username, password=hashed, created_at=now, is_active=True, failed_login_attempts=0)
+        for (username, _), hashed in zip(batch, hashes)
+    ]
+    return len(user_repository.create_many(users))
+
+
+def import_users(path: str, fmt: str, workers: int, batch_size: int) -> ImportStats:
+    stats = ImportStats()
+    batches = _validated_batches(_read_rows(path, fmt), batch_size, stats)
+    chunksize = max(1, batch_size // (workers * 4))
+
+    # Calibrado uma vez aqui; os processos do pool herdam o custo em vez de calibrar cada um
+    rounds = password_hash_rounds()
+    with ProcessPoolExecutor(max_workers=workers, initializer=configure_password_hashing, initargs=(rounds,)) as pool:
+        # Pipeline: enquanto um lote é inserido, o próximo já está sendo hasheado
+        in_flight = None
+        for batch in batches:
+            hashing = pool.map(_hash_password, [password for _, password in batch], chunksize=chunksize)
+            if in_flight is not None:
+                stats.imported += _insert_batch(*in_flight)
+                logger.info(stats.report())
+            in_flight = (batch, list(hashing))
+        if in_flight is not None:
+            stats.imported += _insert_batch(*in_flight)
+    return stats
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("path")
+    parser.add_argument("--format", choices=["csv", "ndjson"])
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--batch-size", type=int, default=1000)
+    args = parser.parse_args()
+
+    fmt = args.format or ("csv" if args.path.lower().endswith(".csv") else "ndjson")
+    setup_logging()
+    init_persistence()
+    if not persistence.enabled:
+        logger.warning("PERSISTENCE_DIR is not set: imported users will not outlive this process")
+
+    try:
+        stats = import_users(args.path, fmt, args.workers, args.batch_size)
+    finally:
+        persistence.snapshot()
+        shutdown_persistence()
+    logger.info(f"Import finished: {stats.report()}")
+    sys.exit(0 if stats.invalid == 0 else 1)
+
+
+if __name__ == "__main__":
+    main()
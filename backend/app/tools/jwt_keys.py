@@ -0,0 +1,60 @@
+"""Gerenciamento das chaves de assinatura JWT em JWT_KEYS_DIR
+
+Uso:
+  python -m app.tools.jwt_keys rotate [--alg EdDSA|RS256]   gera uma nova chave ativa
+  python -m app.tools.jwt_keys retire <kid>                  mantém só a pública (para de assinar)
+  python -m app.tools.jwt_keys list
+
+Workers carregam as chaves no primeiro uso e releem o diretório ao receber um kid desconhecido,
+então verificam tokens da chave nova sem reiniciar; para passarem a assinar com ela, reinicie-os.
+Chaves antigas continuam verificando os tokens emitidos com elas até serem removidas do diretório.
+"""
+import argparse
+import os
+import sys
+
+from app.utils.keyring import KeyRing, JWT_ALGORITHM, JWT_KEYS_DIR
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("command", choices=["rotate", "retire", "list"])
+    parser.add_argument("kid", nargs="?")
+    parser.add_argument("--alg", default=JWT_ALGORITHM if JWT_ALGORITHM != "HS256" else "EdDSA")
+    parser.add_argument("--dir", default=JWT_KEYS_DIR)
+    args = parser.parse_args()
+
+    if not args.dir:
+        sys.exit("JWT_KEYS_DIR (ou --dir) é obrigatório")
+
+    if args.command == "rotate":
+        # active_kid vazio: a chave recém-gerada é a mais nova do diretório e vira a ativa no próximo boot
+        key = KeyRing(algorithm=args.alg, directory=args.dir, active_kid="").rotate()
+        print(f"new active key: {key.kid} ({key.alg})")
+    elif args.command == "retire":
+        if not args.kid:
+            sys.exit("informe o kid")
+        from cryptography.hazmat.primitives import serialization
+        ring = KeyRing(algorithm="HS256", directory=args.dir)
+        key = ring.get(args.kid)
+        if key is None or key.private_key is None:
+            sys.exit(f"chave privada {args.kid} não encontrada")
+        public_pem = key.public_key.public_bytes(
+            serialization.Encoding.PEM, serialization.PublicFormat.SubjectPublicKeyInfo
+        )
+        # Grava ao lado e renomeia: workers relendo o diretório não veem a pública pela metade
+        tmp_path = os.path.join(args.dir, f".{args.kid}.pub.tmp")
+        with open(tmp_path, "wb") as f:
+            f.write(public_pem)
+        os.replace(tmp_path, os.path.join(args.dir, f"{args.kid}.pub.pem"))
+        os.remove(os.path.join(args.dir, f"{args.kid}.pem"))
+        print(f"retired key: {args.kid}")
+    else:
+        ring = KeyRing(algorithm="HS256", directory=args.dir)
+        for jwk in ring.jwks()["keys"]:
+            key = ring.get(jwk["kid"])
+            print(f"{jwk['kid']}  {jwk['alg']}  {'signing' if key.private_key else 'verify-only'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,281 @@
+"""Replay do tráfego capturado (TRAFFIC_CAPTURE_FILE) contra o app, em processo
+
+Uso: python -m app.tools.replay trafego.ndjson [--speed 1] [--concurrency 64] [--seed-todos 0]
+
+--speed 1 reproduz no ritmo original, N acelera N vezes, 0 dispara o mais rápido possível
+(limitado por --concurrency). O app roda no mesmo processo, sem rede, com a persistência num
+diretório temporário; os usuários sintéticos da captura ("u1", "u2", ...) são criados antes do
+replay com uma senha conhecida. Ao final mostra percentis de latência por rota e quantas
+respostas tiveram status diferente do capturado.
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlencode
+
+REPLAY_PASSWORD = "Replay-Passw0rd!"
+WRONG_PASSWORD = "Wrong-Passw0rd!"
+# Rotas que recebem credenciais no corpo, não no header Authorization
+_CREDENTIAL_ROUTES = {"/login", "/register", "/refresh", "/logout"}
+
+
+def _load(path: str) -> List[dict]:
+    records = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            record = json.loads(line)
+            if "m" in record:
+                records.append(record)
+    records.sort(key=lambda r: r["t"])
+    return records
+
+
+def _percentile(sorted_values: List[float], pct: float) -> float:
+    """Percentil pelo método nearest-rank"""
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, math.ceil(pct / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+class AsgiDriver:
+    """Executa requisições direto no app ASGI, sem servidor nem sockets"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def request(self, method: str, path: str, query: str = "", headers: Optional[Dict[str, str]] = None,
+                      body: bytes = b"", client: str = "127.0.0.1") -> Tuple[int, bytes]:
+        raw_headers = [(k.lower().encode("latin-1"), v.encode("latin-1")) for k, v in (headers or {}).items()]
+        raw_headers.append((b"content-length", str(len(body)).encode()))
+        scope = {
+            "type": "http",
+            "asgi": {"version": "3.0"},
+            "http_version": "1.1",
+            "method": method,
+            "scheme": "http",
+            "path": path,
+            "raw_path": path.encode(),
+            "root_path": "",
+            "query_string": query.encode("latin-1"),
+            "headers": raw_headers,
+            "client": (client, 0),
+            "server": ("replay", 80),
+        }
+        status = 500
+        chunks: List[bytes] = []
+        complete = asyncio.Event()
+        body_sent = False
+
+        async def receive():
+            nonlocal body_sent
+            if not body_sent:
+                body_sent = True
+                return {"type": "http.request", "body": body, "more_body": False}
+            # Como um servidor real: disconnect só depois que a resposta terminou
+            await complete.wait()
+            return {"type": "http.disconnect"}
+
+        async def send(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            elif message["type"] == "http.response.body":
+                chunks.append(message.get("body", b""))
+                if not message.get("more_body"):
+                    complete.set()
+
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            complete.set()
+        return status, b"".join(chunks)
+
+
+class Replayer:
+    def __init__(self, app, records: List[dict], speed: float, concurrency: int):
+        self.driver = AsgiDriver(app)
+        self.records = records
+        self.speed = speed
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.tokens: Dict[str, Dict[str, str]] = {}
+        self.clients: Dict[str, str] = {}
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.captured: Dict[str, List[float]] = defaultdict(list)
+        self.mismatches: Dict[str, int] = defaultdict(int)
+        self.errors: Dict[str, int] = defaultdict(int)
+        self.late = 0
+        self._registrations = 0
+
+    @staticmethod
+    def username(synthetic: str) -> str:
+        return f"replay_{synthetic}"
+
+    def setup_users(self) -> None:
+        from datetime import datetime
+        from app.models.user import UserInDB
+        from app.repositories.user_repository import user_repository
+        from app.services.auth_service import auth_service
+        from app.utils.security import get_pwd_context
+
+        password_hash = get_pwd_context().hash(REPLAY_PASSWORD)
+        for synthetic in sorted({r["u"] for r in self.records if r.get("u")}):
+            username = self.username(synthetic)
+            user = user_repository.get_by_username(username)
+            if user is None:
+                user = user_repository.create(UserInDB(
+                    username=username, password=password_hash, created_at=datetime.now(), is_active=True
+                ))
+            tokens = auth_service.create_tokens_for_user(user)
+            # Um endereço por usuário sintético: o rate limit por IP se comporta como na produção
+            n = len(self.clients) + 1
+            self.clients[synthetic] = f"10.{n >> 16 & 255}.{n >> 8 & 255}.{n & 255}"
+            self.tokens[synthetic] = {"access_token": tokens.access_token, "refresh_token": tokens.refresh_token}
+
+    def _fill(self, record: dict, fields: dict) -> dict:
+        synthetic = record.get("u")
+        tokens = self.tokens.get(synthetic, {})
+        filled = dict(fields)
+        for key, value in fields.items():
+            if value is not None:
+                continue
+            if key == "username":
+                if record["r"] == "/register":
+                    self._registrations += 1
+                    filled[key] = f"replay_reg{self._registrations}"
+                else:
+                    filled[key] = self.username(synthetic) if synthetic else "replay_unknown"
+            elif key == "password":
+                filled[key] = WRONG_PASSWORD if record["s"] == 401 else REPLAY_PASSWORD
+            elif key in tokens:
+                filled[key] = tokens[key]
+        return filled
+
+    def _build(self, record: dict) -> Tuple[Dict[str, str], bytes]:
+        headers: Dict[str, str] = {}
+        body = b""
+        synthetic = record.get("u")
+        if record.get("a") and synthetic in self.tokens and record["r"] not in _CREDENTIAL_ROUTES:
+            headers["authorization"] = f"Bearer {self.tokens[synthetic]['access_token']}"
+        if "f" in record:
+            headers["content-type"] = "application/x-www-form-urlencoded"
+            body = urlencode(self._fill(record, record["f"])).encode()
+        elif "j" in record:
+            data = record["j"]
+            if isinstance(data, dict):
+                data = self._fill(record, data)
+            headers["content-type"] = "application/json"
+            body = json.dumps(data).encode()
+        elif "b" in record:
+            headers["content-type"] = "application/octet-stream"
+            body = b"x" * record["b"]
+        return headers, body
+
+    async def _one(self, record: dict) -> None:
+        async with self.semaphore:
+            headers, body = self._build(record)
+            query = urlencode(record.get("q", {}))
+            started = time.perf_counter()
+            client = self.clients.get(record.get("u"), "127.0.0.1")
+            status, response = await self.driver.request(record["m"], record["p"], query, headers, body, client)
+            elapsed_ms = (time.perf_counter() - started) * 1000
+
+        key = f"{record['m']} {record['r']}"
+        self.latencies[key].append(elapsed_ms)
+        self.captured[key].append(record.get("d", 0.0))
+        if status != record["s"]:
+            self.mismatches[key] += 1
+        if status >= 500:
+            self.errors[key] += 1
+        # Sessões novas (login/refresh) passam a valer para as próximas requisições do usuário
+        if status == 200 and record["r"] in ("/login", "/refresh") and record.get("u") in self.tokens:
+            try:
+                data = json.loads(response)
+                self.tokens[record["u"]] = {
+                    "access_token": data["access_token"], "refresh_token": data["refresh_token"]
+                }
+            except (ValueError, KeyError):
+                pass
+
+    async def run(self) -> float:
+        tasks = []
+        started = time.monotonic()
+        for record in self.records:
+            if self.speed > 0:
+                delay = started + record["t"] / 1000 / self.speed - time.monotonic()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                elif delay < -0.05:
+                    self.late += 1
+            tasks.append(asyncio.ensure_future(self._one(record)))
+            if self.speed == 0:
+                # Cede o loop para as requisições já disparadas avançarem
+                await asyncio.sleep(0)
+        await asyncio.gather(*tasks)
+        return time.monotonic() - started
+
+    def report(self, elapsed: float) -> None:
+        total = sum(len(v) for v in self.latencies.values())
+        print(f"{total} requests in {elapsed:.2f}s ({total / elapsed if elapsed else 0:.1f} req/s), late starts: {self.late}")
+        header = f"{'route':<40} {'count':>6} {'p50':>8} {'p90':>8} {'p99':>8} {'max':>8} {'cap p50':>8} {'5xx':>5} {'status!=':>8}"
+        print(header)
+        print("-" * len(header))
+        for key in sorted(self.latencies, key=lambda k: -len(self.latencies[k])):
+            values = sorted(self.latencies[key])
+            captured = sorted(self.captured[key])
+            print(
+                f"{key:<40} {len(values):>6} {_percentile(values, 50):>8.2f} {_percentile(values, 90):>8.2f} "
+                f"{_percentile(values, 99):>8.2f} {values[-1]:>8.2f} {_percentile(captured, 50):>8.2f} "
+                f"{self.errors[key]:>5} {self.mismatches[key]:>8}"
+            )
+        print("latências em ms; 'cap p50' é a mediana registrada na captura")
+
+
+async def _replay(args) -> None:
+    from app.main import app
+    from app.models.todo import Todo
+    from app.services.todo_service import TodoService
+
+    records = _load(args.trace)
+    if not records:
+        sys.exit("nenhuma requisição na captura")
+
+    await app.router.startup()
+    try:
+        for i in range(args.seed_todos):
+            TodoService.create_todo(Todo(title=f"seed {i}", description="replay"))
+        replayer = Replayer(app, records, args.speed, args.concurrency)
+        replayer.setup_users()
+        elapsed = await replayer.run()
+        replayer.report(elapsed)
+    finally:
+        await app.router.shutdown()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("trace")
+    parser.add_argument("--speed", type=float, default=1.0)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--seed-todos", type=int, default=0)
+    parser.add_argument("--persistence-dir", default="")
+    args = parser.parse_args()
+
+    # Configuração lida no import dos módulos do app: precisa vir antes de importá-lo
+    os.environ["PERSISTENCE_DIR"] = args.persistence_dir or tempfile.mkdtemp(prefix="replay-")
+    os.environ["TRAFFIC_CAPTURE_FILE"] = ""
+    asyncio.run(_replay(args))
+
+
+if __name__ == "__main__":
+    main()
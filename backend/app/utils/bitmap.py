@@ -0,0 +1,290 @@
+import sys
+from array import array
+from bisect import bisect_left
+from itertools import groupby
+from typing import Dict, Iterable, Iterator, List, Optional, Union
+
+# Como no roaring: os 16 bits baixos de cada valor são a posição dentro do container e os altos
+# escolhem o container. Um bitset completo ocupa 8 KiB (um int do Python).
+CHUNK_BITS = 16
+CHUNK_SIZE = 1 << CHUNK_BITS
+CHUNK_BYTES = CHUNK_SIZE // 8
+_LOW_MASK = CHUNK_SIZE - 1
+# Acima disso o container vira bitset. O roaring troca em 4096 (empate de memória), mas em Python
+# operar um array contra um bitset custa um teste por item, enquanto AND/OR entre dois bitsets
+# roda inteiro em C; com limite baixo quase todo container que aparece em consultas é bitset.
+ARRAY_MAX = 32
+# Bitset só volta a ser array bem abaixo do limite, para não alternar a cada add/discard na fronteira
+ARRAY_SHRINK = ARRAY_MAX // 2
+
+Container = Union[array, int]
+
+
+def _to_bits(values: Iterable[int]) -> int:
+    data = bytearray(CHUNK_BYTES)
+    for low in values:
+        data[low >> 3] |= 1 << (low & 7)
+    return int.from_bytes(data, "little")
+
+
+def _bit_positions(bits: int) -> List[int]:
+    """Posições dos bits ligados em ordem crescente, varrendo palavras de 64 bits"""
+    positions: List[int] = []
+    words = array("Q", bits.to_bytes(CHUNK_BYTES, "little"))
+    if sys.byteorder == "big":
+        words.byteswap()
+    for index, word in enumerate(words):
+        if word:
+            base = index << 6
+            while word:
+                low = word & -word
+                positions.append(base + low.bit_length() - 1)
+                word ^= low
+    return positions
+
+
+def _to_array(bits: int) -> array:
+    return array("H", _bit_positions(bits))
+
+
+def _count(container: Container) -> int:
+    return container.bit_count() if type(container) is int else len(container)
+
+
+def _array_and_bits(values: array, bits: int, keep: bool) -> array:
+    """Itens do array presentes (keep=True) ou ausentes (keep=False) no bitset"""
+    data = bits.to_bytes(CHUNK_BYTES, "little")
+    return array("H", [low for low in values if bool(data[low >> 3] >> (low & 7) & 1) is keep])
+
+
+class RoaringBitmap:
+    """Conjunto de inteiros não negativos comprimido em containers (array ordenado ou bitset)
+
+    Inspirado no roaring bitmap: valores esparsos ficam em arrays de uint16 e trechos densos em
+    bitsets, de modo que AND/OR/ANDNOT trabalham container a container e pulam trechos ausentes.
+    Bitmaps mantidos por add/discard sabem sua cardinalidade; resultados de operações são
+    transitórios, mantêm os bitsets como saem e só contam os elementos quando len() é pedido.
+    Não é thread-safe: quem compartilha a instância sincroniza o acesso.
+    """
+
+    __slots__ = ("_containers", "_counts", "_size")
+
+    def __init__(self, values: Iterable[int] = ()):
+        # chave (bits altos) -> container; containers vazios nunca ficam no dict
+        self._containers: Dict[int, Container] = {}
+        # chave -> cardinalidade do container (None nos resultados de operações)
+        self._counts: Optional[Dict[int, int]] = {}
+        self._size: Optional[int] = 0
+        self.update(values)
+
+    @classmethod
+    def _result(cls, containers: Dict[int, Container]) -> "RoaringBitmap":
+        bitmap = cls.__new__(cls)
+        bitmap._containers = containers
+        bitmap._counts = None
+        bitmap._size = None
+        return bitmap
+
+    def _ensure_counts(self) -> Dict[int, int]:
+        if self._counts is None:
+            self._counts = {key: _count(container) for key, container in self._containers.items()}
+            self._size = sum(self._counts.values())
+        return self._counts
+
+    def __len__(self) -> int:
+        if self._size is None:
+            self._size = sum(map(_count, self._containers.values()))
+        return self._size
+
+    def __bool__(self) -> bool:
+        return bool(self._containers)
+
+    def __contains__(self, value: int) -> bool:
+        container = self._containers.get(value >> CHUNK_BITS)
+        if container is None:
+            return False
+        low = value & _LOW_MASK
+        if type(container) is int:
+            return bool(container >> low & 1)
+        index = bisect_left(container, low)
+        return index < len(container) and container[index] == low
+
+    def __iter__(self) -> Iterator[int]:
+        """Valores em ordem crescente"""
+        containers = self._containers
+        for key in sorted(containers):
+            base = key << CHUNK_BITS
+            container = containers[key]
+            lows = _bit_positions(container) if type(container) is int else container
+            for low in lows:
+                yield base + low
+
+    def __repr__(self) -> str:
+        return f"RoaringBitmap(size={len(self)}, containers={len(self._containers)})"
+
+    def add(self, value: int) -> bool:
+        """Inclui o valor; devolve False se ele já estava presente"""
+        counts = self._ensure_counts()
+        key = value >> CHUNK_BITS
+        low = value & _LOW_MASK
+        containers = self._containers
+        container = containers.get(key)
+        if container is None:
+            containers[key] = array("H", (low,))
+        elif type(container) is int:
+            if container >> low & 1:
+                return False
+            containers[key] = container | (1 << low)
+        else:
+            index = bisect_left(container, low)
+            if index < len(container) and container[index] == low:
+                return False
+            container.insert(index, low)
+            if len(container) > ARRAY_MAX:
+                containers[key] = _to_bits(container)
+        counts[key] = counts.get(key, 0) + 1
+        self._size += 1
+        return True
+
+    def discard(self, value: int) -> bool:
+        """Remove o valor; devolve False se ele não estava presente"""
+        counts = self._ensure_counts()
+        key = value >> CHUNK_BITS
+        containers = self._containers
+        container = containers.get(key)
+        if container is None:
+            return False
+        low = value & _LOW_MASK
+        if type(container) is int:
+            if not container >> low & 1:
+                return False
+            container ^= 1 << low
+        else:
+            index = bisect_left(container, low)
+            if index >= len(container) or container[index] != low:
+                return False
+            del container[index]
+        self._size -= 1
+        count = counts[key] - 1
+        if count == 0:
+            del containers[key]
+            del counts[key]
+            return True
+        counts[key] = count
+        if type(container) is int:
+            containers[key] = _to_array(container) if count <= ARRAY_SHRINK else container
+        return True
+
+    def update(self, values: Iterable[int]) -> None:
+        """Inclui vários valores de uma vez, montando cada container uma única vez"""
+        counts = self._ensure_counts()
+        containers = self._containers
+        for key, group in groupby(sorted(values), key=lambda value: value >> CHUNK_BITS):
+            lows = [value & _LOW_MASK for value in group]
+            container = containers.get(key)
+            if type(container) is int:
+                container |= _to_bits(lows)
+                count = container.bit_count()
+            else:
+                merged = sorted(set(lows).union(container or ()))
+                count = len(merged)
+                container = _to_bits(merged) if count > ARRAY_MAX else array("H", merged)
+            containers[key] = container
+            counts[key] = count
+        self._size = sum(counts.values())
+
+    def copy(self) -> "RoaringBitmap":
+        bitmap = RoaringBitmap._result({
+            key: container if type(container) is int else array("H", container)
+            for key, container in self._containers.items()
+        })
+        if self._counts is not None:
+            bitmap._counts = dict(self._counts)
+            bitmap._size = self._size
+        return bitmap
+
+    def __and__(self, other: "RoaringBitmap") -> "RoaringBitmap":
+        mine, theirs = self._containers, other._containers
+        if len(theirs) < len(mine):
+            mine, theirs = theirs, mine
+        result: Dict[int, Container] = {}
+        for key, left in mine.items():
+            right = theirs.get(key)
+            if right is None:
+                continue
+            if type(left) is int:
+                if type(right) is int:
+                    bits = left & right
+                    if bits:
+                        result[key] = bits
+                    continue
+                left, right = right, left
+            # Um lado é array (no máximo ARRAY_MAX itens): o resultado também é
+            if type(right) is int:
+                values = _array_and_bits(left, right, True)
+            else:
+                values = array("H", sorted(set(left).intersection(right)))
+            if values:
+                result[key] = values
+        return RoaringBitmap._result(result)
+
+    def __or__(self, other: "RoaringBitmap") -> "RoaringBitmap":
+        mine, theirs = self._containers, other._containers
+        result: Dict[int, Container] = {}
+        for key, left in mine.items():
+            right = theirs.get(key)
+            if right is None:
+                result[key] = left if type(left) is int else array("H", left)
+            elif type(left) is int and type(right) is int:
+                result[key] = left | right
+            else:
+                merged = sorted(set(_bit_positions(left) if type(left) is int else left).union(
+                    _bit_positions(right) if type(right) is int else right
+                ))
+                result[key] = _to_bits(merged) if len(merged) > ARRAY_MAX else array("H", merged)
+        for key, right in theirs.items():
+            if key not in mine:
+                result[key] = right if type(right) is int else array("H", right)
+        return RoaringBitmap._result(result)
+
+    def __sub__(self, other: "RoaringBitmap") -> "RoaringBitmap":
+        """ANDNOT: valores deste bitmap ausentes no outro"""
+        theirs = other._containers
+        result: Dict[int, Container] = {}
+        for key, left in self._containers.items():
+            right = theirs.get(key)
+            if right is None:
+                result[key] = left if type(left) is int else array("H", left)
+            elif type(left) is int:
+                # left & ~right sem criar o complemento negativo (bem mais caro em ints grandes)
+                bits = left ^ (left & (right if type(right) is int else _to_bits(right)))
+                if bits:
+                    result[key] = bits
+            else:
+                if type(right) is int:
+                    values = _array_and_bits(left, right, False)
+                else:
+                    values = array("H", sorted(set(left).difference(right)))
+                if values:
+                    result[key] = values
+        return RoaringBitmap._result(result)
+
+    @staticmethod
+    def intersection(*bitmaps: "RoaringBitmap") -> "RoaringBitmap":
+        """AND de vários bitmaps, começando pelos menores para encolher o resultado cedo"""
+        if not bitmaps:
+            return RoaringBitmap()
+        ordered = sorted(bitmaps, key=len)
+        result = ordered[0].copy()
+        for bitmap in ordered[1:]:
+            if not result:
+                break
+            result = result & bitmap
+        return result
+
+    @staticmethod
+    def union(*bitmaps: "RoaringBitmap") -> "RoaringBitmap":
+        result = RoaringBitmap._result({})
+        for bitmap in bitmaps:
+            result = result | bitmap
+        return result
@@ -0,0 +1,161 @@
+"""Chaves de ordenação fracionárias: strings comparadas lexicograficamente, sempre com espaço entre duas
+
+Formato: parte inteira + parte fracionária, em base 62 (0-9A-Za-z, em ordem ASCII). O primeiro
+caractere da parte inteira indica o tamanho dela ("a" = 1 dígito, "b" = 2, ...; maiúsculas são
+as negativas), então acrescentar no fim só incrementa a parte inteira e a chave cresce devagar.
+A parte fracionária só aparece ao inserir entre duas chaves vizinhas, e nunca termina em "0".
+"""
+from typing import List, Optional
+
+DIGITS = "0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz"
+_BASE = len(DIGITS)
+_ZERO = DIGITS[0]
+_VALUES = {digit: value for value, digit in enumerate(DIGITS)}
+_SMALLEST_INTEGER = "A" + _ZERO * 26
+FIRST_KEY = "a" + _ZERO
+
+
+def _integer_length(head: str) -> int:
+    if "a" <= head <= "z":
+        return ord(head) - ord("a") + 2
+    if "A" <= head <= "Z":
+        return ord("Z") - ord(head) + 2
+    raise ValueError(f"Chave de ordenação inválida: {head!r}")
+
+
+def _integer_part(key: str) -> str:
+    length = _integer_length(key[0])
+    if length > len(key):
+        raise ValueError(f"Chave de ordenação inválida: {key!r}")
+    return key[:length]
+
+
+def validate_key(key: str) -> None:
+    if not key or key == _SMALLEST_INTEGER:
+        raise ValueError(f"Chave de ordenação inválida: {key!r}")
+    integer = _integer_part(key)
+    if key[len(integer):].endswith(_ZERO) or any(char not in _VALUES for char in key[1:]):
+        raise ValueError(f"Chave de ordenação inválida: {key!r}")
+
+
+def _midpoint(a: str, b: Optional[str]) -> str:
+    """Fração estritamente entre a e b (b None = 1); nenhuma das duas termina em zero"""
+    if b is not None:
+        # Prefixo comum vai direto para o resultado
+        n = 0
+        while (a[n] if n < len(a) else _ZERO) == b[n]:
+            n += 1
+        if n > 0:
+            return b[:n] + _midpoint(a[n:], b[n:])
+    digit_a = _VALUES[a[0]] if a else 0
+    digit_b = _VALUES[b[0]] if b is not None else _BASE
+    if digit_b - digit_a > 1:
+        return DIGITS[(digit_a + digit_b + 1) // 2]
+    # Dígitos consecutivos: desce uma casa
+    if b is not None and len(b) > 1:
+        return b[:1]
+    return DIGITS[digit_a] + _midpoint(a[1:], None)
+
+
+def _increment_integer(integer: str) -> Optional[str]:
+    head, digits = integer[0], list(integer[1:])
+    for index in range(len(digits) - 1, -1, -1):
+        value = _VALUES[digits[index]] + 1
+        if value < _BASE:
+            digits[index] = DIGITS[value]
+            return head + "".join(digits)
+        digits[index] = _ZERO
+    # Estourou o tamanho atual: passa para o próximo cabeçalho
+    if head == "Z":
+        return "a" + _ZERO
+    if head == "z":
+        return None
+    head = chr(ord(head) + 1)
+    if head > "a":
+        digits.append(_ZERO)
+    else:
+        digits.pop()
+    return head + "".join(digits)
+
+
+def _decrement_integer(integer: str) -> Optional[str]:
+    head, digits = integer[0], list(integer[1:])
+    for index in range(len(digits) - 1, -1, -1):
+        value = _VALUES[digits[index]] - 1
+        if value >= 0:
+            digits[index] = DIGITS[value]
+            return head + "".join(digits)
+        digits[index] = DIGITS[-1]
+    if head == "a":
+        return "Z" + DIGITS[-1]
+    if head == "A":
+        return None
+    head = chr(ord(head) - 1)
+    if head < "Z":
+        digits.append(DIGITS[-1])
+    else:
+        digits.pop()
+    return head + "".join(digits)
+
+
+def key_between(a: Optional[str], b: Optional[str]) -> str:
+    """Chave estritamente entre a e b; None em a/b significa o início/fim da lista"""
+    if a is not None:
+        validate_key(a)
+    if b is not None:
+        validate_key(b)
+    if a is not None and b is not None and a >= b:
+        raise ValueError(f"Chaves fora de ordem: {a!r} >= {b!r}")
+    if a is None:
+        if b is None:
+            return FIRST_KEY
+        integer_b = _integer_part(b)
+        fraction_b = b[len(integer_b):]
+        if integer_b == _SMALLEST_INTEGER:
+            return integer_b + _midpoint("", fraction_b)
+        if integer_b < b:
+            return integer_b
+        decremented = _decrement_integer(integer_b)
+        if decremented is None:
+            raise ValueError("Sem espaço antes da primeira chave")
+        return decremented
+    integer_a = _integer_part(a)
+    fraction_a = a[len(integer_a):]
+    if b is None:
+        incremented = _increment_integer(integer_a)
+        return incremented if incremented is not None else integer_a + _midpoint(fraction_a, None)
+    integer_b = _integer_part(b)
+    if integer_a == integer_b:
+        return integer_a + _midpoint(fraction_a, b[len(integer_b):])
+    incremented = _increment_integer(integer_a)
+    if incremented is None:
+        raise ValueError("Sem espaço depois da última chave")
+    if incremented < b:
+        return incremented
+    return integer_a + _midpoint(fraction_a, None)
+
+
+def keys_between(a: Optional[str], b: Optional[str], count: int) -> List[str]:
+    """count chaves crescentes entre a e b, distribuídas para manter todas curtas"""
+    if count <= 0:
+        return []
+    if count == 1:
+        return [key_between(a, b)]
+    if b is None:
+        # Depois da primeira, todas são inteiras: basta incrementar, sem revalidar cada uma
+        keys = [key_between(a, None)]
+        for _ in range(count - 1):
+            last = keys[-1]
+            following = _increment_integer(last) if len(last) == _integer_length(last[0]) else None
+            keys.append(following if following is not None else key_between(last, None))
+        return keys
+    if a is None:
+        keys = [key_between(None, b)]
+        for _ in range(count - 1):
+            keys.append(key_between(None, keys[-1]))
+        keys.reverse()
+        return keys
+    middle = count // 2
+    pivot = key_between(a, b)
+    return keys_between(a, pivot, middle) + [pivot] + keys_between(pivot, b, count - middle - 1)
+
@@ -0,0 +1,278 @@
+import base64
+import logging
+import os
+import secrets
+import threading
+import time
+from typing import Dict, List, Optional
+
+logger = logging.getLogger("security")
+
+# Algoritmo de assinatura dos tokens emitidos: HS256 (segredo compartilhado), RS256 ou EdDSA
+JWT_ALGORITHM = os.getenv("JWT_ALGORITHM", "HS256")
+# Diretório com as chaves: "<kid>.pem" (privadas, podem assinar) e "<kid>.pub.pem" (aposentadas, só verificam)
+JWT_KEYS_DIR = os.getenv("JWT_KEYS_DIR", "")
+JWT_ACTIVE_KID = os.getenv("JWT_ACTIVE_KID", "")
+# Intervalo mínimo entre releituras do diretório quando chega um kid desconhecido (rotação em outro processo)
+JWT_KEYS_RELOAD_SECONDS = float(os.getenv("JWT_KEYS_RELOAD_SECONDS", "5"))
+
+ASYMMETRIC_ALGORITHMS = ("RS256", "EdDSA")
+
+
+def b64url_encode(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode("ascii")
+
+
+def b64url_decode(data) -> bytes:
+    if isinstance(data, str):
+        data = data.encode("ascii")
+    return base64.urlsafe_b64decode(data + b"=" * (-len(data) % 4))
+
+
+def _int_to_b64(value: int) -> str:
+    return b64url_encode(value.to_bytes((value.bit_length() + 7) // 8, "big"))
+
+
+class SigningKey:
+    """Chave já carregada (objetos da cryptography), reutilizada em toda assinatura/verificação"""
+
+    def __init__(self, kid: str, private_key=None, public_key=None):
+        from cryptography.hazmat.primitives.asymmetric import ed25519, rsa
+        self.kid = kid
+        self.private_key = private_key
+        self.public_key = public_key or private_key.public_key()
+        if isinstance(self.public_key, rsa.RSAPublicKey):
+            self.alg = "RS256"
+        elif isinstance(self.public_key, ed25519.Ed25519PublicKey):
+            self.alg = "EdDSA"
+        else:
+            raise ValueError(f"Unsupported key type for kid {kid}")
+
+    def sign(self, signing_input: bytes) -> bytes:
+        if self.private_key is None:
+            raise ValueError(f"Key {self.kid} is retired and cannot sign")
+        if self.alg == "EdDSA":
+            return self.private_key.sign(signing_input)
+        from cryptography.hazmat.primitives import hashes
+        from cryptography.hazmat.primitives.asymmetric import padding
+        return self.private_key.sign(signing_input, padding.PKCS1v15(), hashes.SHA256())
+
+    def verify(self, signing_input: bytes, signature: bytes) -> bool:
+        from cryptography.exceptions import InvalidSignature
+        try:
+            if self.alg == "EdDSA":
+                self.public_key.verify(signature, signing_input)
+            else:
+                from cryptography.hazmat.primitives import hashes
+                from cryptography.hazmat.primitives.asymmetric import padding
+                self.public_key.verify(signature, signing_input, padding.PKCS1v15(), hashes.SHA256())
+            return True
+        except InvalidSignature:
+            return False
+
+    def jwk(self) -> dict:
+        if self.alg == "EdDSA":
+            from cryptography.hazmat.primitives import serialization
+            raw = self.public_key.public_bytes(serialization.Encoding.Raw, serialization.PublicFormat.Raw)
+            return {"kty": "OKP", "crv": "Ed25519", "x": b64url_encode(raw), "kid": self.kid, "alg": "EdDSA", "use": "sig"}
+        numbers = self.public_key.public_numbers()
+        return {"kty": "RSA", "n": _int_to_b64(numbers.n), "e": _int_to_b64(numbers.e), "kid": self.kid, "alg": "RS256", "use": "sig"}
+
+
+def generate_private_key(alg: str):
+    if alg == "EdDSA":
+        from cryptography.hazmat.primitives.asymmetric import ed25519
+        return ed25519.Ed25519PrivateKey.generate()
+    if alg == "RS256":
+        from cryptography.hazmat.primitives.asymmetric import rsa
+        return rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    raise ValueError(f"Unsupported algorithm: {alg}")
+
+
+def write_private_key(directory: str, kid: str, private_key) -> str:
+    """Grava "<kid>.pem" atomicamente: outro processo lendo o diretório nunca vê o arquivo pela metade
+
+    Levanta FileExistsError se o kid já existir (como O_EXCL): dois processos gravando o mesmo kid,
+    só o primeiro vence.
+    """
+    from cryptography.hazmat.primitives import serialization
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f"{kid}.pem")
+    pem = private_key.private_bytes(
+        serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption()
+    )
+    tmp_path = os.path.join(directory, f".{kid}.{secrets.token_hex(4)}.tmp")
+    fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(pem)
+            f.flush()
+            os.fsync(f.fileno())
+        # link() falha se o destino existir, e o arquivo só aparece com o nome final já completo
+        os.link(tmp_path, path)
+    finally:
+        os.unlink(tmp_path)
+    return path
+
+
+class KeyRing:
+    """Chaves de assinatura indexadas por kid; a ativa assina, todas verificam"""
+
+    def __init__(self, algorithm: str = JWT_ALGORITHM, directory: str = JWT_KEYS_DIR, active_kid: str = JWT_ACTIVE_KID):
+        self.algorithm = algorithm
+        self.directory = directory
+        self.active_kid = active_kid
+        self._keys: Dict[str, SigningKey] = {}
+        self._active: Optional[SigningKey] = None
+        self._loaded = False
+        self._last_reload = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def asymmetric(self) -> bool:
+        return self.algorithm in ASYMMETRIC_ALGORITHMS
+
+    def _ensure_loaded(self, generate_missing: bool = True) -> None:
+        if self._loaded:
+            return
+        with self._lock:
+            if not self._loaded:
+                self._load(generate_missing)
+                self._loaded = True
+
+    def _scan(self, known_only: bool = False) -> Optional[str]:
+        """Carrega as chaves do diretório; devolve o kid privado mais recente do algoritmo configurado
+
+        Com known_only, lê só os arquivos de kids ainda desconhecidos e ignora os que falharem
+        (removidos ou em gravação por outro processo): a próxima releitura tenta de novo.
+        """
+        from cryptography.hazmat.primitives import serialization
+        newest = None
+        if not self.directory or not os.path.isdir(self.directory):
+            return None
+        for name in sorted(os.listdir(self.directory)):
+            if name.endswith(".pub.pem"):
+                kid, private = name[:-len(".pub.pem")], False
+            elif name.endswith(".pem"):
+                kid, private = name[:-len(".pem")], True
+            else:
+                continue
+            if known_only and kid in self._keys:
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                with open(path, "rb") as f:
+                    data = f.read()
+                if private:
+                    key = SigningKey(kid, private_key=serialization.load_pem_private_key(data, password=None))
+                    mtime = os.path.getmtime(path)
+                else:
+                    key = SigningKey(kid, public_key=serialization.load_pem_public_key(data))
+            except (OSError, ValueError) as e:
+                if not known_only:
+                    raise
+                logger.warning(f"Skipping JWT key file {name}: {e}")
+                continue
+            self._keys[kid] = key
+            # Sem JWT_ACTIVE_KID, assina a chave mais recente do algoritmo configurado
+            if private and key.alg == self.algorithm and (newest is None or mtime > newest[0]):
+                newest = (mtime, kid)
+        return newest[1] if newest else None
+
+    def _load(self, generate_missing: bool = True) -> None:
+        newest = self._scan()
+        self._last_reload = time.monotonic()
+
+        if not self.asymmetric:
+            return
+        kid = self.active_kid or newest
+        if kid is None:
+            if not generate_missing:
+                return
+            self._active = self._bootstrap_key()
+            return
+        active = self._keys.get(kid)
+        if active is None or active.private_key is None:
+            raise ValueError(f"Active JWT key {kid} not found or has no private key")
+        if active.alg != self.algorithm:
+            raise ValueError(f"Active JWT key {kid} is {active.alg}, expected {self.algorithm}")
+        self._active = active
+
+    def _bootstrap_key(self) -> SigningKey:
+        """Primeira chave de um diretório vazio, com kid fixo para que todos os workers concordem
+
+        Cada worker que não encontrou chave tenta gravar a sua com o mesmo kid; a gravação é
+        exclusiva, então o primeiro vence e os demais carregam a chave dele do disco.
+        """
+        if not self.directory:
+            logger.warning(
+                "JWT_KEYS_DIR not set: generating an ephemeral signing key; tokens will not survive a "
+                "restart nor validate on other workers"
+            )
+            return self._add_generated_key()
+        kid = f"{self.algorithm.lower()}-bootstrap"
+        if kid in self._keys:
+            raise ValueError(f"Bootstrap JWT key {kid} was retired; provision a new key in {self.directory}")
+        try:
+            key = self._add_generated_key(kid)
+            logger.warning(f"No {self.algorithm} signing key found, generated {kid} in {self.directory}")
+            return key
+        except FileExistsError:
+            # Outro worker gravou primeiro: usa a chave dele
+            self._scan(known_only=True)
+            key = self._keys.get(kid)
+            if key is None or key.private_key is None:
+                raise ValueError(f"Bootstrap JWT key {kid} could not be loaded from {self.directory}")
+            logger.info(f"Loaded {self.algorithm} signing key {kid} generated by another worker")
+            return key
+
+    def _add_generated_key(self, kid: Optional[str] = None) -> SigningKey:
+        kid = kid or secrets.token_hex(8)
+        private_key = generate_private_key(self.algorithm)
+        if self.directory:
+            write_private_key(self.directory, kid, private_key)
+        key = SigningKey(kid, private_key=private_key)
+        self._keys[kid] = key
+        return key
+
+    def _reload_for(self, kid: str) -> Optional[SigningKey]:
+        """kid desconhecido: relê o diretório (no máximo uma vez por JWT_KEYS_RELOAD_SECONDS)
+
+        Pega chaves rotacionadas por outro processo sem reiniciar; o limite evita que tokens com
+        kids inventados virem um listdir por requisição.
+        """
+        if not self.directory:
+            return None
+        with self._lock:
+            if kid not in self._keys and time.monotonic() - self._last_reload >= JWT_KEYS_RELOAD_SECONDS:
+                self._last_reload = time.monotonic()
+                self._scan(known_only=True)
+            return self._keys.get(kid)
+
+    def rotate(self) -> SigningKey:
+        """Gera uma nova chave ativa; as anteriores continuam válidas para verificação"""
+        self._ensure_loaded(generate_missing=False)
+        with self._lock:
+            self._active = self._add_generated_key()
+            logger.info(f"JWT signing key rotated, active kid: {self._active.kid}")
+            return self._active
+
+    @property
+    def active(self) -> SigningKey:
+        self._ensure_loaded()
+        return self._active
+
+    def get(self, kid: str) -> Optional[SigningKey]:
+        self._ensure_loaded()
+        key = self._keys.get(kid)
+        if key is None:
+            return self._reload_for(kid)
+        return key
+
+    def jwks(self) -> dict:
+        self._ensure_loaded()
+        keys: List[dict] = [key.jwk() for key in list(self._keys.values())]
+        return {"keys": keys}
+
+
+keyring = KeyRing()
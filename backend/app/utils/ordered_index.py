@@ -0,0 +1,148 @@
+from bisect import bisect_left, insort
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+Entry = Tuple[Any, int]
+
+
+class OrderedIndex:
+    """Ids ordenados por uma chave (ex.: vencimento, posição), em blocos ordenados
+
+    Inserção e remoção custam O(log n + B) e leituras de um trecho O(n / B + k), sem a lista
+    única que precisaria deslocar todos os itens a cada inserção. Empates na chave ficam em
+    ordem de id. Não é thread-safe: quem compartilha a instância sincroniza o acesso.
+    """
+
+    BLOCK_SIZE = 512
+
+    def __init__(self):
+        self._blocks: List[List[Entry]] = []
+        # Maior entrada de cada bloco, para localizar o bloco por bisect
+        self._maxes: List[Entry] = []
+        self._keys: Dict[int, Entry] = {}
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def get(self, item_id: int) -> Any:
+        entry = self._keys.get(item_id)
+        return entry[0] if entry is not None else None
+
+    def set(self, item_id: int, key: Any) -> None:
+        """Posiciona o id pela chave; None remove"""
+        entry = self._keys.get(item_id)
+        new_entry = (key, item_id) if key is not None else None
+        if entry == new_entry:
+            return
+        if entry is not None:
+            self._remove(entry)
+            del self._keys[item_id]
+        if new_entry is not None:
+            self._insert(new_entry)
+            self._keys[item_id] = new_entry
+
+    def _insert(self, entry: Entry) -> None:
+        if not self._blocks:
+            self._blocks.append([entry])
+            self._maxes.append(entry)
+            return
+        index = min(bisect_left(self._maxes, entry), len(self._blocks) - 1)
+        block = self._blocks[index]
+        insort(block, entry)
+        self._maxes[index] = block[-1]
+        if len(block) > 2 * self.BLOCK_SIZE:
+            half = self.BLOCK_SIZE
+            self._blocks[index:index + 1] = [block[:half], block[half:]]
+            self._maxes[index:index + 1] = [block[half - 1], block[-1]]
+
+    def _remove(self, entry: Entry) -> None:
+        index = bisect_left(self._maxes, entry)
+        block = self._blocks[index]
+        del block[bisect_left(block, entry)]
+        if block:
+            self._maxes[index] = block[-1]
+        else:
+            del self._blocks[index]
+            del self._maxes[index]
+
+    def extend(self, entries: List[Entry]) -> None:
+        """Acrescenta entradas já ordenadas e maiores que todas as atuais, completando o último bloco"""
+        if not entries:
+            return
+        if self._blocks and entries[0] <= self._maxes[-1]:
+            raise ValueError("extend requer entradas depois da última")
+        size = self.BLOCK_SIZE
+        start = 0
+        if self._blocks and len(self._blocks[-1]) < size:
+            start = size - len(self._blocks[-1])
+            self._blocks[-1].extend(entries[:start])
+            self._maxes[-1] = self._blocks[-1][-1]
+        for offset in range(start, len(entries), size):
+            block = entries[offset:offset + size]
+            self._blocks.append(block)
+            self._maxes.append(block[-1])
+        self._keys.update((item_id, (key, item_id)) for key, item_id in entries)
+
+    def load(self, entries: List[Entry]) -> None:
+        """Substitui o conteúdo de uma vez: uma ordenação e o corte em blocos"""
+        entries.sort()
+        size = self.BLOCK_SIZE
+        self._blocks = [entries[start:start + size] for start in range(0, len(entries), size)]
+        self._maxes = [block[-1] for block in self._blocks]
+        self._keys = {item_id: (key, item_id) for key, item_id in entries}
+
+    def _locate(self, item_id: int) -> Optional[Tuple[int, int]]:
+        """(bloco, posição no bloco) do id"""
+        entry = self._keys.get(item_id)
+        if entry is None:
+            return None
+        block_index = bisect_left(self._maxes, entry)
+        return block_index, bisect_left(self._blocks[block_index], entry)
+
+    def rank(self, item_id: int) -> Optional[int]:
+        """Posição global do id na ordem (0 = primeiro)"""
+        location = self._locate(item_id)
+        if location is None:
+            return None
+        block_index, offset = location
+        return sum(len(block) for block in self._blocks[:block_index]) + offset
+
+    def neighbors(self, item_id: int) -> Tuple[Optional[Entry], Optional[Entry]]:
+        """Entradas imediatamente antes e depois do id (None nas pontas)"""
+        block_index, offset = self._locate(item_id)
+        blocks = self._blocks
+        block = blocks[block_index]
+        if offset > 0:
+            previous = block[offset - 1]
+        else:
+            previous = blocks[block_index - 1][-1] if block_index > 0 else None
+        if offset + 1 < len(block):
+            following = block[offset + 1]
+        else:
+            following = blocks[block_index + 1][0] if block_index + 1 < len(blocks) else None
+        return previous, following
+
+    def last(self) -> Optional[Entry]:
+        return self._blocks[-1][-1] if self._blocks else None
+
+    def entries(self, start: int = 0, stop: Optional[int] = None) -> Iterator[Entry]:
+        """Entradas da posição start até stop (exclusivo), pulando blocos inteiros até o início"""
+        if stop is None:
+            stop = len(self._keys)
+        position = 0
+        for block in self._blocks:
+            if position >= stop:
+                return
+            size = len(block)
+            if position + size > start:
+                yield from block[max(start - position, 0):stop - position]
+            position += size
+
+    def below(self, bound: Any, limit: int) -> List[int]:
+        """Ids com chave menor que bound, em ordem, no máximo limit"""
+        ids: List[int] = []
+        for block in self._blocks:
+            for key, item_id in block:
+                if key >= bound or len(ids) >= limit:
+                    return ids
+                ids.append(item_id)
+        return ids
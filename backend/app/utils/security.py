@@ -1,27 +1,263 @@
 import os
-from datetime import datetime, timedelta
-from jose import JWTError, jwt
-from passlib.context import CryptContext
+import hashlib
+import hmac
+import json
+import logging
+import math
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from functools import lru_cache
 import secrets
 import re
-from typing import Optional
+from typing import Any, Callable, Dict, Iterable, Optional, Tuple
 from pydantic import BaseModel
+from starlette.concurrency import run_in_threadpool
+from app.core.invalidation_bus import invalidation_bus, TOKEN_REVOKED
+from app.utils.keyring import keyring, b64url_encode, b64url_decode, JWT_ALGORITHM, ASYMMETRIC_ALGORITHMS
+from app.core.tracing import traced
+from app.core.memory import memory_registry
+from app.core.maintenance import maintenance
+from app.core.metrics import metrics
+
+logger = logging.getLogger("security")
 
 # Configurações de segurança para ambiente de teste
 SECRET_KEY = os.getenv("JWT_SECRET_KEY", "test-secret-key-for-development-only")
-ALGORITHM = "HS256"
+# Algoritmo do segredo compartilhado: HS256 tem codec próprio; HS384/HS512 passam pelo python-jose
+ALGORITHM = JWT_ALGORITHM if JWT_ALGORITHM not in ASYMMETRIC_ALGORITHMS else "HS256"
+# Migração para RS256/EdDSA: até este instante (ISO 8601, sem fuso = UTC) tokens sem kid, do segredo
+# compartilhado, ainda são aceitos; sem ele, o modo assimétrico recusa qualquer token sem kid
+JWT_LEGACY_HS256_UNTIL = os.getenv("JWT_LEGACY_HS256_UNTIL", "")
+# JSON dos tokens: "auto" (orjson se instalado), "orjson" ou "json"
+JWT_JSON = os.getenv("JWT_JSON", "auto")
 ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", "30"))  # Mais tempo para testes
 REFRESH_TOKEN_EXPIRE_DAYS = int(os.getenv("REFRESH_TOKEN_EXPIRE_DAYS", "7"))
 
-# Configuração do contexto de senha (compatível com ambiente de teste)
-pwd_context = CryptContext(
-    schemes=["bcrypt"],
-    deprecated="auto",
-    bcrypt__rounds=8  # Menor para performance em testes
-)
+# Esquema dos hashes novos; hashes de outro esquema (e o SHA-256 legado) são regravados no login
+PASSWORD_HASH_SCHEME = os.getenv("PASSWORD_HASH_SCHEME", "bcrypt")
+# Custo fixo do esquema; 0 calibra no boot para que um verify leve PASSWORD_HASH_TARGET_MS neste hardware
+PASSWORD_HASH_ROUNDS = int(os.getenv("PASSWORD_HASH_ROUNDS", "0"))
+PASSWORD_HASH_TARGET_MS = float(os.getenv("PASSWORD_HASH_TARGET_MS", "50"))
+
+# Faixa de custo da calibração: abaixo do piso não desce, mesmo em hardware lento
+_ROUNDS_RANGE = {"bcrypt": (8, 16), "pbkdf2_sha256": (29000, 10_000_000)}
+_CALIBRATION_SAMPLES = 3
+
+_pwd_lock = threading.RLock()
+_pwd_context = None
+_pwd_rounds = 0
+
+def calibrate_password_rounds(scheme: str = PASSWORD_HASH_SCHEME, target_ms: float = PASSWORD_HASH_TARGET_MS) -> int:
+    """Custo cujo verify leva até target_ms aqui: mede no custo mínimo e extrapola
+
+    No bcrypt cada +1 de custo dobra o tempo; no PBKDF2 o tempo cresce linear com as iterações.
+    """
+    from passlib import hash as handlers
+    handler = getattr(handlers, scheme)
+    min_rounds, max_rounds = _ROUNDS_RANGE[scheme]
+    sample = handler.using(rounds=min_rounds).hash("calibration")
+    timings = []
+    for _ in range(_CALIBRATION_SAMPLES):
+        started = time.perf_counter()
+        handler.verify("calibration", sample)
+        timings.append(time.perf_counter() - started)
+    base_ms = min(timings) * 1000
+    if scheme == "bcrypt":
+        rounds = min_rounds + max(0, int(math.log2(target_ms / base_ms)))
+        estimated_ms = base_ms * 2 ** (rounds - min_rounds)
+    else:
+        rounds = int(min_rounds * target_ms / base_ms)
+        estimated_ms = base_ms * rounds / min_rounds
+    rounds = max(min_rounds, min(rounds, max_rounds))
+    logger.info(
+        f"Password hashing calibrated: {scheme} rounds={rounds} (~{estimated_ms:.0f}ms per verify, target {target_ms:.0f}ms)"
+    )
+    return rounds
+
+def _build_pwd_context(rounds: int):
+    from passlib.context import CryptContext
+    schemes = [PASSWORD_HASH_SCHEME] + [s for s in _ROUNDS_RANGE if s != PASSWORD_HASH_SCHEME] + ["hex_sha256"]
+    return CryptContext(
+        schemes=schemes,
+        # Só o primeiro esquema gera hashes; os outros ficam para verificar e migrar
+        deprecated="auto",
+        # Hashes com custo abaixo do atual também acusam needs_update
+        **{f"{PASSWORD_HASH_SCHEME}__rounds": rounds, f"{PASSWORD_HASH_SCHEME}__min_rounds": rounds},
+    )
+
+def configure_password_hashing(rounds: int) -> None:
+    """Fixa o custo sem calibrar (ex.: processos filhos herdam o custo calibrado no pai)"""
+    global _pwd_context, _pwd_rounds
+    with _pwd_lock:
+        _pwd_context = _build_pwd_context(rounds)
+        _pwd_rounds = rounds
+    metrics.set_gauge("password_hash_rounds", rounds, scheme=PASSWORD_HASH_SCHEME)
+
+def get_pwd_context():
+    """Contexto de senha criado no primeiro uso (passlib/bcrypt fora do cold start), já com o custo calibrado"""
+    if _pwd_context is None:
+        with _pwd_lock:
+            if _pwd_context is None:
+                configure_password_hashing(PASSWORD_HASH_ROUNDS or calibrate_password_rounds())
+    return _pwd_context
+
+def password_hash_rounds() -> int:
+    get_pwd_context()
+    return _pwd_rounds
+
+def _parse_cutoff(value: str) -> Optional[float]:
+    if not value:
+        return None
+    moment = datetime.fromisoformat(value)
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return moment.timestamp()
+
+_legacy_hs256_until = _parse_cutoff(JWT_LEGACY_HS256_UNTIL)
+
+@lru_cache(maxsize=None)
+def _jose():
+    """python-jose é importado apenas quando o primeiro token é emitido/validado"""
+    import jose.jwt
+    return jose
+
+def _json_codec(name: str) -> Tuple[Callable[[Any], bytes], Callable[[bytes], Any]]:
+    """(dumps, loads) do JSON dos tokens: orjson quando instalado ("auto"), ou a stdlib"""
+    if name in ("auto", "orjson"):
+        try:
+            import orjson
+            return orjson.dumps, orjson.loads
+        except ImportError:
+            if name == "orjson":
+                raise
+    return (lambda obj: json.dumps(obj, separators=(",", ":")).encode()), json.loads
+
+_json_dumps, _json_loads = _json_codec(JWT_JSON)
+
+def _claims_valid(payload: dict) -> bool:
+    """exp/nbf/iat como o python-jose valida (epoch em segundos inteiros, sem tolerância)"""
+    now = int(time.time())
+    for claim in ("exp", "nbf", "iat"):
+        # Presente mas nulo também é inválido (o python-jose recusa exp/nbf/iat = null)
+        if claim in payload and (isinstance(payload[claim], bool) or not isinstance(payload[claim], (int, float))):
+            return False
+    exp = payload.get("exp")
+    if exp is not None and int(exp) < now:
+        return False
+    nbf = payload.get("nbf")
+    return nbf is None or int(nbf) <= now
+
+class HS256Codec:
+    """Codec HS256 especializado: chave HMAC preparada uma vez, cabeçalho pré-serializado, comparação em tempo constante"""
+    
+    alg = "HS256"
+    
+    def __init__(self, secret: str):
+        self._mac = hmac.new(secret.encode(), digestmod=hashlib.sha256)
+        # Mesmo cabeçalho (chaves ordenadas) que o python-jose emite
+        self.header = b64url_encode(_json_dumps({"alg": self.alg, "typ": "JWT"}))
+    
+    def _sign(self, signing_input: bytes) -> bytes:
+        mac = self._mac.copy()
+        mac.update(signing_input)
+        return mac.digest()
+    
+    def encode(self, claims: dict) -> str:
+        signing_input = self.header + "." + b64url_encode(_json_dumps(claims))
+        return signing_input + "." + b64url_encode(self._sign(signing_input.encode("ascii")))
+    
+    def decode(self, token: str) -> Optional[dict]:
+        try:
+            header_b64, payload_b64, signature_b64 = token.split(".")
+            if header_b64 != self.header:
+                # Emitido por outra biblioteca: mesmo algoritmo, outra serialização do cabeçalho
+                header = _json_loads(b64url_decode(header_b64))
+                if not isinstance(header, dict) or header.get("alg") != self.alg:
+                    return None
+            signature = self._sign(f"{header_b64}.{payload_b64}".encode("ascii"))
+            if not hmac.compare_digest(signature, b64url_decode(signature_b64)):
+                return None
+            payload = _json_loads(b64url_decode(payload_b64))
+        except (ValueError, TypeError, AttributeError):
+            return None
+        if not isinstance(payload, dict) or not _claims_valid(payload):
+            return None
+        return payload
 
-# Lista negra de tokens (em memória para ambiente de teste)
-token_blacklist = set()
+class JoseCodec:
+    """Outros algoritmos do segredo compartilhado (HS384/HS512), pelo python-jose"""
+    
+    def __init__(self, secret: str, alg: str):
+        self.secret = secret
+        self.alg = alg
+        self.header = b64url_encode(json.dumps({"alg": alg, "typ": "JWT"}, separators=(",", ":"), sort_keys=True).encode())
+    
+    def encode(self, claims: dict) -> str:
+        return _jose().jwt.encode(claims, self.secret, algorithm=self.alg)
+    
+    def decode(self, token: str) -> Optional[dict]:
+        try:
+            return _jose().jwt.decode(token, self.secret, algorithms=[self.alg])
+        except _jose().JWTError:
+            return None
+
+@lru_cache(maxsize=None)
+def get_symmetric_codec():
+    """Codec do segredo compartilhado, criado no primeiro token"""
+    if ALGORITHM == HS256Codec.alg:
+        return HS256Codec(SECRET_KEY)
+    return JoseCodec(SECRET_KEY, ALGORITHM)
+
+def _encode_jwt(claims: dict) -> str:
+    """Assina com a chave ativa do keyring (RS256/EdDSA) ou com o segredo compartilhado"""
+    if not keyring.asymmetric:
+        return get_symmetric_codec().encode(claims)
+    
+    key = keyring.active
+    header = {"alg": key.alg, "typ": "JWT", "kid": key.kid}
+    signing_input = (b64url_encode(_json_dumps(header)) + "." + b64url_encode(_json_dumps(claims))).encode("ascii")
+    return signing_input.decode("ascii") + "." + b64url_encode(key.sign(signing_input))
+
+def _shared_secret_accepted() -> bool:
+    """Tokens sem kid valem sempre no modo simétrico; no assimétrico, só dentro da janela de migração"""
+    if not keyring.asymmetric:
+        return True
+    return _legacy_hs256_until is not None and time.time() < _legacy_hs256_until
+
+def _decode_jwt(token: str) -> Optional[dict]:
+    """Valida assinatura e expiração; tokens com kid usam a chave pública em cache do keyring"""
+    codec = get_symmetric_codec()
+    try:
+        header_b64, payload_b64, signature_b64 = token.split(".")
+        if header_b64 == codec.header:
+            # Caminho comum: cabeçalho idêntico ao que este serviço emite, sem kid
+            return codec.decode(token) if _shared_secret_accepted() else None
+        header = _json_loads(b64url_decode(header_b64))
+    except (ValueError, TypeError, AttributeError):
+        return None
+    
+    kid = header.get("kid") if isinstance(header, dict) else None
+    if kid is None:
+        # Segredo compartilhado; no modo assimétrico, só tokens emitidos antes da migração (JWT_LEGACY_HS256_UNTIL)
+        return codec.decode(token) if _shared_secret_accepted() else None
+    
+    key = keyring.get(kid)
+    if key is None or header.get("alg") != key.alg:
+        return None
+    try:
+        signature = b64url_decode(signature_b64)
+        if not key.verify(f"{header_b64}.{payload_b64}".encode("ascii"), signature):
+            return None
+        payload = _json_loads(b64url_decode(payload_b64))
+    except (ValueError, TypeError):
+        return None
+    if not isinstance(payload, dict) or not _claims_valid(payload):
+        return None
+    return payload
+
+# Lista negra de tokens (em memória para ambiente de teste): token -> exp, para a limpeza saber quando soltá-lo
+token_blacklist: Dict[str, float] = {}
 
 class TokenData(BaseModel):
     username: Optional[str] = None
@@ -40,14 +276,33 @@ def validate_password_strength(password: str) -> tuple[bool, str]:
     
     return True, "Senha válida"
 
+@traced("security.verify_password")
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """Verifica se a senha está correta"""
+    context = get_pwd_context()
+    started = time.perf_counter()
     try:
-        return pwd_context.verify(plain_password, hashed_password)
+        return context.verify(plain_password, hashed_password)
     except Exception as e:
-        # Log do erro mas não quebra a aplicação
-        print(f"Erro na verificação de senha: {e}")
+        # Hash corrompido ou de esquema desconhecido: recusa o login sem quebrar a aplicação
+        logger.warning(f"Password verification failed: {e}")
+        metrics.inc("password_verification_errors_total")
         return False
+    finally:
+        # Latência do login sob controle: o custo calibrado deve aparecer aqui
+        metrics.inc("password_verifications_total")
+        metrics.inc("password_verify_seconds_total", time.perf_counter() - started)
+
+def password_needs_update(hashed_password: str) -> bool:
+    """Hash de outro esquema, com custo abaixo do atual ou SHA-256 legado"""
+    try:
+        return get_pwd_context().needs_update(hashed_password)
+    except ValueError:
+        return False
+
+def hash_password(password: str) -> str:
+    """Hash com o esquema e o custo atuais, sem validar a força (ex.: regravar uma senha já aceita)"""
+    return get_pwd_context().hash(password)
 
 def get_password_hash(password: str) -> str:
     """Gera hash seguro da senha - versão para testes"""
@@ -56,90 +311,115 @@ def get_password_hash(password: str) -> str:
     if not is_valid:
         raise ValueError(f"Senha inválida: {message}")
     
-    try:
-        return pwd_context.hash(password)
-    except Exception as e:
-        # Fallback mais simples em caso de erro com bcrypt
-        print(f"Erro no hash da senha: {e}")
-        # Para ambiente de teste, usa hash simples como fallback
-        import hashlib
-        return hashlib.sha256(password.encode()).hexdigest()
+    return hash_password(password)
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """verify_password no threadpool: o bcrypt é CPU pura e travaria o event loop"""
+    return await run_in_threadpool(verify_password, plain_password, hashed_password)
+
+async def get_password_hash_async(password: str) -> str:
+    """get_password_hash no threadpool, pelo mesmo motivo"""
+    return await run_in_threadpool(get_password_hash, password)
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
     """Cria token de acesso JWT"""
     to_encode = data.copy()
     
+    # Claims de tempo já em epoch inteiro: nada de datetime para converter ao assinar
+    now = int(time.time())
     if expires_delta:
-        expire = datetime.utcnow() + expires_delta
+        expire = now + int(expires_delta.total_seconds())
     else:
-        expire = datetime.utcnow() + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
+        expire = now + ACCESS_TOKEN_EXPIRE_MINUTES * 60
     
     to_encode.update({
         "exp": expire,
-        "iat": datetime.utcnow(),
+        "iat": now,
         "type": "access"
     })
     
-    encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
+    encoded_jwt = _encode_jwt(to_encode)
     return encoded_jwt
 
 def create_refresh_token(data: dict) -> str:
     """Cria token de refresh"""
     to_encode = data.copy()
-    expire = datetime.utcnow() + timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS)
+    now = int(time.time())
     
     to_encode.update({
-        "exp": expire,
-        "iat": datetime.utcnow(),
+        "exp": now + REFRESH_TOKEN_EXPIRE_DAYS * 86400,
+        "iat": now,
         "type": "refresh"
     })
     
-    encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
+    encoded_jwt = _encode_jwt(to_encode)
     return encoded_jwt
 
+@traced("security.decode_access_token")
 def decode_access_token(token: str) -> Optional[dict]:
     """Decodifica e valida token de acesso"""
-    try:
-        # Verifica se o token está na lista negra
-        if token in token_blacklist:
-            return None
-            
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    # Verifica se o token está na lista negra
+    if token in token_blacklist:
+        return None
         
-        # Verifica se é um token de acesso
-        if payload.get("type") != "access":
-            return None
-            
-        # Verifica se o token não expirou
-        exp = payload.get("exp")
-        if exp and datetime.fromtimestamp(exp) < datetime.utcnow():
-            return None
-            
-        return payload
-    except JWTError:
+    payload = _decode_jwt(token)
+    
+    # Verifica se é um token de acesso (a expiração já foi validada pelo codec, em epoch UTC)
+    if not payload or payload.get("type") != "access":
         return None
+        
+    return payload
 
 def decode_refresh_token(token: str) -> Optional[dict]:
     """Decodifica e valida token de refresh"""
-    try:
-        if token in token_blacklist:
-            return None
-            
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    if token in token_blacklist:
+        return None
         
-        # Verifica se é um token de refresh
-        if payload.get("type") != "refresh":
-            return None
-            
-        return payload
-    except JWTError:
+    payload = _decode_jwt(token)
+    
+    # Verifica se é um token de refresh
+    if not payload or payload.get("type") != "refresh":
         return None
+        
+    return payload
+
+def _token_expiry(token: str) -> float:
+    """exp do token sem validar a assinatura; sem exp legível, o prazo mais longo que um token pode ter"""
+    try:
+        exp = json.loads(b64url_decode(token.split(".")[1])).get("exp")
+    except (ValueError, TypeError, IndexError, AttributeError):
+        exp = None
+    if not isinstance(exp, (int, float)):
+        return time.time() + REFRESH_TOKEN_EXPIRE_DAYS * 86400
+    return exp
 
 def revoke_token(token: str) -> bool:
-    """Adiciona token à lista negra"""
-    token_blacklist.add(token)
+    """Adiciona token à lista negra e propaga a revogação para os outros workers"""
+    exp = _token_expiry(token)
+    token_blacklist[token] = exp
+    invalidation_bus.publish(TOKEN_REVOKED, {"token": token, "exp": exp})
     return True
 
+def purge_revoked_tokens(tokens: Iterable[str]) -> int:
+    """Tira da lista negra (num lote) os tokens já expirados, que a validação recusaria de qualquer forma"""
+    now = time.time()
+    removed = 0
+    for token in tokens:
+        exp = token_blacklist.get(token)
+        if exp is not None and exp < now:
+            token_blacklist.pop(token, None)
+            removed += 1
+    return removed
+
+def _on_token_revoked(data: dict) -> None:
+    token = data.get("token")
+    if token:
+        token_blacklist[token] = data.get("exp") or _token_expiry(token)
+
+invalidation_bus.subscribe(TOKEN_REVOKED, _on_token_revoked)
+memory_registry.register("token_blacklist", lambda: token_blacklist)
+maintenance.register("token_blacklist", token_blacklist.keys, purge_revoked_tokens)
+
 def sanitize_username(username: str) -> str:
     """Sanitiza o nome de usuário - versão adaptada para testes"""
     # Remove espaços e converte para lowercase
@@ -0,0 +1,37 @@
+import io
+from typing import AsyncIterator
+
+import anyio.from_thread
+
+
+class AsyncBodyReader(io.RawIOBase):
+    """Arquivo binário bloqueante sobre um stream assíncrono (ex.: request.stream())
+
+    Para uso dentro de uma thread do threadpool do anyio (run_in_threadpool): cada leitura
+    busca o próximo pedaço no event loop, então o corpo nunca fica inteiro em memória.
+    """
+
+    def __init__(self, stream: AsyncIterator[bytes]):
+        self._iterator = stream.__aiter__()
+        self._pending = b""
+        self._exhausted = False
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        while not self._pending:
+            if self._exhausted:
+                return 0
+            try:
+                self._pending = anyio.from_thread.run(self._iterator.__anext__)
+            except StopAsyncIteration:
+                self._exhausted = True
+        size = min(len(buffer), len(self._pending))
+        buffer[:size] = self._pending[:size]
+        self._pending = self._pending[size:]
+        return size
+
+
+def open_text_stream(stream: AsyncIterator[bytes], encoding: str = "utf-8", buffer_size: int = 1 << 16) -> io.TextIOWrapper:
+    return io.TextIOWrapper(io.BufferedReader(AsyncBodyReader(stream), buffer_size), encoding=encoding, newline="")
@@ -0,0 +1,132 @@
+"""Controle de admissão (fila assíncrona) e backoff por usuário no login"""
+import asyncio
+import time
+
+import pytest
+
+from app.core.admission import AdmissionController, AdmissionRejected, LoginBackoff
+
+
+def _backoff(**overrides) -> LoginBackoff:
+    options = dict(free_attempts=2, base_seconds=1, max_seconds=8, max_entries=100, reset_seconds=3600)
+    options.update(overrides)
+    return LoginBackoff(**options)
+
+
+def test_backoff_escalates_after_free_attempts():
+    backoff = _backoff()
+    backoff.record_failure("ana")
+    backoff.record_failure("ana")
+    assert backoff.check("ana") == 0
+    delays = []
+    for _ in range(5):
+        backoff.record_failure("ana")
+        delays.append(backoff.check("ana"))
+    assert delays == [1, 2, 4, 8, 8]
+
+
+def test_success_resets_backoff():
+    backoff = _backoff(free_attempts=0)
+    backoff.record_failure("ana")
+    assert backoff.check("ana") > 0
+    backoff.record_success("ana")
+    assert backoff.check("ana") == 0
+    assert "ana" not in backoff.keys()
+
+
+def test_max_entries_evicts_oldest():
+    backoff = _backoff(max_entries=2)
+    for name in ("a", "b", "c"):
+        backoff.record_failure(name)
+    assert list(backoff.keys()) == ["b", "c"]
+
+
+def test_purge_expired_drops_idle_users():
+    backoff = _backoff(free_attempts=0, base_seconds=60, reset_seconds=0)
+    backoff.record_failure("blocked")
+    backoff._entries["idle"] = (5, time.monotonic() - 1)
+    assert backoff.purge_expired() == 1
+    assert list(backoff.keys()) == ["blocked"]
+    # Só olha o lote recebido
+    backoff._entries["idle"] = (5, time.monotonic() - 1)
+    assert backoff.purge_expired(["blocked"]) == 0
+    assert backoff.purge_expired(["idle", "missing"]) == 1
+
+
+def test_record_failure_prunes_forgotten_entries_at_front():
+    backoff = _backoff(reset_seconds=10)
+    backoff._entries["old"] = (9, time.monotonic() - 60)
+    backoff.record_failure("new")
+    assert list(backoff.keys()) == ["new"]
+
+
+def test_admission_queues_then_rejects_when_full():
+    controller = AdmissionController("test", max_concurrency=1, max_queue=1, queue_timeout=2)
+    admitted = []
+
+    async def hold(release):
+        async with controller.admit():
+            await release.wait()
+
+    async def queued():
+        async with controller.admit():
+            admitted.append(True)
+
+    async def scenario():
+        release = asyncio.Event()
+        holder = asyncio.create_task(hold(release))
+        await asyncio.sleep(0)
+        waiter = asyncio.create_task(queued())
+        await asyncio.sleep(0)
+        assert controller.stats() == {"active": 1, "waiting": 1, "rejected": 0}
+
+        with pytest.raises(AdmissionRejected) as excinfo:
+            async with controller.admit():
+                pass
+        assert excinfo.value.retry_after >= 1
+
+        release.set()
+        await asyncio.gather(holder, waiter)
+
+    asyncio.run(scenario())
+    assert admitted == [True]
+    assert controller.stats() == {"active": 0, "waiting": 0, "rejected": 1}
+
+
+def test_admission_queue_timeout():
+    controller = AdmissionController("test", max_concurrency=1, max_queue=4, queue_timeout=0.05)
+
+    async def scenario():
+        async with controller.admit():
+            with pytest.raises(AdmissionRejected):
+                async with controller.admit():
+                    pass
+
+    asyncio.run(scenario())
+    assert controller.stats() == {"active": 0, "waiting": 0, "rejected": 1}
+
+
+def test_slot_is_handed_over_when_a_waiter_is_cancelled():
+    controller = AdmissionController("test", max_concurrency=1, max_queue=4, queue_timeout=2)
+    order = []
+
+    async def run(name, release=None):
+        async with controller.admit():
+            order.append(name)
+            if release is not None:
+                await release.wait()
+
+    async def scenario():
+        release = asyncio.Event()
+        holder = asyncio.create_task(run("holder", release))
+        await asyncio.sleep(0)
+        cancelled = asyncio.create_task(run("cancelled"))
+        last = asyncio.create_task(run("last"))
+        await asyncio.sleep(0)
+        cancelled.cancel()
+        release.set()
+        await asyncio.gather(holder, last, cancelled, return_exceptions=True)
+
+    asyncio.run(scenario())
+    assert order == ["holder", "last"]
+    assert controller.stats()["active"] == 0
@@ -0,0 +1,130 @@
+"""Arquivo de todos concluídos: segmentos comprimidos, paginação, tombstones e ida e volta pela store"""
+import json
+import os
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from app.models.todo import Todo
+from app.repositories.archive import ArchiveSegment, ArchiveStore
+from app.repositories.persistence import _encode_data
+from app.services import todo_service
+from app.services.todo_service import TodoService, todos_db
+
+
+class Journal:
+    """Persistência habilitada só para guardar os registros, serializados como na thread de escrita"""
+
+    enabled = True
+
+    def __init__(self):
+        self.records = []
+
+    def record(self, store, op, data):
+        self.records.append((op, _encode_data(data)))
+
+
+def _records(ids):
+    return [(todo_id, json.dumps({"id": todo_id}).encode()) for todo_id in ids]
+
+
+def test_segment_round_trip_pages_and_tombstones(tmp_path):
+    path = str(tmp_path / "archive-00000001.seg")
+    ArchiveSegment.write(path, _records(range(1, 101)), block_records=8)
+    segment = ArchiveSegment(1, path, dead=[5, 6])
+    try:
+        assert segment.live == 98
+        assert json.loads(segment.get(42)) == {"id": 42}
+        assert segment.get(5) is None and 5 not in segment and 1000 not in segment
+        page = [json.loads(raw)["id"] for raw in segment.page(2, 10)]
+        assert page == [3, 4, 7, 8, 9, 10, 11, 12, 13, 14]
+        # Um bloco inteiro morto é pulado sem ser lido
+        for todo_id in range(9, 17):
+            assert segment.kill(todo_id)
+        assert not segment.kill(9)
+        assert [json.loads(raw)["id"] for raw in segment.page(4, 3)] == [7, 8, 17]
+    finally:
+        segment.close()
+
+
+def test_corrupted_segment_is_rejected(tmp_path):
+    path = tmp_path / "archive-00000001.seg"
+    ArchiveSegment.write(str(path), _records(range(1, 10)))
+    data = bytearray(path.read_bytes())
+    data[-30] ^= 0xFF
+    path.write_bytes(bytes(data))
+    with pytest.raises(ValueError):
+        ArchiveSegment(1, str(path))
+
+
+def test_store_pages_across_segments_and_removes_empty_ones(tmp_path):
+    store = ArchiveStore(str(tmp_path))
+    try:
+        first = store.write_segment(_records([3, 1, 2]))
+        second = store.write_segment(_records([10, 11]))
+        orphan = store.write_segment(_records([20]))
+        assert store.attach(first) == [1, 2, 3]
+        assert store.attach(second, dead=[11]) == [10]
+        assert store.remove_orphans() == 1
+        assert not os.path.exists(store._path(orphan))
+
+        total, records = store.page(2, 10)
+        assert total == len(store) == 4
+        assert [json.loads(raw)["id"] for raw in records] == [3, 10]
+        assert store.state() == {str(first): [], str(second): [11]}
+
+        assert store.kill([10, 99]) == 1
+        assert not os.path.exists(store._path(second))
+        state = store.state()
+        store.load_state(state)
+        assert len(store) == 3 and store.get(2) is not None
+    finally:
+        store.close()
+
+
+def test_archive_and_restore_round_trip(monkeypatch, tmp_path):
+    journal = Journal()
+    store = ArchiveStore(str(tmp_path))
+    monkeypatch.setattr(todo_service, "persistence", journal)
+    monkeypatch.setattr(todo_service, "archive_store", store)
+
+    old = datetime.now(timezone.utc) - timedelta(days=400)
+    created = [TodoService.create_todo(Todo(title=f"arq {i}", description="", completed=i % 3 != 0)) for i in range(12)]
+    for todo in created:
+        if todo.completed:
+            todo.completed_at = old
+    # Concluído recentemente: fica na store quente
+    recent = TodoService.create_todo(Todo(title="recente", description="", completed=True))
+    archived_ids = [todo.id for todo in created if todo.completed]
+
+    try:
+        assert TodoService.archive_completed(after_days=365) == len(archived_ids)
+        assert not any(todo_id in todos_db for todo_id in archived_ids)
+        assert recent.id in todos_db
+        assert TodoService.get_stats()[1].archived == len(store) == len(archived_ids)
+        total, body = TodoService.list_archived_encoded(1, 5)
+        page = json.loads(body)
+        assert total == len(archived_ids)
+        assert [item["id"] for item in page["items"]] == archived_ids[:5]
+
+        target = created[1]
+        restored = TodoService.restore_archived(target.id)
+        assert (restored.id, restored.title, restored.position) == (target.id, target.title, target.position)
+        assert restored.completed_at > old
+        assert TodoService.get_todo(target.id) is restored
+        assert [t.id for t in TodoService.list_todos() if t.id in (created[0].id, target.id)] == [created[0].id, target.id]
+        assert TodoService.restore_archived(target.id) is None
+        assert len(store) == len(archived_ids) - 1
+
+        # Um registro de tamanho fixo por segmento e um por restauração
+        assert [op for op, _ in journal.records[-2:]] == ["archive", "unarchive"]
+        assert json.loads(journal.records[-2][1]) == {"segment": 1, "skipped": []}
+    finally:
+        for todo_id in archived_ids:
+            TodoService.restore_archived(todo_id)
+        store.close()
+
+
+def test_archive_is_disabled_without_persistence(monkeypatch):
+    monkeypatch.setattr(todo_service, "archive_store", ArchiveStore(""))
+    assert TodoService.archive_completed(after_days=0) == 0
@@ -0,0 +1,113 @@
+"""Rotas no event loop: o que é corrotina, o que continua no threadpool e o cadastro concorrente"""
+import asyncio
+import inspect
+import threading
+
+import pytest
+
+from app.core import tracing
+from app.core.admission import AdmissionController
+from app.core.tracing import TraceExporter, traced
+from app.models.user import UserCreate
+from app.repositories.async_repository import AsyncUserRepositoryAdapter
+from app.repositories.user_repository import UserRepository
+from app.routes import todos as todo_routes
+from app.services import user_service
+from app.services.user_service import UserService
+from app.utils.security import get_password_hash_async, verify_password_async
+
+
+def test_writes_and_get_todo_stay_in_the_threadpool():
+    # Funções síncronas: o FastAPI as executa no threadpool, onde o lock da store pode esperar
+    for name in ("create_todo", "get_todo", "update_todo", "toggle_todo_status", "move_todo", "delete_todo"):
+        assert not inspect.iscoroutinefunction(getattr(todo_routes, name)), name
+    for name in ("list_todos", "search_todos", "get_todo_stats", "list_archived_todos", "restore_archived_todo"):
+        assert inspect.iscoroutinefunction(getattr(todo_routes, name)), name
+
+
+def test_traced_keeps_coroutines_recognisable(monkeypatch, tmp_path):
+    exporter = TraceExporter(ring_size=10, path=str(tmp_path / "traces.ndjson"))
+    monkeypatch.setattr(tracing, "exporter", exporter)
+
+    @traced("async_work")
+    async def work(value):
+        await asyncio.sleep(0)
+        return value * 2
+
+    assert inspect.iscoroutinefunction(work)
+
+    async def scenario():
+        with tracing._SpanScope(tracing.Span("4bf92f3577b34da6a3ce929d0e0e4736", None, "root")):
+            return await work(21)
+
+    assert asyncio.run(scenario()) == 42
+    assert {record["name"] for record in exporter.recent()} == {"async_work", "root"}
+
+
+def test_blocking_adapter_runs_calls_in_the_threadpool():
+    seen = []
+
+    class Recording(UserRepository):
+        def exists_username(self, username):
+            seen.append(threading.current_thread())
+            return False
+
+    async def scenario():
+        await AsyncUserRepositoryAdapter(Recording()).exists_username("ana")
+        await AsyncUserRepositoryAdapter(Recording(), blocking=True).exists_username("ana")
+
+    asyncio.run(scenario())
+    assert seen[0] is threading.main_thread() and seen[1] is not threading.main_thread()
+
+
+def test_concurrent_signups_with_the_same_name_create_one_user(monkeypatch):
+    repository = UserRepository()
+    monkeypatch.setattr(user_service, "user_repository", repository)
+    monkeypatch.setattr(user_service, "async_user_repository", AsyncUserRepositoryAdapter(repository))
+    monkeypatch.setattr(user_service, "get_password_hash_async", _slow_hash)
+
+    async def scenario():
+        payload = UserCreate(username="duplicado", password="Senha-Forte-1")
+        return await asyncio.gather(
+            UserService.create_user(payload), UserService.create_user(payload), return_exceptions=True,
+        )
+
+    results = asyncio.run(scenario())
+    assert sum(isinstance(result, ValueError) for result in results) == 1
+    assert [user.username for user in repository.get_all()] == ["duplicado"]
+
+
+async def _slow_hash(password):
+    # Os dois cadastros passam pela checagem inicial antes de qualquer um terminar o hash
+    await asyncio.sleep(0.01)
+    return "hash-" + password
+
+
+def test_admission_waiters_hold_no_thread():
+    controller = AdmissionController("test", max_concurrency=1, max_queue=100, queue_timeout=2)
+    threads_before = threading.active_count()
+
+    async def job(release):
+        async with controller.admit():
+            await release.wait()
+
+    async def scenario():
+        release = asyncio.Event()
+        tasks = [asyncio.create_task(job(release)) for _ in range(50)]
+        await asyncio.sleep(0)
+        assert controller.stats()["waiting"] == 49
+        assert threading.active_count() == threads_before
+        release.set()
+        await asyncio.gather(*tasks)
+
+    asyncio.run(scenario())
+    assert controller.stats() == {"active": 0, "waiting": 0, "rejected": 0}
+
+
+@pytest.mark.parametrize("password, expected", [("Senha-Forte-1", True), ("errada", False)])
+def test_async_password_helpers(password, expected):
+    async def scenario():
+        hashed = await get_password_hash_async("Senha-Forte-1")
+        return await verify_password_async(password, hashed)
+
+    assert asyncio.run(scenario()) is expected
@@ -0,0 +1,144 @@
+"""Compressão gzip: negociação, limite mínimo, stream, cache por ETag e @no_compression"""
+import asyncio
+import gzip
+import zlib
+
+import pytest
+
+from app.core import compression
+from app.core.compression import CompressedCache, CompressionMiddleware, accepts_gzip, no_compression
+from app.core.metrics import Metrics
+from app.routes.auth import login, refresh_token
+
+BIG = b'{"title": "comprar p\xc3\xa3o"}' * 200
+
+
+@pytest.mark.parametrize("header, expected", [
+    ("gzip", True),
+    ("gzip, deflate, br", True),
+    ("deflate, br", False),
+    ("", False),
+    ("*", True),
+    ("gzip;q=0, *", False),
+    ("*;q=0", False),
+    ("GZIP;q=0.5", True),
+    ("x-gzip", True),
+    ("gzip;q=abc", False),
+])
+def test_accept_encoding_negotiation(header, expected):
+    assert accepts_gzip(header) is expected
+
+
+@pytest.fixture
+def fresh_metrics(monkeypatch):
+    fresh = Metrics()
+    monkeypatch.setattr(compression, "metrics", fresh)
+    return fresh
+
+
+def _app(chunks, status=200, headers=(), endpoint=None):
+    async def app(scope, receive, send):
+        if endpoint is not None:
+            scope["endpoint"] = endpoint
+        await send({"type": "http.response.start", "status": status, "headers": list(headers)})
+        for index, chunk in enumerate(chunks):
+            await send({"type": "http.response.body", "body": chunk, "more_body": index < len(chunks) - 1})
+
+    return app
+
+
+def _request(app, accept="gzip", method="GET", cache=None, **options):
+    sent = []
+
+    async def receive():
+        return {"type": "http.request", "body": b""}
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {
+        "type": "http", "method": method, "path": "/todos/", "query_string": b"",
+        "headers": [(b"accept-encoding", accept.encode())],
+    }
+    middleware = CompressionMiddleware(app, cache=cache if cache is not None else CompressedCache(), **options)
+    asyncio.run(middleware(scope, receive, send))
+    headers = {key.decode(): value.decode() for key, value in sent[0]["headers"]}
+    return sent[0]["status"], headers, [message["body"] for message in sent[1:]]
+
+
+def _counters(metrics):
+    return {
+        c["labels"].get("result"): c["value"]
+        for c in metrics.snapshot()["counters"] if c["name"] == "compression_responses_total"
+    }
+
+
+def test_small_bodies_pass_through_and_large_ones_are_gzipped(fresh_metrics):
+    status, headers, body = _request(_app([b"{}"]))
+    assert "content-encoding" not in headers and body == [b"{}"]
+
+    status, headers, body = _request(_app([BIG], headers=[(b"content-length", str(len(BIG)).encode())]))
+    assert headers["content-encoding"] == "gzip"
+    assert headers["vary"] == "Accept-Encoding"
+    assert int(headers["content-length"]) == len(body[0]) < len(BIG)
+    assert gzip.decompress(body[0]) == BIG
+
+    _request(_app([BIG]), accept="br")
+    assert _counters(fresh_metrics) == {"small": 1, "compressed": 1, "not_accepted": 1}
+
+
+def test_threshold_is_configurable():
+    assert _request(_app([b"x" * 100]), minimum_size=50)[1]["content-encoding"] == "gzip"
+    assert "content-encoding" not in _request(_app([BIG]), minimum_size=len(BIG) + 1)[1]
+
+
+def test_streamed_chunks_are_flushed_without_content_length(fresh_metrics):
+    chunks = [BIG[:1000], BIG[1000:3000], BIG[3000:]]
+    status, headers, body = _request(_app(chunks, headers=[(b"content-length", str(len(BIG)).encode())]))
+    assert headers["content-encoding"] == "gzip" and "content-length" not in headers
+    assert len(body) == 3
+    # Cada pedaço já é decodificável sozinho graças ao sync flush
+    decoder = zlib.decompressobj(31)
+    assert decoder.decompress(body[0]) == chunks[0]
+    assert decoder.decompress(body[1] + body[2]) == b"".join(chunks[1:])
+    assert _counters(fresh_metrics) == {"streamed": 1}
+
+
+def test_etag_responses_reuse_the_compressed_body(fresh_metrics):
+    cache = CompressedCache()
+    strong = _app([BIG], headers=[(b"etag", b'"v1"')])
+    first = _request(strong, cache=cache)
+    second = _request(strong, cache=cache)
+    assert first[1]["etag"] == second[1]["etag"] == '"v1-gzip"'
+    assert first[2] == second[2] and len(cache) == 1
+    assert _counters(fresh_metrics) == {"compressed": 1, "cached": 1}
+
+    weak = _request(_app([BIG], headers=[(b"etag", b'W/"v2"')]), cache=cache)
+    assert weak[1]["etag"] == 'W/"v2"'
+
+
+def test_cache_is_bounded_in_bytes():
+    cache = CompressedCache(max_bytes=400)
+    for key in range(5):
+        cache.put((key,), b"x" * 90)
+    assert len(cache) == 4 and cache.get((0,)) is None and cache.get((4,)) is not None
+    # Maior que um quarto do limite: nem entra
+    cache.put(("big",), b"x" * 101)
+    assert cache.get(("big",)) is None
+
+
+@pytest.mark.parametrize("options, reason", [
+    ({"endpoint": no_compression(lambda: None)}, "opt_out"),
+    ({"headers": [(b"content-encoding", b"br")]}, "encoded"),
+    ({"headers": [(b"content-type", b"image/png")]}, "content_type"),
+    ({"status": 304}, "no_body"),
+])
+def test_skipped_responses(fresh_metrics, options, reason):
+    status, headers, body = _request(_app([BIG], **options))
+    assert headers.get("content-encoding") != "gzip" and body == [BIG]
+    assert _counters(fresh_metrics) == {reason: 1}
+
+
+def test_head_requests_and_login_routes_are_not_compressed():
+    assert "content-encoding" not in _request(_app([BIG]), method="HEAD")[1]
+    assert login.__no_compression__ and refresh_token.__no_compression__
@@ -0,0 +1,119 @@
+"""DeadlineMiddleware: 504 no prazo, cancelamento na desconexão e background tasks após a resposta"""
+import asyncio
+import json
+
+import pytest
+
+from app.core.deadline import (
+    DeadlineExceeded, DeadlineMiddleware, check_deadline, current_deadline, remaining_time,
+)
+
+
+def _scope(timeout_ms: int):
+    return {
+        "type": "http", "method": "GET", "path": "/todos/",
+        "headers": [(b"x-request-timeout-ms", str(timeout_ms).encode())],
+    }
+
+
+async def _run(app, timeout_ms=50, disconnect_after=None, grace=0.02):
+    """Executa o middleware com um cliente que só desconecta se disconnect_after for informado"""
+    sent = []
+    requested = False
+
+    async def receive():
+        nonlocal requested
+        if not requested:
+            requested = True
+            return {"type": "http.request", "body": b"", "more_body": False}
+        if disconnect_after is None:
+            await asyncio.Event().wait()
+        await asyncio.sleep(disconnect_after)
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        sent.append(message)
+
+    await DeadlineMiddleware(app, grace=grace)(_scope(timeout_ms), receive, send)
+    return sent
+
+
+async def _respond(send, status=200, payload=None):
+    await send({"type": "http.response.start", "status": status, "headers": []})
+    await send({"type": "http.response.body", "body": json.dumps(payload or {}).encode()})
+
+
+def test_fast_handler_sees_its_deadline():
+    seen = {}
+
+    async def app(scope, receive, send):
+        seen["remaining"] = remaining_time()
+        await _respond(send)
+
+    sent = asyncio.run(_run(app, timeout_ms=5000))
+    assert sent[0]["status"] == 200
+    assert 0 < seen["remaining"] <= 5
+    assert current_deadline() is None
+
+
+def test_handler_past_its_deadline_gets_504():
+    cancelled = asyncio.Event()
+
+    async def app(scope, receive, send):
+        try:
+            await asyncio.sleep(5)
+        except asyncio.CancelledError:
+            cancelled.set()
+            raise
+
+    async def scenario():
+        sent = await _run(app, timeout_ms=30)
+        # O handler abandonado é cancelado sem ser esperado
+        await asyncio.sleep(0)
+        return sent, cancelled.is_set()
+
+    sent, was_cancelled = asyncio.run(scenario())
+    assert sent[0]["status"] == 504
+    assert json.loads(sent[1]["body"]) == {"detail": "Tempo limite da requisição excedido"}
+    assert was_cancelled
+
+
+def test_cooperative_check_raises_after_deadline():
+    async def app(scope, receive, send):
+        await asyncio.sleep(0.03)
+        with pytest.raises(DeadlineExceeded):
+            check_deadline()
+        await _respond(send, 504)
+
+    assert asyncio.run(_run(app, timeout_ms=10, grace=1))[0]["status"] == 504
+
+
+def test_client_disconnect_cancels_handler_without_response():
+    state = {}
+
+    async def app(scope, receive, send):
+        await receive()
+        try:
+            await asyncio.sleep(5)
+        except asyncio.CancelledError:
+            state["cancelled"] = current_deadline().cancelled
+            raise
+
+    sent = asyncio.run(_run(app, timeout_ms=5000, disconnect_after=0.01))
+    assert sent == []
+    assert state == {"cancelled": True}
+
+
+def test_background_work_outlives_the_budget():
+    state = {}
+
+    async def app(scope, receive, send):
+        await _respond(send, 201)
+        # Background task: roda depois da resposta e além do prazo de 20ms + folga
+        await asyncio.sleep(0.1)
+        check_deadline()
+        state["finished"] = True
+
+    sent = asyncio.run(_run(app, timeout_ms=20, disconnect_after=0.01))
+    assert [message.get("status") for message in sent if message["type"] == "http.response.start"] == [201]
+    assert state == {"finished": True}
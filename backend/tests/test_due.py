@@ -0,0 +1,115 @@
+"""Vencimentos: heap de lembretes, listagem de /todos/due e integração com a store"""
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+from app.models.todo import Todo
+from app.services import due_scheduler as due_module
+from app.services.due_scheduler import DueScheduler, ReminderSink, as_utc
+from app.services.todo_service import TodoService
+
+
+class CollectingSink(ReminderSink):
+    name = "collect"
+
+    def __init__(self):
+        self.events = []
+        self.delivered = threading.Event()
+
+    def deliver(self, event):
+        self.events.append(event)
+        self.delivered.set()
+
+
+class FailingSink(ReminderSink):
+    name = "failing"
+
+    def deliver(self, event):
+        raise RuntimeError("fora do ar")
+
+
+def _todo(todo_id, due_in=None, completed=False, title="t"):
+    due_at = datetime.now(timezone.utc) + timedelta(seconds=due_in) if due_in is not None else None
+    return SimpleNamespace(id=todo_id, title=title, completed=completed, due_at=due_at)
+
+
+def test_as_utc_treats_naive_dates_as_utc():
+    assert as_utc(datetime(2030, 1, 1, 12)) == datetime(2030, 1, 1, 12, tzinfo=timezone.utc)
+    brt = timezone(timedelta(hours=-3))
+    assert as_utc(datetime(2030, 1, 1, 9, tzinfo=brt)) == datetime(2030, 1, 1, 12, tzinfo=timezone.utc)
+
+
+def test_reminders_fire_in_order_and_skip_cancelled_and_completed():
+    sink = CollectingSink()
+    scheduler = DueScheduler([FailingSink(), sink])
+    scheduler.update(_todo(1, due_in=0.15, title="segundo"))
+    scheduler.update(_todo(2, due_in=0.05, title="primeiro"))
+    scheduler.update(_todo(3, due_in=0.05))
+    scheduler.cancel(3)
+    scheduler.update(_todo(4, due_in=0.05, completed=True))
+    scheduler.update(_todo(5, due_in=-10))
+    scheduler.start()
+    try:
+        deadline = time.monotonic() + 2
+        while len(sink.events) < 2 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        time.sleep(0.05)
+    finally:
+        scheduler.stop()
+    # A falha de um sink não impede a entrega nos demais
+    assert [event["title"] for event in sink.events] == ["primeiro", "segundo"]
+    assert scheduler.fired == 2
+    # Vencidos e pendentes aparecem no índice mesmo sem lembrete; concluídos e cancelados não
+    assert scheduler.due_before(datetime.now(timezone.utc), 10) == [5, 2, 1]
+
+
+def test_reschedule_replaces_entry_and_compaction_drops_stale(monkeypatch):
+    monkeypatch.setattr(due_module, "_COMPACT_MIN_STALE", 10)
+    scheduler = DueScheduler(lead_seconds=0)
+    todo = _todo(1, due_in=3600)
+    for hours in range(2, 40):
+        todo.due_at = datetime.now(timezone.utc) + timedelta(hours=hours)
+        scheduler.update(todo)
+    assert len(scheduler._scheduled) == 1 and scheduler._stale == 37
+    # Mesma data: não gera entrada nova no heap
+    scheduler.update(todo)
+    assert len(scheduler._heap) == 38
+    scheduler._compact()
+    assert scheduler._heap == [(todo.due_at.timestamp(), scheduler._scheduled[1][1], 1)]
+
+
+def test_lead_seconds_fires_ahead_of_due_date():
+    sink = CollectingSink()
+    scheduler = DueScheduler([sink], lead_seconds=3600)
+    scheduler.update(_todo(1, due_in=3600.05))
+    scheduler.start()
+    try:
+        assert sink.delivered.wait(2)
+    finally:
+        scheduler.stop()
+
+
+def test_rebuild_uses_only_pending_dates():
+    scheduler = DueScheduler()
+    scheduler.rebuild([_todo(1, due_in=60), _todo(2, due_in=-60), _todo(3, due_in=30, completed=True), _todo(4)])
+    assert set(scheduler._scheduled) == {1}
+    assert scheduler.due_before(datetime.now(timezone.utc) + timedelta(hours=1), 10) == [2, 1]
+
+
+def test_service_keeps_due_listing_in_sync():
+    now = datetime.now(timezone.utc)
+    before = now - timedelta(days=365 * 50)
+    todo = TodoService.create_todo(Todo(title="vence", description="", due_at=(before - timedelta(days=1)).replace(tzinfo=None)))
+    assert todo.due_at.tzinfo is not None
+    assert [t.id for t in TodoService.list_due(before, 10)] == [todo.id]
+
+    TodoService.toggle_todo_status(todo.id)
+    assert TodoService.list_due(before, 10) == []
+    TodoService.toggle_todo_status(todo.id)
+    TodoService.update_todo(todo.id, Todo(title="vence", description=""))
+    assert TodoService.list_due(before, 10) == []
+    TodoService.update_todo(todo.id, Todo(title="vence", description="", due_at=before - timedelta(hours=1)))
+    assert [t.id for t in TodoService.list_due(before, 10)] == [todo.id]
+    TodoService.delete_todo(todo.id)
+    assert TodoService.list_due(before, 10) == []
@@ -0,0 +1,36 @@
+"""If-None-Match: comparação fraca, tag a tag"""
+import pytest
+
+from app.routes.todos import _etag_matches
+
+ETAG = 'W/"stats-abc-12"'
+
+
+@pytest.mark.parametrize("header", [
+    'W/"stats-abc-12"',
+    '"stats-abc-12"',
+    '"other", W/"stats-abc-12"',
+    ' W/"x" ,  "stats-abc-12" ',
+    "*",
+])
+def test_matches(header):
+    assert _etag_matches(header, ETAG)
+
+
+@pytest.mark.parametrize("header", [
+    None,
+    "",
+    'W/"stats-abc-1"',
+    'W/"stats-abc-123"',
+    '"stats-abc-12-gzip"',
+    'W/"xW/"stats-abc-12""',
+    "stats-abc-12",
+    'W/"stats-abc-1", "2"',
+])
+def test_does_not_match(header):
+    assert not _etag_matches(header, ETAG)
+
+
+def test_strong_etag():
+    assert _etag_matches('W/"v1"', '"v1"')
+    assert not _etag_matches('"v1"', '"v2"')
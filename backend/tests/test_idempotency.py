@@ -0,0 +1,152 @@
+"""Idempotency-Key: replay, conflito de corpo, duplicadas concorrentes e cliente que desiste"""
+import asyncio
+import json
+
+from app.core.idempotency import IdempotencyCache, IdempotencyMiddleware
+from app.utils.security import create_access_token
+
+TOKEN = create_access_token({"sub": "ana"})
+
+
+class Store:
+    """App ASGI mínimo: cada execução grava na 'store' e responde com o total de escritas"""
+
+    def __init__(self, statuses=()):
+        self.writes = 0
+        self.statuses = list(statuses)
+        self.gate = asyncio.Event()
+        self.gate.set()
+        self.started = asyncio.Event()
+
+    async def __call__(self, scope, receive, send):
+        await receive()
+        self.started.set()
+        status = self.statuses.pop(0) if self.statuses else 201
+        if status < 400:
+            self.writes += 1
+        await self.gate.wait()
+        body = json.dumps({"writes": self.writes}).encode()
+        await send({"type": "http.response.start", "status": status, "headers": [(b"content-type", b"application/json")]})
+        await send({"type": "http.response.body", "body": body})
+
+
+async def _call(middleware, key="k1", body=b'{"title": "x"}', path="/todos/"):
+    headers = [(b"authorization", f"Bearer {TOKEN}".encode())]
+    if key is not None:
+        headers.append((b"idempotency-key", key.encode()))
+    scope = {"type": "http", "method": "POST", "path": path, "headers": headers}
+    messages = []
+
+    async def receive():
+        return {"type": "http.request", "body": body, "more_body": False}
+
+    async def send(message):
+        messages.append(message)
+
+    await middleware(scope, receive, send)
+    start = messages[0]
+    replayed = (b"idempotent-replayed", b"true") in start["headers"]
+    return start["status"], json.loads(messages[1]["body"]), replayed
+
+
+def _middleware(app):
+    return IdempotencyMiddleware(app, cache=IdempotencyCache())
+
+
+def test_replay_after_successful_write():
+    async def scenario():
+        app = Store()
+        middleware = _middleware(app)
+        first = await _call(middleware)
+        second = await _call(middleware)
+        return app.writes, first, second
+
+    writes, first, second = asyncio.run(scenario())
+    assert writes == 1
+    assert first == (201, {"writes": 1}, False)
+    assert second == (201, {"writes": 1}, True)
+
+
+def test_same_key_with_other_body_is_rejected():
+    async def scenario():
+        app = Store()
+        middleware = _middleware(app)
+        await _call(middleware)
+        return app.writes, await _call(middleware, body=b'{"title": "y"}')
+
+    writes, (status, _, _) = asyncio.run(scenario())
+    assert writes == 1
+    assert status == 422
+
+
+def test_transient_and_unkeyed_responses_are_not_cached():
+    async def scenario():
+        app = Store(statuses=[409])
+        middleware = _middleware(app)
+        conflict = await _call(middleware)
+        retried = await _call(middleware)
+        await _call(middleware, key=None)
+        await _call(middleware, key=None)
+        return app.writes, conflict[0], retried
+
+    writes, conflict, retried = asyncio.run(scenario())
+    assert conflict == 409
+    assert retried == (201, {"writes": 1}, False)
+    assert writes == 3
+
+
+def test_concurrent_duplicates_wait_for_the_original():
+    async def scenario():
+        app = Store()
+        app.gate.clear()
+        middleware = _middleware(app)
+        calls = [asyncio.ensure_future(_call(middleware)) for _ in range(5)]
+        await app.started.wait()
+        await asyncio.sleep(0)
+        app.gate.set()
+        results = await asyncio.gather(*calls)
+        return app.writes, results
+
+    writes, results = asyncio.run(scenario())
+    assert writes == 1
+    assert sorted(replayed for _, _, replayed in results) == [False, True, True, True, True]
+
+
+def test_only_one_duplicate_takes_over_a_failed_original():
+    async def scenario():
+        app = Store(statuses=[503])
+        app.gate.clear()
+        middleware = _middleware(app)
+        original = asyncio.ensure_future(_call(middleware))
+        await app.started.wait()
+        followers = [asyncio.ensure_future(_call(middleware)) for _ in range(5)]
+        await asyncio.sleep(0.01)
+        app.gate.set()
+        results = await original, await asyncio.gather(*followers)
+        return (app.writes,) + results
+
+    writes, original, followers = asyncio.run(scenario())
+    assert original[0] == 503
+    # Um seguidor executa de novo; os outros quatro recebem a resposta dele
+    assert writes == 1
+    assert all(status == 201 and body == {"writes": 1} for status, body, _ in followers)
+    assert sorted(replayed for _, _, replayed in followers) == [False, True, True, True, True]
+
+
+def test_write_finishes_and_is_replayed_when_the_caller_gives_up():
+    async def scenario():
+        app = Store()
+        app.gate.clear()
+        middleware = _middleware(app)
+        caller = asyncio.ensure_future(_call(middleware))
+        await app.started.wait()
+        # A store já mudou; o cliente desconecta antes de a resposta começar
+        caller.cancel()
+        await asyncio.gather(caller, return_exceptions=True)
+        app.gate.set()
+        retry = await _call(middleware)
+        return app.writes, retry
+
+    writes, retry = asyncio.run(scenario())
+    assert writes == 1
+    assert retry == (201, {"writes": 1}, True)
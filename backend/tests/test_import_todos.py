@@ -0,0 +1,112 @@
+"""Importação de todos em NDJSON/CSV: erros por linha, lotes e alocação de ids"""
+import asyncio
+import gc
+import io
+import json
+import threading
+
+from app.models.todo import Todo
+from app.services import todo_service
+from app.services.todo_service import TodoService, todos_db
+from app.utils.streaming import open_text_stream
+
+
+def _ndjson(*records) -> io.StringIO:
+    return io.StringIO("".join((r if isinstance(r, str) else json.dumps(r)) + "\n" for r in records))
+
+
+def test_ndjson_reports_each_bad_line_and_imports_the_rest():
+    stream = _ndjson(
+        {"title": "ok 1", "description": "d", "completed": True},
+        "{quebrado",
+        {"title": ""},
+        "",
+        {"title": 5},
+        [1, 2],
+        {"title": "ok 2", "completed": "talvez"},
+        {"title": "x" * 201},
+        {"title": "  ok 3  ", "completed": "sim"},
+    )
+    result = TodoService.import_todos(stream, "ndjson")
+
+    assert result["imported"] == 2
+    assert result["failed"] == 6
+    assert result["errors"] == [
+        {"line": 2, "error": "JSON inválido"},
+        {"line": 3, "error": "Título do todo é obrigatório"},
+        {"line": 5, "error": "Título deve ser texto"},
+        {"line": 6, "error": "Registro deve ser um objeto"},
+        {"line": 7, "error": "Campo completed deve ser booleano"},
+        {"line": 8, "error": "Título muito longo (máximo 200 caracteres)"},
+    ]
+    imported = sorted(todos_db.values(), key=lambda t: t.id)[-2:]
+    assert [(t.title, t.completed) for t in imported] == [("ok 1", True), ("ok 3", True)]
+
+
+def test_csv_line_numbers_follow_quoted_multiline_fields():
+    stream = io.StringIO(
+        'title,description,completed\n'
+        'primeiro,"linha 1\nlinha 2",false\n'
+        ',sem título,0\n'
+        'segundo,,1\n'
+    )
+    result = TodoService.import_todos(stream, "csv")
+    assert result == {"imported": 2, "failed": 1, "errors": [{"line": 4, "error": "Título do todo é obrigatório"}]}
+
+
+def test_csv_without_title_column_fails_once():
+    result = TodoService.import_todos(io.StringIO("name,description\na,b\n"), "csv")
+    assert result == {
+        "imported": 0, "failed": 1, "errors": [{"line": 1, "error": "Cabeçalho CSV deve conter a coluna 'title'"}],
+    }
+
+
+def test_reported_errors_are_capped(monkeypatch):
+    monkeypatch.setattr(todo_service, "IMPORT_MAX_REPORTED_ERRORS", 3)
+    result = TodoService.import_todos(_ndjson(*["{"] * 10), "ndjson")
+    assert result["failed"] == 10
+    assert len(result["errors"]) == 3
+
+
+def test_batches_get_consecutive_ids_and_gc_is_restored(monkeypatch):
+    monkeypatch.setattr(todo_service, "IMPORT_BATCH_SIZE", 4)
+    assert gc.isenabled()
+    result = TodoService.import_todos(_ndjson(*({"title": f"lote {i}"} for i in range(10))), "ndjson")
+    assert result["imported"] == 10
+    assert gc.isenabled()
+    ids = sorted(t.id for t in todos_db.values() if t.title.startswith("lote "))[-10:]
+    assert ids == list(range(ids[0], ids[0] + 10))
+    assert TodoService.search_todos("lote")[0] >= 10
+
+
+def test_concurrent_creates_and_imports_never_share_ids():
+    created = []
+
+    def single():
+        for i in range(200):
+            created.append(TodoService.create_todo(Todo(title=f"single {i}", description="")).id)
+
+    def bulk():
+        for _ in range(20):
+            created.extend(t.id for t in TodoService.create_many([("bulk", "", False, [])] * 10))
+
+    threads = [threading.Thread(target=single), threading.Thread(target=bulk), threading.Thread(target=single)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(created) == len(set(created)) == 600
+    assert all(todos_db[todo_id].id == todo_id for todo_id in created)
+
+
+def test_text_stream_reads_async_body_from_a_worker_thread():
+    async def body():
+        for chunk in (b'{"title": "a"}\n{"ti', b'tle": "b"}\n', b""):
+            yield chunk
+
+    async def scenario():
+        from starlette.concurrency import run_in_threadpool
+        stream = open_text_stream(body())
+        return await run_in_threadpool(lambda: [json.loads(line)["title"] for line in stream])
+
+    assert asyncio.run(scenario()) == ["a", "b"]
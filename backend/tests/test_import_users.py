@@ -0,0 +1,53 @@
+"""CLI de importação em massa de usuários"""
+import json
+
+import pytest
+
+from app.repositories.user_repository import UserRepository
+from app.tools import import_users as tool
+from app.utils.security import verify_password
+
+
+@pytest.fixture
+def repository(monkeypatch):
+    repository = UserRepository()
+    monkeypatch.setattr(tool, "user_repository", repository)
+    return repository
+
+
+def test_csv_import_hashes_and_skips_duplicates_and_invalid(tmp_path, repository):
+    path = tmp_path / "users.csv"
+    path.write_text(
+        "username,password\n"
+        "Alice,secret1\n"
+        "bob,secret2\n"
+        "alice,outra\n"  # duplicado no arquivo (após sanitizar)
+        "x,secret3\n"  # username curto demais
+        "carol,ab\n"  # senha fraca
+        "dave,secret4\n",
+        encoding="utf-8",
+    )
+    stats = tool.import_users(str(path), "csv", workers=2, batch_size=2)
+
+    assert (stats.imported, stats.duplicates, stats.invalid) == (3, 1, 2)
+    assert [u.username for u in repository.get_all()] == ["alice", "bob", "dave"]
+    assert [u.id for u in repository.get_all()] == [1, 2, 3]
+    alice = repository.get_by_username("alice")
+    assert alice.password != "secret1"
+    assert verify_password("secret1", alice.password)
+
+
+def test_ndjson_import_skips_existing_users_and_bad_lines(tmp_path, repository):
+    path = tmp_path / "users.ndjson"
+    lines = [
+        json.dumps({"username": "erin", "password": "secret1"}),
+        "{nao é json",
+        "",
+        json.dumps({"username": "frank", "password": "secret2"}),
+    ]
+    path.write_text("\n".join(lines) + "\n", encoding="utf-8")
+    tool.import_users(str(path), "ndjson", workers=1, batch_size=10)
+
+    stats = tool.import_users(str(path), "ndjson", workers=1, batch_size=10)
+    assert (stats.imported, stats.duplicates, stats.invalid) == (0, 2, 1)
+    assert [u.username for u in repository.get_all()] == ["erin", "frank"]
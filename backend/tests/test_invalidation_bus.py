@@ -0,0 +1,65 @@
+"""Bus de invalidação: entrega entre workers, origem própria e cache de peers"""
+import os
+import socket
+import threading
+
+from app.core.invalidation_bus import InvalidationBus, UnixSocketTransport
+
+
+def _worker(directory, name, peer_refresh_ms=1000):
+    """Um 'worker' no mesmo processo: socket com nome próprio e origem distinta"""
+    transport = UnixSocketTransport(str(directory), peer_refresh_ms=peer_refresh_ms)
+    transport.path = os.path.join(str(directory), f"worker-{name}.sock")
+    bus = InvalidationBus()
+    received = []
+    arrived = threading.Event()
+
+    def handler(data):
+        received.append(data)
+        arrived.set()
+
+    bus.subscribe("evt", handler)
+    bus.start(transport)
+    bus._origin = name
+    return bus, received, arrived
+
+
+def test_publish_reaches_other_worker_only(tmp_path):
+    a, received_a, _ = _worker(tmp_path, "a")
+    b, received_b, arrived_b = _worker(tmp_path, "b")
+    try:
+        a.publish("evt", {"token": "t1"})
+        assert arrived_b.wait(2)
+        assert received_b == [{"token": "t1"}]
+        assert received_a == []
+    finally:
+        a.close()
+        b.close()
+
+
+def test_new_worker_seen_after_refresh(tmp_path):
+    a, _, _ = _worker(tmp_path, "a", peer_refresh_ms=0)
+    a._transport._peers()  # cache vazio antes do outro worker subir
+    b, received_b, arrived_b = _worker(tmp_path, "b")
+    try:
+        a.publish("evt", {"n": 1})
+        assert arrived_b.wait(2)
+        assert received_b == [{"n": 1}]
+    finally:
+        a.close()
+        b.close()
+
+
+def test_dead_peer_socket_is_removed(tmp_path):
+    # Worker que morreu sem apagar o socket: o arquivo existe mas ninguém escuta
+    dead = os.path.join(str(tmp_path), "worker-dead.sock")
+    orphan = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+    orphan.bind(dead)
+    orphan.close()
+    a, _, _ = _worker(tmp_path, "a")
+    try:
+        a.publish("evt", {})
+        assert not os.path.exists(dead)
+        assert dead not in a._transport._peers()
+    finally:
+        a.close()
@@ -0,0 +1,170 @@
+"""Conformidade do HS256Codec/JoseCodec com o python-jose"""
+import json
+import time
+
+import pytest
+
+from app.utils import security
+from app.utils.keyring import b64url_encode
+from app.utils.security import HS256Codec, JoseCodec, _jose
+
+SECRET = "test-secret-key-for-conformance"
+
+
+@pytest.fixture(params=["orjson", "json"])
+def codec(request, monkeypatch):
+    """HS256Codec com cada backend de JSON dos tokens"""
+    if request.param == "orjson":
+        pytest.importorskip("orjson")
+    dumps, loads = security._json_codec(request.param)
+    monkeypatch.setattr(security, "_json_dumps", dumps)
+    monkeypatch.setattr(security, "_json_loads", loads)
+    return HS256Codec(SECRET)
+
+
+@pytest.fixture
+def claims():
+    now = int(time.time())
+    return {"sub": "alice", "fam": "Yx1c9tQz0dM3kR2p", "gen": 3, "exp": now + 60, "iat": now, "type": "access"}
+
+
+def _forge(header: dict, payload, secret: str = SECRET) -> str:
+    """Token assinado com HMAC-SHA256 sobre cabeçalho/payload arbitrários"""
+    signing_input = b64url_encode(json.dumps(header, separators=(",", ":")).encode()) + "." + \
+        b64url_encode(json.dumps(payload, separators=(",", ":")).encode())
+    return signing_input + "." + b64url_encode(HS256Codec(secret)._sign(signing_input.encode("ascii")))
+
+
+# --- ida e volta com o python-jose ---
+
+def test_codec_token_is_byte_identical_to_jose(codec, claims):
+    assert codec.encode(claims) == _jose().jwt.encode(claims, SECRET, algorithm="HS256")
+
+
+def test_jose_decodes_codec_token(codec, claims):
+    assert _jose().jwt.decode(codec.encode(claims), SECRET, algorithms=["HS256"]) == claims
+
+
+def test_codec_decodes_jose_token(codec, claims):
+    assert codec.decode(_jose().jwt.encode(claims, SECRET, algorithm="HS256")) == claims
+
+
+def test_unicode_claims_round_trip_both_ways(codec, claims):
+    claims = dict(claims, sub="joão")
+    jose = _jose()
+    assert codec.decode(jose.jwt.encode(claims, SECRET, algorithm="HS256")) == claims
+    assert jose.jwt.decode(codec.encode(claims), SECRET, algorithms=["HS256"]) == claims
+
+
+def test_codec_accepts_other_header_serialization(codec, claims):
+    assert codec.decode(_forge({"typ": "JWT", "alg": "HS256"}, claims)) == claims
+
+
+# --- tokens recusados ---
+
+def test_rejects_tampered_signature(codec, claims):
+    header, payload, signature = codec.encode(claims).split(".")
+    flipped = ("A" if signature[0] != "A" else "B") + signature[1:]
+    assert codec.decode(f"{header}.{payload}.{flipped}") is None
+
+
+def test_rejects_tampered_payload(codec, claims):
+    header, _, signature = codec.encode(claims).split(".")
+    payload = b64url_encode(json.dumps(dict(claims, sub="mallory"), separators=(",", ":")).encode())
+    assert codec.decode(f"{header}.{payload}.{signature}") is None
+
+
+def test_rejects_other_secret(codec, claims):
+    assert codec.decode(_forge({"alg": "HS256", "typ": "JWT"}, claims, secret=SECRET + "x")) is None
+
+
+@pytest.mark.parametrize("alg", ["HS384", "HS512", "RS256", "none"])
+def test_rejects_mismatched_alg_header(codec, claims, alg):
+    # Assinatura HMAC-SHA256 válida, mas o cabeçalho declara outro algoritmo
+    assert codec.decode(_forge({"alg": alg, "typ": "JWT"}, claims)) is None
+
+
+def test_rejects_token_signed_with_other_alg(codec, claims):
+    assert codec.decode(_jose().jwt.encode(claims, SECRET, algorithm="HS512")) is None
+
+
+def test_rejects_alg_none_without_signature(codec, claims):
+    _, payload, _ = codec.encode(claims).split(".")
+    assert codec.decode(b64url_encode(b'{"alg":"none","typ":"JWT"}') + f".{payload}.") is None
+
+
+def test_rejects_expired(codec, claims):
+    assert codec.decode(codec.encode(dict(claims, exp=int(time.time()) - 1))) is None
+
+
+def test_rejects_future_nbf(codec, claims):
+    assert codec.decode(codec.encode(dict(claims, nbf=int(time.time()) + 60))) is None
+
+
+@pytest.mark.parametrize("exp", ["tomorrow", "9999999999", None, True, [1], {"at": 1}])
+def test_rejects_non_integer_exp(codec, claims, exp):
+    # exp nulo não equivale a "sem exp": o python-jose também recusa
+    assert codec.decode(codec.encode(dict(claims, exp=exp))) is None
+
+
+@pytest.mark.parametrize("claim", ["nbf", "iat"])
+def test_rejects_non_integer_time_claims(codec, claims, claim):
+    assert codec.decode(codec.encode(dict(claims, **{claim: "now"}))) is None
+
+
+@pytest.mark.parametrize("segments", [1, 2, 4, 5])
+def test_rejects_wrong_segment_count(codec, claims, segments):
+    parts = codec.encode(claims).split(".")
+    token = ".".join((parts * 2)[:segments])
+    assert codec.decode(token) is None
+
+
+@pytest.mark.parametrize("part", [0, 1, 2])
+@pytest.mark.parametrize("garbage", ["!!!!", "a", "ã", "abc$def", "===="])
+def test_rejects_bad_base64(codec, claims, part, garbage):
+    parts = codec.encode(claims).split(".")
+    parts[part] = garbage
+    assert codec.decode(".".join(parts)) is None
+
+
+@pytest.mark.parametrize("payload", [[1, 2, 3], "alice", 42, None, True])
+def test_rejects_non_object_payload(codec, payload):
+    assert codec.decode(_forge({"alg": "HS256", "typ": "JWT"}, payload)) is None
+
+
+def test_rejects_non_object_header(codec, claims):
+    _, payload, _ = codec.encode(claims).split(".")
+    header = b64url_encode(b'["HS256"]')
+    signature = b64url_encode(codec._sign(f"{header}.{payload}".encode("ascii")))
+    assert codec.decode(f"{header}.{payload}.{signature}") is None
+
+
+@pytest.mark.parametrize("token", ["", "abc", "a.b.c", None, 123])
+def test_rejects_garbage(codec, token):
+    assert codec.decode(token) is None
+
+
+# --- JoseCodec (HS384/HS512) ---
+
+@pytest.mark.parametrize("alg", ["HS384", "HS512"])
+def test_jose_codec_round_trip(claims, alg):
+    codec = JoseCodec(SECRET, alg)
+    token = codec.encode(claims)
+    assert token.split(".")[0] == codec.header
+    assert token == _jose().jwt.encode(claims, SECRET, algorithm=alg)
+    assert codec.decode(token) == claims
+
+
+@pytest.mark.parametrize("alg", ["HS384", "HS512"])
+def test_jose_codec_rejects(claims, alg):
+    codec = JoseCodec(SECRET, alg)
+    header, payload, signature = codec.encode(claims).split(".")
+    flipped = ("A" if signature[0] != "A" else "B") + signature[1:]
+    now = int(time.time())
+    assert codec.decode(f"{header}.{payload}.{flipped}") is None
+    assert codec.decode(HS256Codec(SECRET).encode(claims)) is None
+    assert codec.decode(codec.encode(dict(claims, exp=now - 1))) is None
+    assert codec.decode(codec.encode(dict(claims, nbf=now + 60))) is None
+    assert codec.decode(codec.encode(dict(claims, exp="tomorrow"))) is None
+    assert codec.decode(f"{header}.{payload}") is None
+    assert codec.decode(f"{header}.!!!!.{signature}") is None
@@ -0,0 +1,84 @@
+"""KeyRing: chave inicial única entre workers, releitura no kid desconhecido e janela de migração HS256"""
+import multiprocessing
+import os
+import time
+
+import pytest
+
+from app.utils import keyring as keyring_module
+from app.utils import security
+from app.utils.keyring import KeyRing, generate_private_key, write_private_key
+
+
+def _bootstrap_kid(directory: str, queue) -> None:
+    queue.put(KeyRing(algorithm="EdDSA", directory=directory, active_kid="").active.kid)
+
+
+def test_workers_share_the_bootstrap_key(tmp_path):
+    queue = multiprocessing.Queue()
+    workers = [multiprocessing.Process(target=_bootstrap_kid, args=(str(tmp_path), queue)) for _ in range(4)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join(timeout=30)
+    kids = {queue.get(timeout=5) for _ in workers}
+    assert kids == {"eddsa-bootstrap"}
+    assert sorted(os.listdir(tmp_path)) == ["eddsa-bootstrap.pem"]
+
+
+def test_write_private_key_refuses_existing_kid(tmp_path):
+    write_private_key(str(tmp_path), "k1", generate_private_key("EdDSA"))
+    with pytest.raises(FileExistsError):
+        write_private_key(str(tmp_path), "k1", generate_private_key("EdDSA"))
+    assert os.listdir(tmp_path) == ["k1.pem"]
+
+
+def test_unknown_kid_reloads_directory_rate_limited(tmp_path, monkeypatch):
+    monkeypatch.setattr(keyring_module, "JWT_KEYS_RELOAD_SECONDS", 60)
+    ring = KeyRing(algorithm="EdDSA", directory=str(tmp_path), active_kid="")
+    assert ring.active.kid == "eddsa-bootstrap"
+
+    # Rotação feita por outro processo depois do carregamento
+    KeyRing(algorithm="EdDSA", directory=str(tmp_path), active_kid="").rotate()
+    rotated = next(name[:-len(".pem")] for name in os.listdir(tmp_path) if name != "eddsa-bootstrap.pem")
+    ring._last_reload = time.monotonic() - 61
+    assert ring.get(rotated) is not None
+
+    KeyRing(algorithm="EdDSA", directory=str(tmp_path), active_kid="").rotate()
+    newest = next(name[:-len(".pem")] for name in os.listdir(tmp_path) if name[:-len(".pem")] not in ring._keys)
+    # Releu há pouco: kid desconhecido não relê de novo até passar o intervalo
+    assert ring.get("unknown") is None
+    assert ring.get(newest) is None
+    ring._last_reload = time.monotonic() - 61
+    assert ring.get(newest) is not None
+
+
+@pytest.fixture
+def asymmetric(tmp_path, monkeypatch):
+    ring = KeyRing(algorithm="EdDSA", directory=str(tmp_path), active_kid="")
+    monkeypatch.setattr(security, "keyring", ring)
+    return ring
+
+
+def _legacy_token() -> str:
+    now = int(time.time())
+    claims = {"sub": "alice", "exp": now + 60, "iat": now, "type": "access"}
+    return security._jose().jwt.encode(claims, security.SECRET_KEY, algorithm="HS256")
+
+
+def test_asymmetric_mode_rejects_kidless_tokens_without_migration_window(asymmetric, monkeypatch):
+    monkeypatch.setattr(security, "_legacy_hs256_until", None)
+    assert security._decode_jwt(_legacy_token()) is None
+
+
+def test_asymmetric_mode_accepts_kidless_tokens_until_cutoff(asymmetric, monkeypatch):
+    monkeypatch.setattr(security, "_legacy_hs256_until", time.time() + 3600)
+    assert security._decode_jwt(_legacy_token())["sub"] == "alice"
+    monkeypatch.setattr(security, "_legacy_hs256_until", security._parse_cutoff("2000-01-01T00:00:00"))
+    assert security._decode_jwt(_legacy_token()) is None
+
+
+def test_asymmetric_tokens_round_trip(asymmetric):
+    now = int(time.time())
+    token = security._encode_jwt({"sub": "alice", "exp": now + 60, "iat": now, "type": "access"})
+    assert security._decode_jwt(token)["sub"] == "alice"
@@ -0,0 +1,110 @@
+"""Manutenção em segundo plano: cursor retomável sobre a estrutura viva e a varredura de cada estrutura"""
+import time
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+from app.core import admission  # noqa: F401  registra login_backoff
+from app.core.idempotency import IdempotencyCache, _Entry
+from app.core.maintenance import MaintenanceScheduler, maintenance
+from app.core.security import RateLimiter, SecurityManager
+from app.repositories.session_repository import SessionRepository
+from app.services import user_service  # noqa: F401  registra user_locks
+from app.utils import security as security_utils
+from app.utils.security import purge_revoked_tokens
+
+
+def _store(n: int) -> dict:
+    return {f"k{i}": (i % 2 == 0) for i in range(n)}
+
+
+def _sweeper(store: dict):
+    def sweep(batch) -> int:
+        removed = 0
+        for key in batch:
+            if store.get(key):
+                del store[key]
+                removed += 1
+        return removed
+    return sweep
+
+
+def test_slice_work_is_bounded_by_the_batch():
+    store = _store(10_000)
+    scheduler = MaintenanceScheduler(budget_ms=0, batch_size=100)
+    scheduler.register("store", store.keys, _sweeper(store))
+    task = scheduler._tasks["store"]
+    assert scheduler.run_slice(task) is False
+    assert task.visited == 100
+    assert scheduler.run_slice(task) is False
+    assert task.visited == 200
+
+
+def test_sweep_survives_concurrent_mutation():
+    store = _store(10_000)
+    scheduler = MaintenanceScheduler(budget_ms=0, batch_size=256)
+    scheduler.register("store", store.keys, _sweeper(store))
+    task = scheduler._tasks["store"]
+    added = 0
+    while not scheduler.run_slice(task):
+        # Escritas entre fatias invalidam o iterador; a varredura deve retomar, não recomeçar
+        store[f"new{added}"] = False
+        added += 1
+    assert not any(store.values())
+    assert len(store) == 5_000 + added
+    assert task.reclaimed == 5_000
+    assert task.cursor is None
+
+
+def test_structures_register_their_sweeps():
+    assert {"login_backoff", "rate_limiter", "token_blacklist", "sessions", "idempotency_cache", "user_locks"} <= set(
+        maintenance._tasks
+    )
+
+
+def test_rate_limiter_purges_keys_outside_every_window():
+    limiter = RateLimiter()
+    limiter.check_limit("velho", 5, 1)
+    limiter.check_limit("novo", 5, 1)
+    limiter._storage["velho"] = [time.time() - 120]
+    assert limiter.purge_stale(["velho", "novo", "sumiu"]) == 1
+    assert list(limiter.keys()) == ["novo"]
+
+
+def test_revoked_tokens_leave_the_blacklist_after_expiring(monkeypatch):
+    blacklist = {"vencido": time.time() - 1, "valido": time.time() + 60}
+    monkeypatch.setattr(security_utils, "token_blacklist", blacklist)
+    assert purge_revoked_tokens(["vencido", "valido", "sumiu"]) == 1
+    assert list(blacklist) == ["valido"]
+
+
+def test_idempotency_sweep_keeps_requests_in_flight():
+    cache = IdempotencyCache(ttl_seconds=60)
+    for key, expires, response in [("vencida", -1, (200, [], b"")), ("em andamento", -1, None), ("valida", 60, (200, [], b""))]:
+        entry = _Entry("fp", time.monotonic() + expires, None)
+        entry.response = response
+        cache._entries[("ana", key)] = entry
+    assert cache.purge_expired([("ana", "vencida"), ("ana", "em andamento")]) == 1
+    assert cache.purge_expired() == 0
+    assert [key for _, key in cache.keys()] == ["em andamento", "valida"]
+
+
+def test_session_sweep_only_touches_the_batch():
+    repository = SessionRepository(ttl_seconds=60)
+    first, _ = repository.create("ana")
+    second, _ = repository.create("ana")
+    third, _ = repository.create("bia")
+    for family_id in (first, second, third):
+        repository._families[family_id].expires_at = int(time.time()) - 1
+    assert repository.purge_expired([first, third]) == 2
+    assert list(repository.family_ids()) == [second]
+    assert repository._by_username == {"ana": {second}}
+    assert repository.purge_expired() == 1 and len(repository) == 0
+
+
+def test_expired_account_locks_are_cleared():
+    past = SimpleNamespace(locked_until=datetime.utcnow() - timedelta(seconds=1), failed_login_attempts=3)
+    future = SimpleNamespace(locked_until=datetime.utcnow() + timedelta(minutes=5), failed_login_attempts=10)
+    manager = SecurityManager()
+    assert manager.clear_expired_lock(past) and past.locked_until is None
+    assert past.failed_login_attempts == 3
+    assert not manager.clear_expired_lock(future) and future.locked_until is not None
@@ -0,0 +1,76 @@
+"""Contabilidade de memória: tamanho profundo, estimativa por amostra, limites suaves e tracemalloc"""
+import sys
+
+from app.core.memory import MemoryRegistry, TracemallocSnapshots, _estimate, _parse_limits, deep_sizeof
+from app.core.metrics import Metrics
+
+
+class Slotted:
+    __slots__ = ("payload",)
+
+    def __init__(self, payload):
+        self.payload = payload
+
+
+def test_deep_sizeof_follows_containers_and_slots():
+    payload = "x" * 1000
+    assert deep_sizeof([payload]) == sys.getsizeof([payload]) + sys.getsizeof(payload)
+    slotted = Slotted(payload)
+    assert deep_sizeof(slotted) == sys.getsizeof(slotted) + sys.getsizeof(payload)
+    # Objetos compartilhados contam uma vez
+    assert deep_sizeof([payload, payload]) == sys.getsizeof([payload, payload]) + sys.getsizeof(payload)
+
+
+def test_estimate_is_exact_when_small_and_close_when_sampled():
+    data = {i: "v" * 50 for i in range(1000)}
+    exact = _estimate(data, sample_size=10_000)
+    sampled = _estimate(data, sample_size=100)
+    assert exact["estimated"] is False and sampled["estimated"] is True
+    assert exact["entries"] == sampled["entries"] == 1000
+    assert abs(sampled["deep_bytes"] - exact["deep_bytes"]) / exact["deep_bytes"] < 0.1
+
+
+def test_parse_limits_ignores_malformed_items():
+    assert _parse_limits("a=10, b = 20,c=x,=5,d") == {"a": 10, "b": 20}
+
+
+def test_soft_limit_warns_once_per_crossing(monkeypatch):
+    from app.core import memory
+    fresh = Metrics()
+    monkeypatch.setattr(memory, "metrics", fresh)
+    items = []
+    registry = MemoryRegistry(soft_limits="items=2")
+    registry.register("items", lambda: items)
+    registry.register("other", lambda: {}, soft_limit=1)
+
+    items.extend([1, 2, 3])
+    assert registry.check_limits() == ["items"]
+    assert registry.check_limits() == ["items"]
+    items.clear()
+    assert registry.check_limits() == []
+    items.extend([1, 2, 3])
+    registry.check_limits()
+
+    counters = {(c["name"], c["labels"].get("structure")): c["value"] for c in fresh.snapshot()["counters"]}
+    assert counters == {("memory_soft_limit_exceeded_total", "items"): 2}
+    report = registry.report()
+    assert report["structures"]["items"]["soft_limit"] == 2
+    assert report["structures"]["other"]["entries"] == 0
+
+
+def test_tracemalloc_snapshots_diff_and_stop():
+    snapshots = TracemallocSnapshots(max_snapshots=2)
+    try:
+        first = snapshots.take(top=5)
+        assert first["tracing_started"] is True
+        retained = [bytearray(1024) for _ in range(200)]
+        second = snapshots.take(top=5)
+        diff = snapshots.diff(first["id"], second["id"], top=5)
+        assert diff["size_diff_bytes"] > 200 * 1024
+        snapshots.take()
+        assert snapshots.list_ids() == [second["id"], second["id"] + 1]
+        assert snapshots.diff(first["id"], second["id"]) is None
+        del retained
+    finally:
+        snapshots.stop()
+    assert snapshots.list_ids() == []
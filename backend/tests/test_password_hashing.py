@@ -0,0 +1,108 @@
+"""Custo do hash de senha: calibração, falhas de verificação e regravação do hash no login"""
+import asyncio
+import hashlib
+from datetime import datetime
+
+import pytest
+from fastapi import BackgroundTasks
+
+from app.core.metrics import Metrics
+from app.models.user import UserInDB
+from app.repositories.async_repository import AsyncUserRepositoryAdapter
+from app.repositories.user_repository import UserRepository
+from app.services import auth_service
+from app.services.auth_service import AuthService
+from app.utils import security
+from app.utils.security import (
+    configure_password_hashing, hash_password, password_hash_rounds, password_needs_update, verify_password,
+)
+
+PASSWORD = "Senha-Forte-1"
+
+
+@pytest.fixture
+def fresh_metrics(monkeypatch):
+    fresh = Metrics()
+    monkeypatch.setattr(security, "metrics", fresh)
+    monkeypatch.setattr(auth_service, "metrics", fresh)
+    return fresh
+
+
+@pytest.fixture
+def hashing(monkeypatch):
+    """Custo trocado pelo teste volta ao original no fim"""
+    monkeypatch.setattr(security, "_pwd_context", security._pwd_context)
+    monkeypatch.setattr(security, "_pwd_rounds", security._pwd_rounds)
+    configure_password_hashing(8)
+
+
+@pytest.fixture
+def users(monkeypatch):
+    repository = UserRepository()
+    monkeypatch.setattr(auth_service, "user_repository", repository)
+    monkeypatch.setattr(auth_service, "async_user_repository", AsyncUserRepositoryAdapter(repository))
+    return repository
+
+
+def _counter(metrics, name):
+    return sum(c["value"] for c in metrics.snapshot()["counters"] if c["name"] == name)
+
+
+def _login(password=PASSWORD):
+    background_tasks = BackgroundTasks()
+
+    async def scenario():
+        user = await AuthService.authenticate_user("maria", password, background_tasks)
+        await background_tasks()
+        return user
+
+    return asyncio.run(scenario()), background_tasks
+
+
+def _create(users, hashed):
+    return users.create(UserInDB(username="maria", password=hashed, created_at=datetime.utcnow()))
+
+
+def test_login_rehashes_after_the_cost_goes_up(hashing, users, fresh_metrics):
+    old_hash = _create(users, hash_password(PASSWORD)).password
+    configure_password_hashing(9)
+    assert password_hash_rounds() == 9 and password_needs_update(old_hash)
+
+    user, background_tasks = _login()
+    assert user is not None and len(background_tasks.tasks) == 1
+    stored = users.get_by_username("maria").password
+    assert stored != old_hash and "$2b$09$" in stored
+    assert not password_needs_update(stored) and verify_password(PASSWORD, stored)
+    assert _counter(fresh_metrics, "password_rehash_total") == 1
+
+    # Já no custo atual: nada a regravar
+    assert len(_login()[1].tasks) == 0
+
+
+def test_legacy_sha256_hash_is_upgraded_on_login(hashing, users, fresh_metrics):
+    _create(users, hashlib.sha256(PASSWORD.encode()).hexdigest())
+    assert _login()[0] is not None
+    assert users.get_by_username("maria").password.startswith("$2b$08$")
+
+
+def test_wrong_password_does_not_rehash(hashing, users):
+    old_hash = _create(users, hash_password(PASSWORD)).password
+    configure_password_hashing(9)
+    user, background_tasks = _login("Senha-Errada-1")
+    assert user is None and len(background_tasks.tasks) == 0
+    assert users.get_by_username("maria").password == old_hash
+
+
+def test_rehash_keeps_a_password_changed_in_the_meantime(hashing, users):
+    user = _create(users, hash_password(PASSWORD))
+    old_hash = user.password
+    user.password = hash_password("Outra-Senha-2")
+    assert not AuthService.rehash_password("maria", old_hash, PASSWORD)
+    assert users.get_by_username("maria").password == user.password
+
+
+def test_verification_errors_are_logged_and_counted(hashing, fresh_metrics, caplog):
+    assert verify_password(PASSWORD, "nao-e-um-hash") is False
+    assert _counter(fresh_metrics, "password_verification_errors_total") == 1
+    assert _counter(fresh_metrics, "password_verifications_total") == 1
+    assert any(record.levelname == "WARNING" for record in caplog.records if record.name == "security")
@@ -0,0 +1,122 @@
+"""Journal + snapshot: restauração, recuperação após crash e escritor único"""
+import os
+
+import pytest
+
+from app.repositories.persistence import PersistenceLocked, PersistenceManager
+
+
+class DictStore:
+    """Store mínima no protocolo do PersistenceManager"""
+
+    def __init__(self):
+        self.items = {}
+
+    def snapshot_state(self):
+        return {"size": len(self.items)}, [f"{k}={v}".encode() for k, v in self.items.items()]
+
+    def restore_state(self, meta, records):
+        self.items = dict(record.decode().split("=", 1) for record in records)
+
+    def replay(self, op, data):
+        if op == "put":
+            key, value = data.decode().split("=", 1)
+            self.items[key] = value
+        elif op == "delete":
+            self.items.pop(data.decode(), None)
+
+
+def _manager(directory) -> "tuple[PersistenceManager, DictStore]":
+    manager = PersistenceManager(str(directory))
+    store = DictStore()
+    manager.register("kv", store)
+    return manager, store
+
+
+def _put(manager, store, key, value):
+    store.items[key] = value
+    manager.record("kv", "put", f"{key}={value}".encode())
+
+
+def _segments(directory):
+    return sorted(name for name in os.listdir(directory) if name.startswith("journal-"))
+
+
+def test_journal_replays_after_restart(tmp_path):
+    manager, store = _manager(tmp_path)
+    manager.start()
+    _put(manager, store, "a", "1")
+    _put(manager, store, "b", "2")
+    store.items.pop("a")
+    manager.record("kv", "delete", "a")
+    manager.stop()
+
+    restarted, restored = _manager(tmp_path)
+    restarted.start()
+    try:
+        assert restored.items == {"b": "2"}
+    finally:
+        restarted.stop()
+
+
+def test_truncated_last_record_is_dropped(tmp_path):
+    manager, store = _manager(tmp_path)
+    manager.start()
+    for i in range(10):
+        _put(manager, store, f"k{i}", str(i))
+    manager.stop()
+
+    # Crash no meio da escrita do último registro
+    segment = os.path.join(tmp_path, _segments(tmp_path)[-1])
+    with open(segment, "r+b") as f:
+        f.truncate(os.path.getsize(segment) - 3)
+
+    restarted, restored = _manager(tmp_path)
+    restarted.start()
+    try:
+        assert restored.items == {f"k{i}": str(i) for i in range(9)}
+        # Novas escritas vão para um segmento novo, depois do registro truncado
+        _put(restarted, restored, "k9", "again")
+    finally:
+        restarted.stop()
+
+    again, final = _manager(tmp_path)
+    again.start()
+    try:
+        assert final.items["k9"] == "again" and len(final.items) == 10
+    finally:
+        again.stop()
+
+
+def test_replay_after_snapshot_and_rotation(tmp_path):
+    manager, store = _manager(tmp_path)
+    manager.start()
+    _put(manager, store, "before", "1")
+    _put(manager, store, "changed", "old")
+    manager.snapshot()
+    # O snapshot cobre e apaga os segmentos selados
+    assert len(_segments(tmp_path)) == 1
+    _put(manager, store, "after", "2")
+    _put(manager, store, "changed", "new")
+    manager.stop()
+
+    restarted, restored = _manager(tmp_path)
+    restarted.start()
+    try:
+        assert restored.items == {"before": "1", "changed": "new", "after": "2"}
+    finally:
+        restarted.stop()
+
+
+def test_second_process_cannot_share_the_directory(tmp_path):
+    first, _ = _manager(tmp_path)
+    first.start()
+    second, _ = _manager(tmp_path)
+    try:
+        with pytest.raises(PersistenceLocked):
+            second.start()
+        assert not second.enabled
+    finally:
+        first.stop()
+    second.start()
+    second.stop()
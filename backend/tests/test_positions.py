@@ -0,0 +1,117 @@
+"""Ordenação manual: chaves fracionárias, índice ordenado em blocos, moves e rebalanceamento"""
+import random
+
+import pytest
+
+from app.models.todo import Todo
+from app.services import position_index as position_module
+from app.services.position_index import position_index
+from app.services.todo_service import TodoService
+from app.utils.fractional_index import FIRST_KEY, key_between, keys_between, validate_key
+from app.utils.ordered_index import OrderedIndex
+
+
+def test_key_between_stays_strictly_between_neighbours():
+    rng = random.Random(44)
+    keys = [FIRST_KEY]
+    for _ in range(2000):
+        slot = rng.randrange(len(keys) + 1)
+        low = keys[slot - 1] if slot > 0 else None
+        high = keys[slot] if slot < len(keys) else None
+        key = key_between(low, high)
+        validate_key(key)
+        assert (low is None or low < key) and (high is None or key < high)
+        keys.insert(slot, key)
+    assert keys == sorted(set(keys))
+
+
+def test_keys_between_are_sorted_and_short():
+    for low, high in [(None, None), ("a0", None), (None, "a0"), ("a0", "a1"), ("a0V", "a0k")]:
+        keys = keys_between(low, high, 500)
+        assert keys == sorted(set(keys))
+        assert (low is None or low < keys[0]) and (high is None or keys[-1] < high)
+        assert max(map(len, keys)) <= 8
+
+
+@pytest.mark.parametrize("low, high", [("a1", "a0"), ("a0", "a0"), ("a00", None), ("", None)])
+def test_invalid_keys_are_rejected(low, high):
+    with pytest.raises(ValueError):
+        key_between(low, high)
+
+
+def test_ordered_index_matches_sorted_reference():
+    rng = random.Random(4)
+    index = OrderedIndex()
+    index.BLOCK_SIZE = 8
+    reference = {}
+    for _ in range(3000):
+        item_id = rng.randrange(300)
+        key = rng.choice([None, rng.randrange(1000)])
+        index.set(item_id, key)
+        if key is None:
+            reference.pop(item_id, None)
+        else:
+            reference[item_id] = key
+    ordered = sorted((key, item_id) for item_id, key in reference.items())
+    assert len(index) == len(reference)
+    assert list(index.entries()) == ordered
+    assert list(index.entries(10, 25)) == ordered[10:25]
+    assert index.below(500, 10) == [item_id for key, item_id in ordered if key < 500][:10]
+    for rank, (key, item_id) in enumerate(ordered):
+        assert index.rank(item_id) == rank
+        previous, following = index.neighbors(item_id)
+        assert previous == (ordered[rank - 1] if rank > 0 else None)
+        assert following == (ordered[rank + 1] if rank + 1 < len(ordered) else None)
+
+    index.extend([(2000 + i, 1000 + i) for i in range(20)])
+    assert index.last() == (2019, 1019)
+    with pytest.raises(ValueError):
+        index.extend([(0, 5000)])
+
+
+def _order(ids):
+    wanted = set(ids)
+    return [todo.id for todo in TodoService.list_todos() if todo.id in wanted]
+
+
+def test_moves_between_neighbours_and_to_the_ends():
+    a, b, c, d = (TodoService.create_todo(Todo(title=name, description="")).id for name in "abcd")
+    assert _order([a, b, c, d]) == [a, b, c, d]
+
+    TodoService.move_todo(d, a, b)
+    assert _order([a, b, c, d]) == [a, d, b, c]
+    TodoService.move_todo(a, c, None)
+    assert _order([a, b, c, d]) == [d, b, c, a]
+    TodoService.move_todo(c, None, d)
+    assert _order([a, b, c, d]) == [c, d, b, a]
+    # Update não mexe na posição
+    TodoService.update_todo(b, Todo(title="b2", description="", position="a0"))
+    assert _order([a, b, c, d]) == [c, d, b, a]
+
+    with pytest.raises(ValueError):
+        TodoService.move_todo(a, a, None)
+    with pytest.raises(ValueError):
+        TodoService.move_todo(a, b, c)
+    with pytest.raises(ValueError):
+        TodoService.move_todo(a, 10**9, None)
+    assert _order([a, b, c, d]) == [c, d, b, a]
+    assert TodoService.move_todo(10**9, a, None) is None
+
+
+def test_repeated_moves_into_one_gap_trigger_rebalance(monkeypatch):
+    monkeypatch.setattr(position_module, "POSITION_KEY_MAX_LENGTH", 6)
+    ids = [TodoService.create_todo(Todo(title=f"r{i}", description="")).id for i in range(40)]
+    expected = list(ids)
+    # Sempre logo depois do primeiro: o vão entre os dois primeiros é dividido a cada move
+    for moved in ids[-20:]:
+        TodoService.move_todo(moved, ids[0], None)
+        expected.remove(moved)
+        expected.insert(1, moved)
+    assert _order(ids) == expected
+    assert TodoService.positions_need_rebalance()
+
+    assert TodoService.rebalance_positions() > 0
+    assert not TodoService.positions_need_rebalance()
+    assert _order(ids) == expected
+    assert all(len(TodoService.get_todo(todo_id).position) <= 6 for todo_id in ids)
+    assert list(position_index.index.entries()) == sorted(position_index.index.entries())
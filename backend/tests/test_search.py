@@ -0,0 +1,91 @@
+"""Busca textual: índice invertido incremental e TodoService"""
+import threading
+
+from app.models.todo import Todo
+from app.services.search_index import TodoSearchIndex, normalize_text, tokenize
+from app.services.todo_service import TodoService, todos_db
+
+
+def _todo(todo_id: int, title: str, description: str = "") -> Todo:
+    return Todo(id=todo_id, title=title, description=description)
+
+
+def _ids(index: TodoSearchIndex, query: str, offset: int = 0, limit: int = 20):
+    total, hits = index.search(query, offset, limit)
+    return total, [todo_id for todo_id, _ in hits]
+
+
+def test_tokenize_folds_accents_and_case():
+    assert normalize_text("Ação RÁPIDA") == "acao rapida"
+    assert tokenize("Revisar relatório, já!") == ["revisar", "relatorio", "ja"]
+    assert tokenize("") == []
+
+
+def test_title_outweighs_description():
+    index = TodoSearchIndex()
+    index.add(_todo(1, "comprar pão", "mercado"))
+    index.add(_todo(2, "mercado", "comprar leite"))
+    assert _ids(index, "comprar") == (2, [1, 2])
+    assert _ids(index, "mercado") == (2, [2, 1])
+
+
+def test_all_terms_must_match_and_prefix_ranks_below_exact():
+    index = TodoSearchIndex()
+    index.add(_todo(1, "relatorio mensal"))
+    index.add(_todo(2, "relatorios anuais"))
+    index.add(_todo(3, "relatorio", "anual"))
+    assert _ids(index, "relatorio") == (3, [1, 3, 2])
+    assert _ids(index, "relatorio anua") == (2, [2, 3])
+    assert _ids(index, "inexistente") == (0, [])
+    assert _ids(index, "!!!") == (0, [])
+
+
+def test_update_and_remove_keep_the_index_in_sync():
+    index = TodoSearchIndex()
+    index.add(_todo(1, "pagar conta de luz"))
+    index.update(_todo(1, "pagar conta de água"))
+    assert _ids(index, "luz") == (0, [])
+    assert _ids(index, "agua") == (1, [1])
+    index.remove(1)
+    assert _ids(index, "pagar") == (0, [])
+    # Termos sem postings saem do vocabulário
+    assert index._vocabulary == []
+
+
+def test_pagination():
+    index = TodoSearchIndex()
+    for todo_id in range(1, 26):
+        index.add(_todo(todo_id, "tarefa"))
+    total, first = _ids(index, "tarefa", 0, 10)
+    _, last = _ids(index, "tarefa", 20, 10)
+    assert total == 25 and first == list(range(1, 11)) and last == list(range(21, 26))
+
+
+def test_service_keeps_search_in_sync_and_never_reuses_ids():
+    first = TodoService.create_todo(Todo(title="zebra listrada", description=""))
+    assert TodoService.delete_todo(first.id)
+    second = TodoService.create_todo(Todo(title="zebra malhada", description=""))
+    assert second.id > first.id
+    total, todos = TodoService.search_todos("zebra")
+    assert [todo.id for todo in todos] == [second.id]
+    TodoService.update_todo(second.id, Todo(title="girafa", description=""))
+    assert TodoService.search_todos("zebra") == (0, [])
+    TodoService.delete_todo(second.id)
+
+
+def test_concurrent_creates_get_distinct_ids():
+    created = []
+
+    def worker():
+        for _ in range(200):
+            created.append(TodoService.create_todo(Todo(title="concorrente", description="")).id)
+
+    threads = [threading.Thread(target=worker) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(set(created)) == 1600
+    assert all(todo_id in todos_db for todo_id in created)
+    for todo_id in created:
+        TodoService.delete_todo(todo_id)
@@ -0,0 +1,90 @@
+"""Famílias de refresh tokens: rotação, detecção de reuso e revogação"""
+import time
+
+import pytest
+
+from app.models.user import UserInDB
+from app.repositories.session_repository import SessionRepository
+from app.services import auth_service as auth_module
+from app.services.auth_service import auth_service
+from app.utils.security import decode_access_token, decode_refresh_token
+
+
+@pytest.fixture
+def sessions(monkeypatch):
+    repository = SessionRepository(ttl_seconds=3600)
+    monkeypatch.setattr(auth_module, "session_repository", repository)
+    return repository
+
+
+def _user(username="ana") -> UserInDB:
+    return UserInDB(id=1, username=username, password="x", created_at="2024-01-01T00:00:00", is_active=True)
+
+
+def test_rotation_advances_generation(sessions):
+    family_id, generation = sessions.create("ana")
+    assert generation == 0
+    assert sessions.rotate(family_id, 0) == 1
+    assert sessions.rotate(family_id, 1) == 2
+    assert sessions.is_active(family_id)
+
+
+def test_reusing_old_generation_revokes_whole_family(sessions):
+    family_id, _ = sessions.create("ana")
+    assert sessions.rotate(family_id, 0) == 1
+    # O token da geração 0 reaparece: alguém o copiou
+    assert sessions.rotate(family_id, 0) is None
+    assert not sessions.is_active(family_id)
+    # Nem o portador legítimo da geração atual consegue rotacionar
+    assert sessions.rotate(family_id, 1) is None
+
+
+def test_expired_family_cannot_rotate(sessions):
+    family_id, _ = sessions.create("ana")
+    sessions._families[family_id].expires_at = int(time.time()) - 1
+    assert sessions.rotate(family_id, 0) is None
+    assert len(sessions) == 0
+
+
+def test_revoke_user_ends_every_family(sessions):
+    first, _ = sessions.create("ana")
+    second, _ = sessions.create("ana")
+    other, _ = sessions.create("bia")
+    assert sessions.revoke_user("ana") == 2
+    assert not sessions.is_active(first) and not sessions.is_active(second)
+    assert sessions.is_active(other)
+    assert "ana" not in sessions._by_username
+
+
+def test_purge_expired(sessions):
+    stale, _ = sessions.create("ana")
+    fresh, _ = sessions.create("ana")
+    sessions._families[stale].expires_at = int(time.time()) - 1
+    assert sessions.purge_expired() == 1
+    assert not sessions.is_active(stale)
+    assert sessions.is_active(fresh)
+
+
+def test_snapshot_restore_round_trip(sessions):
+    family_id, _ = sessions.create("ana")
+    sessions.rotate(family_id, 0)
+    meta, records = sessions.snapshot_state()
+    restored = SessionRepository()
+    restored.restore_state(meta, list(records))
+    assert restored.rotate(family_id, 1) == 2
+
+
+def test_tokens_rotate_through_auth_service(sessions):
+    tokens = auth_service.create_tokens_for_user(_user())
+    payload = decode_refresh_token(tokens.refresh_token)
+    assert decode_access_token(tokens.access_token)["fam"] == payload["fam"]
+
+    session = auth_service.rotate_session(payload)
+    assert session == (payload["fam"], 1)
+    rotated = decode_refresh_token(auth_service.create_tokens_for_user(_user(), session).refresh_token)
+    assert rotated["gen"] == 1
+
+    # Replay do refresh antigo derruba a família, inclusive o token novo
+    assert auth_service.rotate_session(payload) is None
+    assert auth_service.rotate_session(rotated) is None
+    assert not sessions.is_active(payload["fam"])
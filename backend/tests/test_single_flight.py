@@ -0,0 +1,53 @@
+"""SingleFlight: execução compartilhada entre threads e recusa no event loop"""
+import asyncio
+import threading
+import time
+
+import pytest
+
+from app.core.single_flight import SingleFlight
+
+
+def test_concurrent_calls_share_one_execution():
+    flight = SingleFlight("test", timeout=5)
+    started = threading.Event()
+    calls = []
+
+    def compute():
+        calls.append(1)
+        started.set()
+        time.sleep(0.1)
+        return "result"
+
+    results = []
+    leader = threading.Thread(target=lambda: results.append(flight.do("k", compute)))
+    leader.start()
+    started.wait()
+    followers = [threading.Thread(target=lambda: results.append(flight.do("k", compute))) for _ in range(4)]
+    for thread in followers:
+        thread.start()
+    for thread in [leader] + followers:
+        thread.join()
+    assert results == ["result"] * 5
+    assert len(calls) == 1
+    assert flight.stats()["shared"] == 4
+
+
+def test_refuses_to_block_the_event_loop():
+    flight = SingleFlight("test")
+
+    async def handler():
+        return flight.do("k", lambda: "result")
+
+    with pytest.raises(RuntimeError):
+        asyncio.run(handler())
+
+
+def test_runs_from_the_threadpool():
+    from starlette.concurrency import run_in_threadpool
+    flight = SingleFlight("test")
+
+    async def handler():
+        return await run_in_threadpool(flight.do, "k", lambda: "result")
+
+    assert asyncio.run(handler()) == "result"
@@ -0,0 +1,119 @@
+"""Cold start: admin semeado em background, readiness e profiler de inicialização"""
+import asyncio
+import threading
+
+import pytest
+
+from app.core import startup
+from app.core.startup_profiler import Readiness, StartupTimer
+from app.models.user import UserCreate
+from app.repositories.async_repository import AsyncUserRepositoryAdapter
+from app.repositories.user_repository import UserRepository
+from app.services import user_service
+from app.services.user_service import UserService
+from app.utils.security import verify_password
+
+
+@pytest.fixture
+def users(monkeypatch):
+    repository = UserRepository()
+    monkeypatch.setattr(startup, "user_repository", repository)
+    monkeypatch.setattr(user_service, "user_repository", repository)
+    monkeypatch.setattr(user_service, "async_user_repository", AsyncUserRepositoryAdapter(repository))
+    return repository
+
+
+@pytest.fixture
+def gate(monkeypatch):
+    readiness = Readiness()
+    monkeypatch.setattr(startup, "readiness", readiness)
+    return readiness
+
+
+def test_precomputed_admin_hash_matches_the_test_password(users, gate, monkeypatch):
+    monkeypatch.setattr(startup, "ADMIN_PASSWORD", None)
+    monkeypatch.setattr(startup, "ADMIN_PASSWORD_HASH", startup.ADMIN_PASSWORD_HASH or "")
+    startup.init_test_environment()
+    admin = users.get_by_username("admin")
+    assert admin is not None and verify_password("TestAdmin123!", admin.password)
+    assert gate.is_ready
+
+
+def test_admin_name_is_reserved_while_seeding_in_background(users, gate, monkeypatch):
+    release = threading.Event()
+    seeded = threading.Event()
+    monkeypatch.setattr(startup, "ADMIN_PASSWORD", "Outra-Senha-123")
+    monkeypatch.setattr(startup, "ADMIN_PASSWORD_HASH", "")
+
+    def slow_hash(password):
+        release.wait(5)
+        return "hash-" + password
+
+    def seed():
+        original()
+        seeded.set()
+
+    original = startup._seed_admin_deferred
+    monkeypatch.setattr(startup, "get_password_hash", slow_hash)
+    monkeypatch.setattr(startup, "_seed_admin_deferred", seed)
+    startup.init_test_environment()
+
+    # Durante o hash: readiness bloqueado e "admin" indisponível para cadastro
+    assert gate.pending == ["admin_seed"]
+    with pytest.raises(ValueError):
+        asyncio.run(UserService.create_user(UserCreate(username="admin", password="Senha-Qualquer-1")))
+
+    release.set()
+    assert seeded.wait(5)
+    assert gate.is_ready
+    admins = [user for user in users.get_all() if user.username == "admin"]
+    assert len(admins) == 1 and admins[0].password == "hash-Outra-Senha-123"
+
+
+def test_create_admin_fails_when_the_user_exists(users):
+    startup._create_admin("first-hash")
+    with pytest.raises(ValueError):
+        startup._create_admin("second-hash")
+    assert [user.password for user in users.get_all()] == ["first-hash"]
+
+
+def test_repository_rejects_duplicate_usernames_under_concurrency(users):
+    from datetime import datetime
+    from app.models.user import UserInDB
+    errors = []
+
+    def create():
+        try:
+            users.create(UserInDB(username="dup", password="x", created_at=datetime.utcnow()))
+        except ValueError:
+            errors.append(1)
+
+    threads = [threading.Thread(target=create) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(users.get_all()) == 1 and len(errors) == 7
+    assert len({user.id for user in users.get_all()}) == 1
+
+
+def test_readiness_gates():
+    readiness = Readiness()
+    assert readiness.is_ready
+    readiness.add_gate("a")
+    readiness.add_gate("b")
+    readiness.mark_done("a")
+    assert not readiness.is_ready and readiness.pending == ["b"]
+    readiness.mark_done("b")
+    readiness.mark_done("unknown")
+    assert readiness.is_ready
+
+
+def test_startup_timer_records_phases():
+    timer = StartupTimer()
+    with timer.phase("one"):
+        pass
+    with pytest.raises(RuntimeError):
+        with timer.phase("failing"):
+            raise RuntimeError
+    assert [name for name, _ in timer.phases] == ["one", "failing"]
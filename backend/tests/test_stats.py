@@ -0,0 +1,53 @@
+"""Contadores de /todos/stats mantidos incrementalmente, conferidos contra uma contagem completa"""
+import random
+from collections import Counter
+
+from app.models.todo import Todo
+from app.services.todo_service import TodoService, todo_stats, todos_db
+
+
+def _recount() -> dict:
+    completed = sum(1 for todo in todos_db.values() if todo.completed)
+    per_day = Counter(todo.created_at.date().isoformat() for todo in todos_db.values())
+    return {
+        "total": len(todos_db),
+        "completed": completed,
+        "pending": len(todos_db) - completed,
+        "created_per_day": dict(sorted(per_day.items())),
+        "archived": 0,
+    }
+
+
+def test_counters_match_full_recount_after_random_mutations():
+    rng = random.Random(36)
+    ids = []
+    for step in range(300):
+        operation = rng.choice(["create", "create", "update", "toggle", "delete"])
+        if operation == "create" or not ids:
+            ids.append(TodoService.create_todo(Todo(title=f"t{step}", description="", completed=rng.random() < 0.5)).id)
+        elif operation == "update":
+            TodoService.update_todo(rng.choice(ids), Todo(title=f"u{step}", description="", completed=rng.random() < 0.5))
+        elif operation == "toggle":
+            TodoService.toggle_todo_status(rng.choice(ids))
+        else:
+            todo_id = ids.pop(rng.randrange(len(ids)))
+            TodoService.delete_todo(todo_id)
+    assert TodoService.get_stats()[1].model_dump() == _recount()
+
+
+def test_etag_changes_only_when_counters_change():
+    todo = TodoService.create_todo(Todo(title="etag", description=""))
+    etag = TodoService.stats_etag()
+    # Mesmo status e data: os contadores não mudam, o ETag também não
+    TodoService.update_todo(todo.id, Todo(title="outro título", description="", completed=todo.completed))
+    assert TodoService.stats_etag() == etag
+    TodoService.toggle_todo_status(todo.id)
+    assert TodoService.stats_etag() != etag
+
+
+def test_restore_rebuilds_counters():
+    TodoService.create_todo(Todo(title="restore", description="", completed=True))
+    expected = _recount()
+    meta, records = TodoService.snapshot_state()
+    TodoService.restore_state(meta, list(records))
+    assert TodoService.get_stats()[1].model_dump() == expected
@@ -0,0 +1,107 @@
+"""Bitmaps roaring e filtro por tags, conferidos contra conjuntos do Python"""
+import random
+from types import SimpleNamespace
+
+import pytest
+
+from app.services.tag_index import TodoTagIndex
+from app.utils.bitmap import ARRAY_MAX, CHUNK_SIZE, RoaringBitmap
+
+TAGS = ["casa", "trabalho", "urgente", "mercado", "leitura"]
+
+
+@pytest.mark.parametrize("universe", [100, 3 * CHUNK_SIZE])
+def test_bitmap_operations_match_sets(universe):
+    rng = random.Random(universe)
+    for _ in range(60):
+        # Tamanhos dos dois lados da fronteira array/bitset de cada container
+        sets = [set(rng.sample(range(universe), min(universe, rng.choice([0, 5, ARRAY_MAX * 4, 3000])))) for _ in range(3)]
+        bitmaps = [RoaringBitmap(values) for values in sets]
+        for _ in range(200):
+            index, value = rng.randrange(3), rng.randrange(universe)
+            if rng.random() < 0.5:
+                sets[index].add(value)
+                bitmaps[index].add(value)
+            else:
+                sets[index].discard(value)
+                bitmaps[index].discard(value)
+
+        a, b, c = sets
+        A, B, C = bitmaps
+        assert list(A) == sorted(a) and len(A) == len(a) and bool(A) == bool(a)
+        assert list(A & B) == sorted(a & b) and len(A & B) == len(a & b)
+        assert list(A | B) == sorted(a | b) and len(A | B) == len(a | b)
+        assert list(A - B) == sorted(a - b) and len(A - B) == len(a - b)
+        assert list(RoaringBitmap.intersection(A, B, C)) == sorted(a & b & c)
+        assert list(RoaringBitmap.union(A, B, C)) == sorted(a | b | c)
+        probe = rng.randrange(universe)
+        assert (probe in A) == (probe in a)
+
+
+def test_bitmap_copy_and_update_are_independent():
+    original = RoaringBitmap([1, 2, CHUNK_SIZE + 1])
+    copy = original.copy()
+    copy.add(7)
+    copy.update(range(CHUNK_SIZE * 2, CHUNK_SIZE * 2 + 100))
+    assert list(original) == [1, 2, CHUNK_SIZE + 1]
+    assert len(copy) == 104
+
+
+def _reference(todos, all_tags=(), any_tags=(), exclude_tags=(), completed=None):
+    return sorted(
+        todo.id for todo in todos.values()
+        if set(all_tags) <= set(todo.tags)
+        and (not any_tags or set(any_tags) & set(todo.tags))
+        and not set(exclude_tags) & set(todo.tags)
+        and (completed is None or todo.completed is completed)
+    )
+
+
+def test_filter_matches_set_reference_under_random_mutations():
+    rng = random.Random(42)
+    index = TodoTagIndex()
+
+    def random_todo(todo_id):
+        return SimpleNamespace(id=todo_id, tags=rng.sample(TAGS, rng.randrange(4)), completed=rng.random() < 0.4)
+
+    todos = {todo_id: random_todo(todo_id) for todo_id in range(1, 2000)}
+    index.rebuild(todos.values())
+    next_id = 2000
+    for _ in range(1500):
+        action = rng.random()
+        if action < 0.3:
+            batch = [random_todo(todo_id) for todo_id in range(next_id, next_id + rng.randrange(1, 20))]
+            next_id += len(batch)
+            todos.update((todo.id, todo) for todo in batch)
+            index.add_many(batch)
+        elif action < 0.7 and todos:
+            todo = todos[rng.choice(list(todos))]
+            todo.tags, todo.completed = rng.sample(TAGS, rng.randrange(4)), rng.random() < 0.5
+            index.update(todo)
+        elif todos:
+            index.remove(todos.pop(rng.choice(list(todos))).id)
+
+    queries = [
+        {},
+        {"completed": True},
+        {"completed": False},
+        {"all_tags": ("casa",)},
+        {"all_tags": ("casa", "urgente"), "completed": False},
+        {"any_tags": ("mercado", "leitura")},
+        {"any_tags": ("inexistente",)},
+        {"all_tags": ("inexistente",)},
+        {"exclude_tags": ("trabalho",)},
+        {"all_tags": ("trabalho",), "any_tags": ("urgente", "casa"), "exclude_tags": ("leitura",), "completed": True},
+    ]
+    for query in queries:
+        assert list(index.filter(**query)) == _reference(todos, **query), query
+
+
+def test_filter_never_returns_the_live_universe():
+    index = TodoTagIndex()
+    index.add(SimpleNamespace(id=1, tags=["casa"], completed=False))
+    result = index.filter()
+    result.add(99)
+    assert list(index.filter()) == [1]
+    index.remove(1)
+    assert list(index.filter()) == [] and list(index.filter(all_tags=("casa",))) == []
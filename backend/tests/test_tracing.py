@@ -0,0 +1,112 @@
+"""Tracing: traceparent W3C, spans aninhados, amostragem e exportação"""
+import asyncio
+import json
+
+import pytest
+
+from app.core import tracing
+from app.core.tracing import TraceExporter, TracingMiddleware, parse_traceparent, span, traced
+
+TRACE_ID = "4bf92f3577b34da6a3ce929d0e0e4736"
+PARENT_ID = "00f067aa0ba902b7"
+
+
+@pytest.fixture
+def exporter(monkeypatch, tmp_path):
+    fresh = TraceExporter(ring_size=100, path=str(tmp_path / "traces.ndjson"))
+    monkeypatch.setattr(tracing, "exporter", fresh)
+    return fresh
+
+
+@pytest.mark.parametrize("value, expected", [
+    (f"00-{TRACE_ID}-{PARENT_ID}-01", (TRACE_ID, PARENT_ID, True)),
+    (f"00-{TRACE_ID}-{PARENT_ID}-00", (TRACE_ID, PARENT_ID, False)),
+    (f"00-{'0' * 32}-{PARENT_ID}-01", None),
+    (f"00-{TRACE_ID}-{PARENT_ID}", None),
+    (f"00-{TRACE_ID}-zzzzzzzzzzzzzzzz-01", None),
+    ("", None),
+])
+def test_parse_traceparent(value, expected):
+    assert parse_traceparent(value) == expected
+
+
+def test_span_is_noop_without_sampled_parent(exporter):
+    with span("service") as current:
+        assert current is None
+
+    @traced()
+    def work():
+        return 42
+
+    assert work() == 42
+    assert exporter.exported == 0
+
+
+async def _request(middleware, traceparent=None):
+    headers = [(b"traceparent", traceparent.encode())] if traceparent else []
+    sent = []
+
+    async def receive():
+        return {"type": "http.request", "body": b""}
+
+    async def send(message):
+        sent.append(message)
+
+    await middleware({"type": "http", "method": "GET", "path": "/todos/", "headers": headers}, receive, send)
+    return sent
+
+
+def _app():
+    @traced("TodoService.list")
+    def service():
+        with span("encode", items=3):
+            pass
+
+    async def app(scope, receive, send):
+        service()
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b"[]"})
+
+    return app
+
+
+def test_sampled_request_records_nested_spans(exporter):
+    sent = asyncio.run(_request(TracingMiddleware(_app()), f"00-{TRACE_ID}-{PARENT_ID}-01"))
+    spans = {record["name"]: record for record in exporter.recent()}
+
+    assert set(spans) == {"GET /todos/", "TodoService.list", "encode"}
+    root = spans["GET /todos/"]
+    assert root["trace_id"] == TRACE_ID and root["parent_id"] == PARENT_ID
+    assert root["attributes"]["http.status_code"] == 200
+    assert spans["TodoService.list"]["parent_id"] == root["span_id"]
+    assert spans["encode"]["parent_id"] == spans["TodoService.list"]["span_id"]
+    assert spans["encode"]["attributes"] == {"items": 3}
+
+    header = dict(sent[0]["headers"])[b"traceparent"].decode()
+    assert header == f"00-{TRACE_ID}-{root['span_id']}-01"
+
+    with open(exporter.path, encoding="utf-8") as f:
+        assert {json.loads(line)["name"] for line in f} == set(spans)
+
+
+def test_unsampled_requests_are_not_traced(exporter):
+    asyncio.run(_request(TracingMiddleware(_app()), f"00-{TRACE_ID}-{PARENT_ID}-00"))
+    asyncio.run(_request(TracingMiddleware(_app(), sample_rate=0)))
+    assert exporter.recent() == []
+
+
+def test_errors_are_recorded_on_the_span(exporter):
+    with tracing._SpanScope(tracing.Span(TRACE_ID, None, "root")):
+        with pytest.raises(ValueError):
+            with span("failing"):
+                raise ValueError("boom")
+    assert {r["name"]: r["error"] for r in exporter.recent()} == {"failing": "ValueError", "root": None}
+
+
+def test_background_exporter_flushes_on_stop(exporter):
+    exporter.start()
+    with tracing._SpanScope(tracing.Span(TRACE_ID, None, "root")):
+        pass
+    exporter.stop()
+    assert [r["name"] for r in exporter.recent(trace_id=TRACE_ID)] == ["root"]
+    assert exporter.recent(trace_id="other") == []
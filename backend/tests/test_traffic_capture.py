@@ -0,0 +1,95 @@
+"""Captura de tráfego sanitizada e reconstrução das requisições no replay"""
+import asyncio
+import json
+
+import pytest
+
+from app.core import traffic_capture
+from app.core.traffic_capture import TrafficCaptureMiddleware
+from app.tools.replay import REPLAY_PASSWORD, WRONG_PASSWORD, Replayer, _load, _percentile
+from app.utils.security import create_access_token
+
+
+@pytest.fixture
+def capture(monkeypatch, tmp_path):
+    monkeypatch.setattr(traffic_capture, "_recorder", None)
+    path = tmp_path / "traffic.ndjson"
+
+    async def app(scope, receive, send):
+        await receive()
+        await send({"type": "http.response.start", "status": 201, "headers": []})
+        await send({"type": "http.response.body", "body": b"{}"})
+
+    middleware = TrafficCaptureMiddleware(app, path=str(path))
+    yield middleware, path
+    middleware.recorder.close()
+
+
+def _send(middleware, method, path, headers=(), body=b"", query=b""):
+    async def receive():
+        return {"type": "http.request", "body": body, "more_body": False}
+
+    async def send(message):
+        pass
+
+    scope = {"type": "http", "method": method, "path": path, "query_string": query, "headers": list(headers)}
+    asyncio.run(middleware(scope, receive, send))
+
+
+def _records(middleware, path):
+    middleware.recorder._file.flush()
+    return _load(str(path))
+
+
+def test_credentials_are_dropped_and_identities_are_synthetic(capture):
+    middleware, path = capture
+    form = b"username=Alice&password=hunter2"
+    _send(middleware, "POST", "/login", [(b"content-type", b"application/x-www-form-urlencoded")], form)
+    token = create_access_token({"sub": "alice"}).encode()
+    body = json.dumps({"title": "Comprar pão", "tags": ["casa"], "completed": False}).encode()
+    _send(
+        middleware, "POST", "/todos/",
+        [(b"authorization", b"Bearer " + token), (b"content-type", b"application/json")],
+        body, query=b"page=2&q=segredo",
+    )
+    _send(middleware, "GET", "/health/live")
+
+    login, create = _records(middleware, path)
+    assert login["f"] == {"username": None, "password": None}
+    assert login["u"] == "u1" and login["s"] == 201
+    assert create["u"] == "u1" and create["a"] == 1
+    assert create["j"] == {"title": "x" * 11, "tags": ["xxxx"], "completed": False}
+    assert create["q"] == {"page": "2", "q": "xxxxxxx"}
+
+    raw = path.read_text(encoding="utf-8")
+    for secret in ("alice", "Alice", "hunter2", "Comprar", "segredo"):
+        assert secret not in raw
+
+
+def test_replay_fills_credentials_back_in():
+    replayer = Replayer(app=None, records=[], speed=0, concurrency=1)
+    replayer.tokens["u1"] = {"access_token": "A", "refresh_token": "R"}
+
+    ok = {"r": "/login", "s": 200, "u": "u1", "f": {"username": None, "password": None}}
+    headers, body = replayer._build(ok)
+    assert headers["content-type"] == "application/x-www-form-urlencoded"
+    assert body.decode() == f"username=replay_u1&password={REPLAY_PASSWORD.replace('!', '%21')}"
+
+    failed = dict(ok, s=401)
+    assert WRONG_PASSWORD.replace("!", "%21") in replayer._build(failed)[1].decode()
+
+    refresh = {"r": "/refresh", "s": 200, "u": "u1", "a": 1, "j": {"refresh_token": None}}
+    headers, body = replayer._build(refresh)
+    assert "authorization" not in headers
+    assert json.loads(body) == {"refresh_token": "R"}
+
+    todo = {"r": "/todos/", "s": 201, "u": "u1", "a": 1, "j": {"title": "xxx"}}
+    assert replayer._build(todo)[0]["authorization"] == "Bearer A"
+
+
+def test_percentile():
+    values = sorted(float(v) for v in range(1, 101))
+    assert _percentile(values, 50) == 50
+    assert _percentile(values, 99) == 99
+    assert _percentile([], 50) == 0.0
+    assert _percentile([7.0], 90) == 7.0